@@ -10,7 +10,7 @@ import cv2
 
 from utils import preprocess_input
 
-from aisprint.annotations import annotation
+from aisprint.annotations import annotation, phase
 from aisprint.onnx_inference import load_and_inference
 
 @annotation({'component_name': {'name': 'filter'}, 
@@ -21,20 +21,20 @@ def main(args):
 
     # Pre-Processing
     # --------------
-
-    # load and preprocess image
-    orig_image = cv2.imread(args['input'])
-    image = cv2.cvtColor(orig_image, cv2.COLOR_BGR2RGB)
-    image = np.expand_dims(image, axis=0)
-    image = image.astype(np.float32)
-    image = preprocess_input(image) 
+    with phase('pre-processing'):
+        # load and preprocess image
+        orig_image = cv2.imread(args['input'])
+        image = cv2.cvtColor(orig_image, cv2.COLOR_BGR2RGB)
+        image = np.expand_dims(image, axis=0)
+        image = image.astype(np.float32)
+        image = preprocess_input(image) 
     
-    ort_session = ort.InferenceSession(args['onnx_file'])
-    input_name = ort_session.get_inputs()[0].name
-    input_dict = {input_name: image}
+        ort_session = ort.InferenceSession(args['onnx_file'])
+        input_name = ort_session.get_inputs()[0].name
+        input_dict = {input_name: image}
     
-    # To be forwarded
-    input_dict['orig_image'] = orig_image
+        # To be forwarded
+        input_dict['orig_image'] = orig_image
 
     # --------------
 
@@ -47,15 +47,16 @@ def main(args):
 
     # Post-Processing
     # ---------------
-    orig_image = return_dict['orig_image']
+    with phase('post-processing'):
+        orig_image = return_dict['orig_image']
     
-    # Get predicted class 
-    softmax = result[0]
-    pred_class = np.argmax(softmax)
-    if pred_class == 1:
-        cv2.imwrite(args['output'], orig_image)
-        print('An animal has been detected in the image.',
-              'Image has been saved succesfully at', args['output'], 'path')
+        # Get predicted class 
+        softmax = result[0]
+        pred_class = np.argmax(softmax)
+        if pred_class == 1:
+            cv2.imwrite(args['output'], orig_image)
+            print('An animal has been detected in the image.',
+                  'Image has been saved succesfully at', args['output'], 'path')
     
     # ---------------
 
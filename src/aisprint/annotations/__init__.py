@@ -8,4 +8,5 @@ from .annotations import device_constraints
 from .annotations import expected_throughput
 from .annotations import model_performance
 from .annotations import detect_metric_drift
-from .annotations import security
\ No newline at end of file
+from .annotations import security
+from .annotations import phase
\ No newline at end of file
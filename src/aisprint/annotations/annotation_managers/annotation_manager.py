@@ -1,17 +1,21 @@
 import os
-import yaml
 from abc import ABC, abstractmethod
 
+from aisprint.application_model import get_application_model
+
 class AnnotationManager(ABC):
 
-    def __init__(self, application_name, application_dir):
+    def __init__(self, application_name, application_dir, application_model=None):
         
         self.application_name = application_name
         self.application_dir = application_dir
         self.designs_dir = os.path.join(application_dir, 'aisprint', 'designs')
         self.deployments_dir = os.path.join(application_dir, 'aisprint', 'deployments')
-        with open(os.path.join(application_dir, 'common_config', 'annotations.yaml'), 'r') as f:
-            self.annotations = yaml.safe_load(f)
+        # Parsed application files, shared by the managers (see 'aisprint.application_model')
+        if application_model is None:
+            application_model = get_application_model(application_dir)
+        self.application_model = application_model
+        self.annotations = application_model.annotations
 
     @abstractmethod
     def process_annotations(self, args):
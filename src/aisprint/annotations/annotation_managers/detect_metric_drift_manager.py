@@ -57,6 +57,14 @@ class DetectMetricDriftManager(AnnotationManager):
                 if type(monitoring_periods) != list:
                     monitoring_periods = [[monitoring_periods]]
                 detection_interval = component_arguments['detect_metric_drift']['detection_interval']
+                detection_intervals = None
+                if type(detection_interval) == list:
+                    # One detection interval for each field (the smallest one is the default)
+                    detection_intervals = detection_interval
+                    if not all([type(intervals) == list for intervals in detection_intervals]):
+                        # Fields of a single metric
+                        detection_intervals = [detection_intervals]
+                    detection_interval = min([min(intervals) for intervals in detection_intervals])
                 data_collection_period = component_arguments['detect_metric_drift']['data_collection_period']
 
                 # Save dictionary
@@ -69,6 +77,8 @@ class DetectMetricDriftManager(AnnotationManager):
                         metric_dict['metrics'][metric][field]['statistical_test'] = statistical_tests[metric_idx][field_idx]
                         metric_dict['metrics'][metric][field]['test_threshold'] = test_thresholds[metric_idx][field_idx]
                         metric_dict['metrics'][metric][field]['monitoring_period'] = monitoring_periods[metric_idx][field_idx]
+                        if detection_intervals is not None:
+                            metric_dict['metrics'][metric][field]['detection_interval'] = detection_intervals[metric_idx][field_idx]
                 metric_dict['detection_interval'] = detection_interval
                 metric_dict['data_collection_period'] = data_collection_period
 
@@ -4,6 +4,7 @@ import yaml
 from .annotation_manager import AnnotationManager
 from aisprint.space4aidpartitioner import EESPACE4AIDPartitioner
 from aisprint.space4aidpartitioner import EECodePartitioner
+from aisprint.utils import update_component_partitions
 
 
 class EarlyExitsModelManager(AnnotationManager):
@@ -19,7 +20,14 @@ class EarlyExitsModelManager(AnnotationManager):
 
     def process_annotations(self, args=None):
         ''' Get partitionable models and generate partition designs by running SPACE4AIDPartitioner.
+
+            Input:
+                - args: Python dict with the following (optional) items
+                    - components: names of the components to be partitioned (default: all)
+                    - num_workers: number of threads generating the code of the partitions
         ''' 
+        components = (args or {}).get('components')
+        num_workers = (args or {}).get('num_workers')
 
         # SPACE4AI-D-partitioner
         # ----------------------
@@ -29,6 +37,8 @@ class EarlyExitsModelManager(AnnotationManager):
         for _, component_arguments in self.annotations.items():
             if 'early_exits_model' in component_arguments:
                 annotation_exists = True
+                if components is not None and component_arguments['component_name']['name'] not in components:
+                    continue
                 onnx_file = component_arguments['early_exits_model']['onnx_file'] 
                 component_name = component_arguments['component_name']['name']
 
@@ -38,17 +48,8 @@ class EarlyExitsModelManager(AnnotationManager):
 
                 found_partitions = ['base'] + found_partitions
 
-                component_partitions_file = os.path.join(self.designs_dir, 'component_partitions.yaml')
-                if not os.path.exists(component_partitions_file):
-                    component_partitions = {'components': {
-                        component_name: {'partitions': found_partitions}}}
-                else:
-                    with open(component_partitions_file, 'r') as f:
-                        component_partitions = yaml.safe_load(f)
-                        component_partitions['components'][component_name] = {
-                            'partitions': found_partitions}
-                with open(component_partitions_file, 'w') as f:
-                    yaml.dump(component_partitions, f)
+                update_component_partitions(
+                    self.designs_dir, component_name, {'partitions': found_partitions})
         # ----------------------
 
         if annotation_exists:
@@ -56,8 +57,9 @@ class EarlyExitsModelManager(AnnotationManager):
             # ----------------
             print("\n")
             print("[AI-SPRINT]: " + "Automatic generating the code of the found partitions..")
-            code_partitioner = EECodePartitioner(application_dir=self.application_dir)
-            code_partitioner.generate_code_partitions()
+            code_partitioner = EECodePartitioner(
+                application_dir=self.application_dir, application_model=self.application_model)
+            code_partitioner.generate_code_partitions(num_workers=num_workers, components=components)
             # ----------------
         else:
             print("\n")
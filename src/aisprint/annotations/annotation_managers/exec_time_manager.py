@@ -2,7 +2,6 @@ import os
 import yaml 
 
 import numpy as np
-from itertools import chain, combinations
 
 from .annotation_manager import AnnotationManager
 from aisprint.utils import parse_dag
@@ -26,8 +25,7 @@ class ExecTimeManager(AnnotationManager):
             generate a new annotation file.
         '''
 
-        with open(dag_file, 'r') as f:
-            dag_dict = yaml.safe_load(f)
+        dag_dict = self.application_model.load_file(dag_file)
 
         # Get components names from DAG dictionary.
         # This includes potentially the new component names due to the partitions.
@@ -75,12 +73,8 @@ class ExecTimeManager(AnnotationManager):
                 # annotations. This means that it has no partitions in the current deployment.
 
                 # Get the original 'exec_time' annotations and arguments
-                original_exec_time = None 
-                for _, annotations in self.annotations.items():
-                    if (dag_component == annotations['component_name']['name'] and 
-                            'exec_time' in annotations):
-                        original_exec_time = annotations['exec_time']
-                        break
+                original_exec_time = self.application_model.get_component_annotations(
+                    dag_component).get('exec_time')
 
                 if original_exec_time is None:
                     # Component 'dag_component' is not 'exec_time'-annotated
@@ -145,12 +139,8 @@ class ExecTimeManager(AnnotationManager):
                 partition_of = dag_component.rsplit('_partition', 1)[0]  # This gives 'CX' in the example
                 
                 # Get the original 'exec_time' annotations and arguments
-                original_exec_time = None 
-                for _, annotations in self.annotations.items():
-                    if (partition_of == annotations['component_name']['name'] and 
-                            'exec_time' in annotations):
-                        original_exec_time = annotations['exec_time']
-                        break
+                original_exec_time = self.application_model.get_component_annotations(
+                    partition_of).get('exec_time')
                 
                 if original_exec_time is None:
                     # Original component was not 'exec_time'-decorated -> do nothing
@@ -217,10 +207,7 @@ class ExecTimeManager(AnnotationManager):
     
     def get_alternatives(self, childs):
         #  Need to use DAG 
-        dag_file = os.path.join(self.application_dir, 'common_config', 'application_dag.yaml')
-        
-        with open(dag_file, 'r') as f:
-            dag_dict = yaml.safe_load(f)
+        dag_dict = self.application_model.dag
         
         alternative_components = dag_dict['System']['alternative_components']
         self.alternative_components = alternative_components
@@ -235,60 +222,59 @@ class ExecTimeManager(AnnotationManager):
         return alternatives_dict
     
     def generate_multicluster_qos(self, layers_assignment, qos_constraints, alternative_deployments=False):
+        ''' Split the QoS constraints of the deployment by computational layer.
+
+            The constraints are indexed by component (local constraints) and by the last component
+            of their path (global constraints), thus the constraints of each layer are collected
+            in a single pass over the components assigned to the layer.
+
+            Return: (dict with the QoS constraints of each layer, total QoS constraints) tuple.
+        '''
         local_constraints = qos_constraints['system']['local_constraints']
         global_constraints = qos_constraints['system']['global_constraints']
-        
-        dag_components = self.dag_dict['System']['components']
-
-        l_idx = 1
-        g_idx = 1
 
-        # Generate each possible layer-component association 
-        # Read candidate_deployments.yaml file
-        candidate_file = os.path.join(self.application_dir, 'common_config', 'candidate_deployments.yaml')
-        with open(candidate_file, 'r') as f:
-            candidates = yaml.safe_load(f)
+        # Constraints indexes: component -> local constraints, path tail -> global constraints
+        local_index = {}
+        for _, local_constraint in local_constraints.items():
+            local_index.setdefault(local_constraint['component_name'], []).append(local_constraint)
+        global_index = {}
+        for _, global_constraint in global_constraints.items():
+            global_index.setdefault(global_constraint['components_path'][-1], []).append(global_constraint)
         
         # Get all components name
         components_names = self.dag_dict['System']['components'] 
 
         # Get all parents in the case of alternatives
-        alternatives = {}
+        alternative_of = {}
         if alternative_deployments:
-            alternatives = self.get_alternatives(components_names)
+            for parent, childs in self.get_alternatives(components_names).items():
+                for child in childs:
+                    alternative_of.setdefault(child, parent)
         
+        # Generate each layer-component association (components with a candidate deployment)
         # Substitute 'partition1', 'partition2', ecc. with 'partitionX'
         components_layers = {}
-        partition_numbers = []
         for cname in components_names:
             splitted_name = cname.rsplit('_partition', 1)
             if len(splitted_name) == 1: # No partition
                 new_name = cname
             else:
-                partition_number, segment_number = splitted_name[1].split('_')
-                partition_numbers.append(int(partition_number))
+                _, segment_number = splitted_name[1].split('_')
                 new_name = splitted_name[0] + '_partitionX_' + segment_number 
             
-            # Get candidate(s) for the current 'cname'
-            candidates_components = candidates['Components']
-            for candidate_component in candidates_components:
-                component_name = candidates_components[candidate_component]['name']
-                    # candidate_component has an alternative, 
-                    # then assign the parent candidateExecutionLayer 
-                searched_component = False
-                if component_name == new_name:
-                    searched_component = True
-                elif alternative_deployments:
-                    if new_name in alternatives[component_name]: 
-                        searched_component = True
-                if searched_component: 
-                    candidate_layers = [layers_assignment[cname]]
-                    for candidate_layer in candidate_layers:
-                        if candidate_layer not in components_layers:
-                            components_layers[candidate_layer] = [] 
-                        if not cname in components_layers[candidate_layer]:
-                            components_layers[candidate_layer].append(cname)
-                    break
+            # Get candidate for the current 'cname' 
+            # (the candidate of the parent, if the component is an alternative)
+            candidate = self.application_model.get_candidate_deployment(new_name)
+            if candidate is None and new_name in alternative_of:
+                candidate = self.application_model.get_candidate_deployment(alternative_of[new_name])
+            if candidate is not None:
+                candidate_layer = layers_assignment[cname]
+                components_layers.setdefault(candidate_layer, [])
+                if not cname in components_layers[candidate_layer]:
+                    components_layers[candidate_layer].append(cname)
+
+        # Components with the 'expected_throughput' annotation
+        throughput_components = self.application_model.get_annotated_components('expected_throughput')
         
         return_dict = {}
         return_dict['ExecutionLayers'] = {}
@@ -301,93 +287,57 @@ class ExecTimeManager(AnnotationManager):
         total_l_idx = 1
         total_g_idx = 1
         for candidate_layer in sorted(components_layers.keys()):
-            base_qos_name = 'L{}.yaml'.format(candidate_layer)
-
-            # Select mandatory assignments
-            component_in_others = False 
-            mandatory_components = []
-            variable_components = []
-            for component in components_layers[candidate_layer]:
-                for other_candidate_layer in components_layers.keys():
-                    if other_candidate_layer != candidate_layer:
-                        if component in components_layers[other_candidate_layer]:
-                            component_in_others = True 
-                            break
-                    if component_in_others:
-                        break
-                if not component_in_others:
-                    mandatory_components.append(component)
-                else:
-                    variable_components.append(component)
+            # Each component is assigned to a single layer
+            layer_components = components_layers[candidate_layer]
             
-            # Get all possible combinations of variable components
-            subgs = chain.from_iterable(combinations(variable_components, r) for r in range(len(variable_components)+1))
-            subgs = list(subgs)
-
-            # Each subgroup generates a new qos_constraints.yaml file
+            # Generate qos_constraints
             l_idx = 1
             g_idx = 1
-            for subg in subgs:
-                if len(subg) == 0:
-                    curr_assignment = mandatory_components
-                else:
-                    curr_assignment = mandatory_components + list(subg)
+            qos_layer = {}
+            qos_layer['components'] = list(layer_components)
+            qos_layer['local_constraints'] = {} 
+            qos_layer['global_constraints'] = {} 
+            for component in layer_components:
+                for local_constraint in local_index.get(component, []):
+                    qos_layer['local_constraints'][
+                        'local_constraint_{}'.format(l_idx)] = {'component_name': component,
+                                                                'threshold': local_constraint['threshold']}
+                    # Add also to total qos file
+                    total_qos['system']['local_constraints'][
+                        'local_constraint_{}'.format(total_l_idx)] = {'component_name': component,
+                                                                      'threshold': local_constraint['threshold']}
+                    total_l_idx += 1
+                    l_idx += 1
+                for global_constraint in global_index.get(component, []):
+                    qos_layer['global_constraints'][
+                        'global_constraint_{}'.format(g_idx)] = {'path_components': global_constraint['components_path'], 
+                                                                'threshold': global_constraint['threshold']}
+                    # Add also to total qos file
+                    total_qos['system']['global_constraints'][
+                        'global_constraint_{}'.format(total_g_idx)] = {'path_components': global_constraint['components_path'], 
+                                                                       'threshold': global_constraint['threshold']}
+                    total_g_idx += 1
+                    g_idx += 1
                 
-                # Generate qos_constraints
-                qos_name = '' + base_qos_name
-                qos_layer = {}
-                # qos_layer['name'] = qos_constraints['system']['name']
-                qos_layer['components'] = []
-                qos_layer['local_constraints'] = {} 
-                qos_layer['global_constraints'] = {} 
-                for component in curr_assignment:
-                    if not component in qos_layer['components']:
-                        qos_layer['components'].append(component)
-                    for _, local_constraint in local_constraints.items():
-                        if local_constraint['component_name'] == component: 
-                            qos_layer['local_constraints'][
-                                'local_constraint_{}'.format(l_idx)] = {'component_name': component,
-                                                                        'threshold': local_constraint['threshold']}
-                            # Add also to total qos file
-                            total_qos['system']['local_constraints'][
-                                'local_constraint_{}'.format(total_l_idx)] = {'component_name': component,
-                                                                              'threshold': local_constraint['threshold']}
-                            total_l_idx += 1
-                            l_idx += 1
-                    for _, global_constraint in global_constraints.items():
-                        if global_constraint['components_path'][-1] == component: 
-                            qos_layer['global_constraints'][
-                                'global_constraint_{}'.format(g_idx)] = {'path_components': global_constraint['components_path'], 
-                                                                        'threshold': global_constraint['threshold']}
-                            # Add also to total qos file
-                            total_qos['system']['global_constraints'][
-                                'global_constraint_{}'.format(total_g_idx)] = {'path_components': global_constraint['components_path'], 
-                                                                               'threshold': global_constraint['threshold']}
-                            total_g_idx += 1
-                            g_idx += 1
-
-                    qos_name = component + '_' + qos_name 
-                    
-                qos_layer['throughput_component'] = {} 
-
-                if found_throughput_component is None:
-                    for _, annotations in self.annotations.items():
-                        if 'expected_throughput' in annotations:
-                            throughput_component = annotations['component_name']['name']
-                            if throughput_component in curr_assignment:
-                                qos_layer['throughput_component'] = annotations['component_name']['name']
-                                found_throughput_component = annotations['component_name']['name']
-                            else:
-                                for curr_component in curr_assignment:
-                                    if throughput_component == curr_component.rsplit('_partition', 1)[0]:
-                                        which_segment = curr_component.rsplit('_', 1)[1]
-                                        if int(which_segment) == 1: 
-                                            qos_layer['throughput_component'] = curr_component
-                                            found_throughput_component = curr_component 
-                else:
-                    qos_layer['throughput_component'] = found_throughput_component
-                
-                return_dict['ExecutionLayers'][candidate_layer] = qos_layer
+            qos_layer['throughput_component'] = {} 
+
+            if found_throughput_component is None:
+                for throughput_component in throughput_components:
+                    if throughput_component in layer_components:
+                        qos_layer['throughput_component'] = throughput_component
+                        found_throughput_component = throughput_component
+                    else:
+                        # The throughput is measured on the first segment of a partitioned component
+                        for curr_component in layer_components:
+                            if throughput_component == curr_component.rsplit('_partition', 1)[0]:
+                                which_segment = curr_component.rsplit('_', 1)[1]
+                                if int(which_segment) == 1: 
+                                    qos_layer['throughput_component'] = curr_component
+                                    found_throughput_component = curr_component 
+            else:
+                qos_layer['throughput_component'] = found_throughput_component
+            
+            return_dict['ExecutionLayers'][candidate_layer] = qos_layer
         return return_dict, total_qos
 
     def process_annotations(self, args):
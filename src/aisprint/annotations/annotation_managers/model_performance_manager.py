@@ -3,9 +3,10 @@ import yaml
 
 import itertools
 import numpy as np
-import pandas as pd
 
 from .annotation_manager import AnnotationManager
+from aisprint.performance_metrics import ConfusionMatrices, FilterClassifierMetrics, PipelineSearch, load_class_weights
+from aisprint.pareto import ComponentProfiles, estimate_deployment, get_pareto_front
 
 
 class ModelPerformanceManager(AnnotationManager):
@@ -19,316 +20,116 @@ class ModelPerformanceManager(AnnotationManager):
         also check errors in the annotations' format.
     '''
 
-    def get_alternative_of(self, parent, childs):
-        for child in childs:
-            if child in self.alternative_components[parent]:
-                return child 
-            if child == parent:
-                return child
-        return None 
-
-    def get_alternative_deployments(self):
-        
-        #  Need to use DAG 
-        dag_file = os.path.join(self.application_dir, 'common_config', 'application_dag.yaml')
-        
-        with open(dag_file, 'r') as f:
-            dag_dict = yaml.safe_load(f)
-        
-        alternative_components = dag_dict['System']['alternative_components']
+    def get_pipeline(self, filters, classifier):
+        ''' Order the filters as a chain ending in the classifier, following the DAG dependencies.
+
+            Return: list of the filters, from the first one to the one before the classifier.
+        '''
+        dependencies = self.application_model.dag['System']['dependencies']
+        chain = []
+        current = classifier
+        while len(chain) < len(filters):
+            predecessors = [d[0] for d in dependencies if d[1] == current and d[0] in filters]
+            if len(predecessors) != 1 or predecessors[0] in chain:
+                raise Exception("The 'model_performance' filters {} must form a chain of " 
+                                "dependencies ending in the classifier '{}'.".format(sorted(filters), classifier))
+            current = predecessors[0]
+            chain.insert(0, current)
+        return chain
+
+    def get_alternative_deployments(self, pipeline, classifier, pipeline_deployments):
+        ''' Generate the deployments of the application given the (filters, classifier) deployments
+            of the pipeline, combined with the alternatives of the other components. 
+
+            Return: dict with the components and the dependencies of each deployment ('base' for the
+                original components, 'deploymentX' for the alternatives) and dict with the metric value
+                and the transition probabilities of the filters of each deployment.
+        '''
+        dag_dict = self.application_model.dag
+        components = dag_dict['System']['components']
+        dependencies = dag_dict['System']['dependencies']
+        alternative_components = self.application_model.get_alternative_components()
         self.alternative_components = alternative_components
 
-        alternatives = []
-        for c in alternative_components:
-            alternatives.append([c] + alternative_components[c])
-        alternatives_temp = list(itertools.product(*alternatives))
-        alternatives = [alternative for alternative in alternatives_temp if not set(
-            dag_dict['System']['components']) == set(alternative)]
+        # Position (in the product of the alternatives) of the choices of the pipeline
+        pipeline_components = pipeline + [classifier]
+        others = [c for c in components if c not in pipeline_components]
+        choices = []
+        for filters, pipeline_classifier, metric_value, probabilities in pipeline_deployments:
+            choice = dict(zip(pipeline_components, filters + [pipeline_classifier]))
+            for others_choice in itertools.product(*[[c] + alternative_components.get(c, []) for c in others]):
+                choice.update(zip(others, others_choice))
+                key = tuple([([c] + alternative_components.get(c, [])).index(choice[c]) for c in components])
+                choices.append((key, [choice[c] for c in components], metric_value, 
+                                dict(zip(pipeline, probabilities))))
+        choices = sorted(choices, key=lambda choice: choice[0])
 
-        num_alternatives = len(alternatives)
-        
         deployments = {}
-        deployments['base'] = {}
-        deployments['base']['components'] = dag_dict['System']['components']
-        deployments['base']['dependencies'] = dag_dict['System']['dependencies']
-
-        for idx in range(num_alternatives):
-            deployment_name = 'deployment{}'.format(idx+1)
-            deployments[deployment_name] = {}
-            deployments[deployment_name]['components'] = alternatives[idx]
-            dependencies = dag_dict['System']['dependencies'][0]
-            start_c = dependencies[0]
-            end_c = dependencies[1]
-            prob = dependencies[2]
-            
-            deployments[deployment_name]['dependencies'] = [[
-                self.get_alternative_of(start_c, alternatives[idx]),
-                self.get_alternative_of(end_c, alternatives[idx]),
-                prob]]
-
-        return deployments
-    
-    def compute_f1(self, precisions, recalls, class_weights=None):
-        
-        num_classes = len(list(precisions.keys()))
-        
-        f1s = {}
-        average_f1 = 0
-        for c, precision in precisions.items(): 
-            recall = recalls[c]
-
-            f1s[c] = 2 * precision * recall / (precision + recall)
-
-            if class_weights is not None:
-                average_f1 += (class_weights[c] * f1s[c]) 
-            else:
-                average_f1 += (f1s[c] / num_classes) 
-
-        return f1s, average_f1
-
-                   
-    def compute_precision(self, filter_rates, classifier_cm, filter, classifier, 
-                          p_filtered_class, p_classifier_filtered_class, class_weights):
-        
-        TPf = filter_rates['TP']
-        FPf = filter_rates['FP']
-        FNf = filter_rates['FN']
-        TNf = filter_rates['TN']
-
-        classifier_classes = list(classifier_cm.keys())
-        num_classes = len([p_filtered_class] + classifier_classes)
-        
-        precisions = {}
-        average_precision = 0
-        for c in [p_filtered_class] + classifier_classes: 
-            if p_classifier_filtered_class is None:
-                # The classifier does not predict the filtered-out class
-                if c == p_filtered_class: # filtered class
-                    precisions[c] = TNf / (TNf + FNf)
-                else:
-                    TP = classifier_cm[c][c] 
-                    FP = 0 
-                    for c2, v in classifier_cm.items():
-                        if c2 != c:
-                            FP += v[c]
-                    
-                    total_sum = 0
-                    for c2, v in classifier_cm.items():
-                        for c3, v2 in classifier_cm[c2].items():
-                            total_sum += v2
-                    precisions[c] = (TPf * TP) / (
-                        (TPf * TP) + (TPf * FP) + (FPf * (TP + FP) / total_sum))
-            else:
-                # The classifier predicts the filtered-out class (the same of the filter)
-                TP = classifier_cm[c][c] 
-                FP = 0 
-                for c2, v in classifier_cm.items():
-                    if c2 != c:
-                        FP += v[c]
-                        
-                if c == p_filtered_class: # filtered class
-                    precisions[c] = (TNf + FPf * TP) / (
-                        TNf + (FPf * TP) + FNf + (TPf * FP))
-                else:
-                    # FP due to the filtered class
-                    FPfclass = classifier_cm[p_classifier_filtered_class][c]
-                    # FP without the contribution of the filtered class
-                    FPnof = FP - FPfclass 
-                    precisions[c] = (TPf * TP) / (
-                        (TPf * TP) + (TPf * FPnof) + (FPf * FPfclass))
-            
-            if class_weights is not None:
-                average_precision += (class_weights[c] * precisions[c]) 
-            else:
-                average_precision += (precisions[c] / num_classes) 
-
-        return precisions, average_precision
-            
-    def compute_recall(self, filter_rates, classifier_cm, filter, classifier, 
-                       p_filtered_class, p_classifier_filtered_class, class_weights):
-        TPf = filter_rates['TP']
-        FPf = filter_rates['FP']
-        FNf = filter_rates['FN']
-        TNf = filter_rates['TN']
-
-        classifier_classes = list(classifier_cm.keys())
-        num_classes = len([p_filtered_class] + classifier_classes)
-        
-        recalls = {}
-        average_recall = 0
-        for c in [p_filtered_class] + classifier_classes: 
-            if p_classifier_filtered_class is None:
-                # The classifier does not predict the filtered-out class
-                        
-                if c == p_filtered_class: # filtered class
-                    recalls[c] = TNf / (TNf + FPf)
-                else:
-                    TP = classifier_cm[c][c] 
-                    FN = 0 
-                    for c2, v in classifier_cm[c].items():
-                        if c2 != c:
-                            FN += v
-                    
-                    total_sum = 0
-                    for c2, v in classifier_cm.items():
-                        for c3, v2 in classifier_cm[c2].items():
-                            total_sum += v2
-                    recalls[c] = (TPf * TP) / (
-                        (TPf * TP) + (TPf * FN) + (FNf * (TP + FN) / total_sum))
-            else:
-                # The classifier predicts the filtered-out class (the same of the filter)
-                TP = classifier_cm[c][c] 
-                FN = 0 
-                for c2, v in classifier_cm[c].items():
-                    if c2 != c:
-                        FN += v 
-                
-                total_sum = 0
-                for c2, v in classifier_cm.items():
-                    for c3, v2 in classifier_cm[c2].items():
-                        total_sum += v2
-                        
-                if c == p_filtered_class: # filtered class
-                    recalls[c] = (TNf + FPf * TP) / (
-                        TNf + (FPf * TP) + (FPf * FN))
-                else:
-                    recalls[c] = (TPf * TP) / (
-                        (TPf * TP) + (TPf * FN) + (FNf * (TP + FN) / total_sum))
-
-            if class_weights is not None:
-                average_recall += (class_weights[c] * recalls[c]) 
-            else:
-                average_recall += (recalls[c] / num_classes) 
-                
-        return recalls, average_recall 
-
-    def compute_accuracy(self, filter_rates, classifier_cm, filter, classifier, 
-                         p_filtered_class, p_classifier_filtered_class, class_weights):
-        TPf = filter_rates['TP']
-        FPf = filter_rates['FP']
-        FNf = filter_rates['FN']
-        TNf = filter_rates['TN']
-        
-        classifier_classes = list(classifier_cm.keys())
-        num_classes = len([p_filtered_class] + classifier_classes)
-        
-        accuracies = {}
-        classifier_classes = list(classifier_cm.keys())
-        for c in [p_filtered_class] + classifier_classes: 
-            if p_classifier_filtered_class is None:
-                # The classifier does not predict the filtered-out class
-                if c == p_filtered_class: # filtered class
-                    accuracies[c] = TNf
-                else:
-                    TP = classifier_cm[c][c] 
-                    FN = 0 
-                    for c2, v in classifier_cm[c].items():
-                        if c2 != c:
-                            FN += v
-                    
-                    accuracies[c] = TPf * TP
-
-            else:
-                # The classifier predicts the filtered-out class (the same of the filter)
-                TP = classifier_cm[c][c] 
-                FN = 0 
-                for c2, v in classifier_cm[c].items():
-                    if c2 != c:
-                        FN += v
-
-                if c == p_filtered_class: # filtered class
-                    accuracies[c] = TNf + (FPf * TP)
-                else:
-                    accuracies[c] = TPf * TP
-            
-            if class_weights is not None:
-                average_accuracy += (class_weights[c] * accuracies[c]) 
+        deployments_performance = {}
+        num_alternatives = 0
+        for key, deployment_components, metric_value, probabilities in choices:
+            if not any(key):
+                deployment_name = 'base'
+                deployment_components = components
             else:
-                average_accuracy += (accuracies[c] / num_classes) 
-
-        return accuracies, average_accuracy
+                num_alternatives += 1
+                deployment_name = 'deployment{}'.format(num_alternatives)
+                deployment_components = tuple(deployment_components)
+            alternative_of = dict(zip(components, deployment_components))
+            deployments[deployment_name] = {}
+            deployments[deployment_name]['components'] = deployment_components
+            deployments[deployment_name]['dependencies'] = [
+                [alternative_of[d[0]], alternative_of[d[1]], d[2]] for d in dependencies]
+            deployments_performance[deployment_name] = {
+                'metric_value': metric_value, 
+                'probabilities': [probabilities.get(d[0], d[2]) for d in dependencies]}
+
+        return deployments, deployments_performance
     
-    def compute_metric(self, components, filter_rates, ref_classifier_cm, original_filter, 
-                       original_classifier, p_metric, p_filtered_class, p_classifier_filtered_class):
-        # Compute metric
-        # --------------
-        # Get filter component
-        filter = self.get_alternative_of(original_filter, components)
-        # Get classifier component
-        classifier = self.get_alternative_of(original_classifier, components)
-
-        # Read weights
-        weights_file = os.path.join(self.application_dir, 'src', 'class_weights.csv')
-        if os.path.exists(weights_file):
-            class_weights = pd.read_csv(weights_file)
+    def prune_dominated_deployments(self, alternative_deployments, performance, metric):
+        ''' Drop the alternative deployments dominated in (metric, estimated latency, estimated cost),
+            see 'aisprint.pareto'. The original deployment is always kept. The dominated deployments 
+            are reported in 'aisprint/designs/dominated_deployments.yaml'.
+
+            Return: the non-dominated alternative deployments and their performance.
+        '''
+        components = self.application_model.dag['System']['components']
+        alternative_components = self.application_model.get_alternative_components()
+        profiles = ComponentProfiles(self.application_model)
+
+        # Alternatives can be compared only if all the alternative components have an estimate
+        dominated = {}
+        missing = [c for original in components for c in [original] + alternative_components.get(original, []) 
+                   if original in alternative_components and profiles.get(c, original) is None]
+        if missing:
+            print("             " + "- Pareto pruning skipped, no cost estimate for: {}".format(missing))
         else:
-            class_weights = None
-
-        if p_metric == 'average_f1':
-            precisions, _ = self.compute_precision(
-                filter_rates, ref_classifier_cm, filter, classifier, 
-                p_filtered_class, p_classifier_filtered_class, class_weights)
-            recalls, _ = self.compute_recall(
-                filter_rates, ref_classifier_cm, filter, classifier, 
-                p_filtered_class, p_classifier_filtered_class, class_weights)
-            f1s, average_f1 = self.compute_f1(precisions, recalls, class_weights)
-            return average_f1
-        elif p_metric == 'average_precision':
-            precisions, average_precision = self.compute_precision(
-                filter_rates, ref_classifier_cm, filter, classifier, 
-                p_filtered_class, p_classifier_filtered_class, class_weights)
-            return average_precision
-        elif p_metric == 'average_recall':
-            recalls, average_recall = self.compute_recall(
-                filter_rates, ref_classifier_cm, filter, classifier, 
-                p_filtered_class, p_classifier_filtered_class, class_weights)
-            return average_recall
-        elif p_metric == 'accuracy':
-            accuracy = self.compute_accuracy(
-                filter_rates, ref_classifier_cm, filter, classifier, 
-                p_filtered_class, p_classifier_filtered_class, class_weights)   
-            return accuracy
-    
-    def get_filter_rates(self, components, original_filter, filtered_class):
-        # Get filter component
-        filter = self.get_alternative_of(original_filter, components) 
-        # Read CM
-        cm = np.load(os.path.join(
-            self.application_dir, 'src', filter, 'classification_performance', 'confusion_matrix.npy'))
-        # Read class names dictionary
-        class_names = pd.read_csv(os.path.join(
-            self.application_dir, 'src', filter, 'classification_performance', 'class_names_dictionary.csv'))
-        # Compute rates
-        filter_rates = {}
-        for cname in class_names['class']:
-            index = class_names['index'][class_names['class'] == cname].iloc[0]
-            if cname == filtered_class:
-                filter_rates['TN'] = cm[index, index]
-                filter_rates['FN'] = cm[1-index, index]
-            else:
-                filter_rates['TP'] = cm[index, index]
-                filter_rates['FP'] = cm[1-index, index]
-        return filter_rates
+            points = {}
+            for d, v in alternative_deployments.items():
+                points[d] = estimate_deployment(profiles, v['components'], v['dependencies'], components)
+                points[d]['metric'] = performance[d]['metric_value']
+            _, dominated = get_pareto_front(points, keep=['base'])
+
+        report = {}
+        for d, (dominator, reasons) in dominated.items():
+            report[d] = {'components': list(alternative_deployments[d]['components']), 
+                         'dominated_by': list(alternative_deployments[dominator]['components']), 
+                         'reasons': reasons}
+        if dominated:
+            print("             " + "- {} dominated alternative deployments pruned (metric: {}):".format(
+                len(dominated), metric))
+            for d in report:
+                print("               {} dominated by {}: {}".format(
+                    report[d]['components'], report[d]['dominated_by'], ', '.join(report[d]['reasons'])))
+        report_file = os.path.join(self.application_dir, 'aisprint', 'designs', 'dominated_deployments.yaml')
+        os.makedirs(os.path.dirname(report_file), exist_ok=True)
+        with open(report_file, 'w') as f:
+            yaml.dump({'dominated_deployments': report}, f, sort_keys=False)
+
+        alternative_deployments = {d: v for d, v in alternative_deployments.items() if d not in dominated}
+        performance = {d: v for d, v in performance.items() if d not in dominated}
+        return alternative_deployments, performance
     
-    def refactor_classifier_cm(self, components, original_classifier):
-        # Get classifier component
-        classifier = self.get_alternative_of(original_classifier, components) 
-        # Read CM
-        cm = np.load(os.path.join(
-            self.application_dir, 'src', classifier, 'classification_performance', 'confusion_matrix.npy'))
-        # Read class names dictionary
-        class_names = pd.read_csv(os.path.join(
-            self.application_dir, 'src', classifier, 'classification_performance', 'class_names_dictionary.csv'))
-        # Compute confusion matrix in the form of dictionary (with class names) 
-        ref_cm = {}
-        for cname in class_names['class']:
-            index = class_names['index'][class_names['class'] == cname].iloc[0]
-            ref_cm[cname] = {}
-            for cname2 in class_names['class']:
-                index2 = class_names['index'][class_names['class'] == cname2].iloc[0]
-                ref_cm[cname][cname2] = cm[index, index2]
-        return ref_cm 
-        
     def process_annotations(self, args=None):
         ''' Get partitionable models and generate partition designs by running SPACE4AIDPartitioner.
         ''' 
@@ -343,16 +144,13 @@ class ModelPerformanceManager(AnnotationManager):
         # Generate alternative deployments and their performance 
         # ------------------------------------------------------
 
-        # Get alternative deployments
-        alternative_deployments = self.get_alternative_deployments()
-
         print("\n")
         print("[AI-SPRINT]: " + "Computing metrics for alternative deployments..")
         p_metric = None
         p_metric_thr = None
         p_filtered_class = None
         p_classifier_filtered_class = None
-        original_filter = None
+        original_filters = []
         original_classifier = None
         for _, component_arguments in self.annotations.items():
             if 'model_performance' in component_arguments:
@@ -375,27 +173,44 @@ class ModelPerformanceManager(AnnotationManager):
                     if metric_thr is not None:
                         p_metric_thr = metric_thr 
                 else:
-                    original_filter = component_name
+                    original_filters.append(component_name)
                     if filtered_class is not None:
+                        if p_filtered_class is not None and filtered_class != p_filtered_class:
+                            raise Exception("The 'model_performance' filters must filter out the same class " + 
+                                            "(found '{}' and '{}').".format(p_filtered_class, filtered_class))
                         p_filtered_class = filtered_class 
         # ----------------------
         
         # Compute metrics
         # ---------------
+        # Filters of the pipeline, from the first one to the classifier
+        pipeline = self.get_pipeline(original_filters, original_classifier)
+        alternative_components = self.application_model.get_alternative_components()
+        stages = [[c] + alternative_components.get(c, []) for c in pipeline]
+        classifiers = [original_classifier] + alternative_components.get(original_classifier, [])
+
+        # The value of the metric chosen by the user is computed for the deployments of the pipeline 
+        # (filters composed in series), pruning the ones that cannot reach the threshold
+        metrics = FilterClassifierMetrics(
+            ConfusionMatrices(self.application_dir), p_filtered_class, p_classifier_filtered_class, 
+            load_class_weights(self.application_dir))
+        pipeline_search = PipelineSearch(metrics, stages, classifiers)
+        pipeline_deployments = pipeline_search.search(
+            p_metric, float(p_metric_thr) if p_metric_thr is not None else None)
 
-        deployments_metric = {}
-        for d, v in alternative_deployments.items():
-            # Get CM with class names 
-            ref_classifier_cm = self.refactor_classifier_cm(v['components'], original_classifier)
-            # Get filter TP, FP, FN, TN
-            filter_rates = self.get_filter_rates(v['components'], original_filter, p_filtered_class)
-
-            # Compute the value of the metric chosen by the user
-            metric_value = self.compute_metric(
-                v['components'], filter_rates, ref_classifier_cm, original_filter, original_classifier, 
-                p_metric, p_filtered_class, p_classifier_filtered_class)
-            
-            deployments_metric[d] = metric_value
+        # Get alternative deployments
+        alternative_deployments, performance = self.get_alternative_deployments(
+            pipeline, original_classifier, pipeline_deployments)
+        if pipeline_search.pruned > 0:
+            num_deployments = 1
+            for c in self.application_model.dag['System']['components']:
+                num_deployments *= 1 + len(alternative_components.get(c, []))
+            print("             " + "- {} alternative deployments pruned by metric_thr ({})".format(
+                num_deployments - len(alternative_deployments), p_metric_thr))
+
+        # Drop the alternatives dominated by cheaper or faster ones with a better metric
+        alternative_deployments, performance = self.prune_dominated_deployments(
+            alternative_deployments, performance, p_metric)
         
         # Save result in space4ai-r
         deployments_performance = {}
@@ -409,13 +224,11 @@ class ModelPerformanceManager(AnnotationManager):
             temp_dict[d] = {}
             temp_dict[d]['components'] = list(v['components'])
             # substitute with the correct probability of the alternative
-            # transition probability = TP + FP (of the filter)
-            # Get filter TP, FP, FN, TN
-            filter_rates = self.get_filter_rates(v['components'], original_filter, p_filtered_class)
             temp_dict[d]['dependencies'] = [
-                [v['dependencies'][0][0], v['dependencies'][0][1], np.round(filter_rates['TP'] + filter_rates['FP'], 4).item()]]
-            temp_dict[d]['metric_value'] = np.round(deployments_metric[d], 4).item()
-            sorted_names.append({'name': d, 'metric_value': deployments_metric[d]})
+                [dependency[0], dependency[1], np.round(probability, 4).item()] 
+                for dependency, probability in zip(v['dependencies'], performance[d]['probabilities'])]
+            temp_dict[d]['metric_value'] = np.round(performance[d]['metric_value'], 4).item()
+            sorted_names.append({'name': d, 'metric_value': performance[d]['metric_value']})
 
         sorted_names = sorted(sorted_names, key=lambda d: d['metric_value'], reverse=True)
         deployments_performance['System']['sorted_deployments_performance'] = []
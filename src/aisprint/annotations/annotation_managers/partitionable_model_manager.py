@@ -4,6 +4,8 @@ import yaml
 from .annotation_manager import AnnotationManager
 from aisprint.space4aidpartitioner import SPACE4AIDPartitioner
 from aisprint.space4aidpartitioner import CodePartitioner
+from aisprint.space4aidpartitioner.cost_model import get_partition_profile
+from aisprint.utils import update_component_partitions
 
 
 class PartitionableModelManager(AnnotationManager):
@@ -19,7 +21,14 @@ class PartitionableModelManager(AnnotationManager):
 
     def process_annotations(self, args=None):
         ''' Get partitionable models and generate partition designs by running SPACE4AIDPartitioner.
+
+            Input:
+                - args: Python dict with the following (optional) items
+                    - components: names of the components to be partitioned (default: all)
+                    - num_workers: number of workers of the partitioners (default: number of CPUs)
         ''' 
+        components = (args or {}).get('components')
+        num_workers = (args or {}).get('num_workers')
 
         # SPACE4AI-D-partitioner
         # ----------------------
@@ -29,6 +38,8 @@ class PartitionableModelManager(AnnotationManager):
         for _, component_arguments in self.annotations.items():
             if 'partitionable_model' in component_arguments:
                 annotation_exists = True
+                if components is not None and component_arguments['component_name']['name'] not in components:
+                    continue
                 onnx_file = component_arguments['partitionable_model']['onnx_file'] 
                 component_name = component_arguments['component_name']['name']
 
@@ -36,24 +47,26 @@ class PartitionableModelManager(AnnotationManager):
                     num_partitions = component_arguments['partitionable_model']['num_partitions']
                 except:
                     num_partitions = 1
+                num_segments = component_arguments['partitionable_model'].get('num_segments', 2)
+                boundary_codec = component_arguments['partitionable_model'].get('boundary_codec', None)
+
+                # Resources of the partitions (if defined in the candidate deployments)
+                # used to rank the cuts by estimated latency
+                profile = get_partition_profile(self.application_dir, component_name)
 
                 partitioner = SPACE4AIDPartitioner(
                     self.application_dir, component_name, onnx_file)
-                found_partitions = partitioner.get_partitions(num_partitions=num_partitions)
+                found_partitions = partitioner.get_partitions(
+                    num_partitions=num_partitions, num_workers=num_workers, profile=profile, 
+                    num_segments=num_segments, boundary_codec=boundary_codec)
 
                 found_partitions = ['base'] + found_partitions
 
-                component_partitions_file = os.path.join(self.designs_dir, 'component_partitions.yaml')
-                if not os.path.exists(component_partitions_file):
-                    component_partitions = {'components': {
-                        component_name: {'partitions': found_partitions}}}
-                else:
-                    with open(component_partitions_file, 'r') as f:
-                        component_partitions = yaml.safe_load(f)
-                        component_partitions['components'][component_name] = {
-                            'partitions': found_partitions}
-                with open(component_partitions_file, 'w') as f:
-                    yaml.dump(component_partitions, f)
+                component_dict = {'partitions': found_partitions}
+                # Size of the tensors crossing each cut (after the boundary codec)
+                if partitioner.boundaries:
+                    component_dict['boundaries'] = partitioner.boundaries
+                update_component_partitions(self.designs_dir, component_name, component_dict)
         # ----------------------
 
         if annotation_exists:
@@ -61,8 +74,9 @@ class PartitionableModelManager(AnnotationManager):
             # ----------------
             print("\n")
             print("[AI-SPRINT]: " + "Automatic generating the code of the found partitions..")
-            code_partitioner = CodePartitioner(application_dir=self.application_dir)
-            code_partitioner.generate_code_partitions()
+            code_partitioner = CodePartitioner(
+                application_dir=self.application_dir, application_model=self.application_model)
+            code_partitioner.generate_code_partitions(num_workers=num_workers, components=components)
             # ----------------
         else:
             print("\n")
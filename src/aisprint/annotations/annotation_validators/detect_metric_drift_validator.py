@@ -3,7 +3,36 @@ from .annotation_validator import AnnotationValidator
 class DetectMetricDriftValidator(AnnotationValidator):
 
     def _check_arguments(self, component_name, arguments):
-        pass
+
+        # Check 'detection_interval' argument
+        # -----------------------------------
+        # Either a float or int (all the fields) or one for each field: a list of lists
+        # (one list for each metric) or a list (fields of a single metric)
+        if 'detection_interval' in arguments and isinstance(arguments['detection_interval'], list):
+            metrics = arguments.get('metric')
+            if isinstance(metrics, str):
+                metrics = [metrics]
+            fields = arguments.get('field')
+            if isinstance(fields, str):
+                fields = [[fields]]
+            detection_intervals = arguments['detection_interval']
+            if not all(isinstance(intervals, list) for intervals in detection_intervals):
+                if any(isinstance(intervals, list) for intervals in detection_intervals):
+                    raise Exception("'detection_interval' argument must be a float or int, a list or a list of lists.")
+                # Fields of a single metric
+                detection_intervals = [detection_intervals]
+            if len(detection_intervals) != len(metrics):
+                raise Exception(
+                    "'detection_interval' argument must have one list of intervals for each metric " +
+                    "({} metrics, {} lists).".format(len(metrics), len(detection_intervals)))
+            for metric, metric_fields, intervals in zip(metrics, fields, detection_intervals):
+                if len(intervals) != len(metric_fields):
+                    raise Exception(
+                        "'detection_interval' argument must have one interval for each field of " +
+                        "metric '{}' ({} fields, {} intervals).".format(metric, len(metric_fields), len(intervals)))
+                for interval in intervals:
+                    if isinstance(interval, bool) or not isinstance(interval, (int, float)) or interval <= 0:
+                        raise Exception("'detection_interval' values must be positive floats or ints.")
 
     def _check_arguments_validity(self):
         for component_script, annotations in self.annotations.items():
@@ -1,6 +1,7 @@
 import numpy as np
 
 from .annotation_validator import AnnotationValidator
+from ...onnx_inference.wire_format import BOUNDARY_CODECS
 
 class PartitionableModelValidator(AnnotationValidator):
 
@@ -10,11 +11,21 @@ class PartitionableModelValidator(AnnotationValidator):
             raise RuntimeError("'onnx_file' argument required in 'partitionable_model' annotation. ")
         # Check number of arguments
         num_arguments = len(list(arguments.keys()))
-        if len(list(arguments.keys())) > 2:
-            raise RuntimeError("Annotation 'partitionable_model' takes maximum 2 arguments ({}).".format(num_arguments))
+        if len(list(arguments.keys())) > 4:
+            raise RuntimeError("Annotation 'partitionable_model' takes maximum 4 arguments ({}).".format(num_arguments))
         # Check 'onnx_file' is a string
         if not isinstance(arguments['onnx_file'], str):
             raise TypeError("'onnx_file' argument must be a string.")
+        # Check 'num_segments' is an integer >= 2
+        if 'num_segments' in arguments:
+            if not isinstance(arguments['num_segments'], int) or isinstance(arguments['num_segments'], bool):
+                raise TypeError("'num_segments' argument must be an integer.")
+            if arguments['num_segments'] < 2:
+                raise ValueError("'num_segments' argument must be greater or equal than 2.")
+        # Check 'boundary_codec' is one of the supported codecs
+        if 'boundary_codec' in arguments:
+            if arguments['boundary_codec'] not in BOUNDARY_CODECS:
+                raise ValueError("'boundary_codec' argument must be one in {}.".format(BOUNDARY_CODECS))
 
     def _check_arguments_validity(self):
         for component_script, annotations in self.annotations.items():
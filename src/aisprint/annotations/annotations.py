@@ -1,20 +1,110 @@
 import os
+import json
 import functools
 import time
 import datetime
-from ..monitoring import report_execution_time
+import contextvars
+from ..monitoring import report_execution_time, report_phase_time
+
+# Execution context of the running component (set while the 'exec_time' wrapper runs)
+_active_context = contextvars.ContextVar('aisprint_active_context', default=None)
+
+@functools.lru_cache(maxsize=64)
+def _parse_event_time(event):
+    '''Parse the eventTime of the Event JSON string (cached, the same event is parsed once).'''
+    event_time = json.loads(event).get("Records", [{}])[0].get("eventTime", '')
+    if not event_time:
+        return None
+    event_time = datetime.datetime.strptime(event_time, "%Y-%m-%dT%H:%M:%S.%fZ")
+    return event_time.replace(tzinfo=datetime.timezone.utc).timestamp()
 
 def get_start_time_from_event(event_info, default=0):
     '''Helper function to extract the eventTime from the Event JSON.'''
     try:
-        event_time = event_info.get("Records", [{}])[0].get("eventTime", '')
-        if event_time:
-            return time.mktime(datetime.datetime.strptime(event_time, "%Y-%m-%dT%H:%M:%S.%fZ").timetuple())
+        if isinstance(event_info, dict):
+            event_info = json.dumps(event_info)
+        event_time = _parse_event_time(event_info)
+        if event_time is not None:
+            return event_time
         else:
             return default
     except:
         return default
 
+class ExecutionContext():
+    ''' Static runtime information of a component, resolved once when the
+        component is decorated (it does not change between invocations).
+    '''
+
+    def __init__(self):
+        self.kci = os.getenv('KCI')
+        self.resource_id = os.getenv('RESOURCE_ID')
+        self.component_name = os.getenv('COMPONENT_NAME')
+
+class InvocationContext():
+    ''' Runtime information of an invocation of a component: the static information
+        of the component and the UUID and EVENT of the request, read at each invocation.
+    '''
+
+    def __init__(self, context):
+        self.kci = context.kci
+        self.resource_id = context.resource_id
+        self.component_name = context.component_name
+        self.uuid = os.getenv('UUID')
+        self.event = os.getenv('EVENT', '')
+
+def _run_and_report(func, args, kwargs, context):
+    ''' Run 'func' and report its execution time.
+        Durations are measured with the monotonic high-resolution clock,
+        while the wall-clock time is read only once to timestamp the execution.
+    '''
+    context = InvocationContext(context)
+    start_time_func = time.time()
+    start_ns = time.perf_counter_ns()
+    token = _active_context.set(context)
+    try:
+        value = func(*args, **kwargs)
+    finally:
+        _active_context.reset(token)
+    end_time_func = start_time_func + (time.perf_counter_ns() - start_ns) / 1e9
+    start_time_job = get_start_time_from_event(context.event, start_time_func)
+    report_execution_time(context.uuid, context.kci, context.resource_id, context.component_name,
+                          start_time_job, start_time_func, end_time_func)
+    return value
+
+class phase():
+    ''' Context manager recording the execution time of a named phase of a component
+    (e.g., 'pre-processing', 'inference', 'post-processing').
+    The time is reported only when the phase runs within a component annotated with 'exec_time',
+    otherwise the context manager does nothing.
+        Parameters:
+            name (str): name of the phase.
+        Usage:
+            with phase('pre-processing'):
+                ...
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        self._context = None
+
+    def __enter__(self):
+        self._context = _active_context.get()
+        if self._context is not None:
+            self._start_time = time.time()
+            self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        context = self._context
+        # Failed phases are not reported, as for 'exec_time'
+        if context is None or exc_type is not None:
+            return False
+        end_time = self._start_time + (time.perf_counter_ns() - self._start_ns) / 1e9
+        report_phase_time(context.uuid, context.kci, context.resource_id, context.component_name,
+                          self.name, self._start_time, end_time)
+        return False
+
 def exec_time(local_time_thr=None, global_time_thr=None, prev_components=None):
     ''' 'exec_time' QoS Annotation. 
     It allows users to define local and/global time constraints.
@@ -30,21 +120,13 @@ def exec_time(local_time_thr=None, global_time_thr=None, prev_components=None):
         Execution:
             It provides the runtime information to be saved to the InfluxDB database 
             through the 'to_monitoring_tool' utility function.
+            Phases of the component marked with the 'phase' context manager are reported as well.
     '''
     def decorator_exec_time(func):
+        context = ExecutionContext()
         @functools.wraps(func)
         def wrapper_exec_time(*args, **kwargs):
-            start_time_func = time.time()
-            value = func(*args, **kwargs)
-            end_time_func = time.time()
-            uuid = os.getenv('UUID')
-            kci = os.getenv('KCI')
-            resource_id = os.getenv('RESOURCE_ID')
-            component_name = os.getenv('COMPONENT_NAME')
-            start_time_job = get_start_time_from_event(os.getenv('EVENT', {}), start_time_func)
-            report_execution_time(uuid, kci, resource_id, component_name, 
-                                  start_time_job, start_time_func, end_time_func)
-            return value
+            return _run_and_report(func, args, kwargs, context)
         return wrapper_exec_time
     return decorator_exec_time
 
@@ -81,7 +163,7 @@ def expected_throughput(rate):
         return wrapper_expected_throughput
     return decorator_expected_throughput
 
-def partitionable_model(onnx_filei, num_partitions):
+def partitionable_model(onnx_filei, num_partitions, num_segments=2, boundary_codec=None):
     ''' 'partitionable_model' QoS Annotation. 
     It allows users to define a partitionable deep-neural-network (DNN) based component. 
     Partitionable components are automatically split into partitions if needed by 
@@ -89,6 +171,12 @@ def partitionable_model(onnx_filei, num_partitions):
     neural model.
         Parameters:
             onnx_file (str): path to the ONNX file representing the used model.
+            num_partitions (int): maximum number of partitions to be generated.
+            num_segments (int): number of segments of each partition (default: 2), 
+                i.e., the number of consecutive components the model is split into.
+            boundary_codec (str): codec applied to the tensors sent between the segments,
+                one in 'fp16', 'int8' (lossy quantization), 'zlib', 'zstd', 'lz4' (lossless
+                compression). Default: None (float32 tensors are sent as they are).
         Execution:
             No additional functionality.
     '''
@@ -171,7 +259,7 @@ def detect_metric_drift(metric, field, statistical_test, test_threshold,
                 - "fisher-exact-test": binary
                 - "chi-squared": categorical
             test_threshold (float): test threshold for accepting the null hypothesis.
-            detection_interval (float): frequency (in hours) at which the detection algorithm is run
+            detection_interval (float or list): frequency (in hours) at which the detection algorithm is run (one for each field if list)
             monitoring_period (int): number of samples to consider for the test (window size)
             data_collection_period (float): period (in hours) during which new data must be collected (e.g., for re-training)
             notification_endpoint (string): endpoint to notify the user about the drift
@@ -213,22 +301,16 @@ def annotation(annotation_dict):
             and the values are the corresponding parameters.
     '''
     def decorator_annotation(func):
+        # In the case the annotated component has a time constraint we need to 
+        # implement the same functionality of the original 'exec_time' decorator.
+        if 'exec_time' in annotation_dict:
+            context = ExecutionContext()
+            @functools.wraps(func)
+            def wrapper_annotation(*args, **kwargs):
+                return _run_and_report(func, args, kwargs, context)
+            return wrapper_annotation
         @functools.wraps(func)
         def wrapper_annotation(*args, **kwargs):
-            # In the case the annotated component has a time constraint we need to 
-            # implement the same functionality of the original 'exec_time' decorator.
-            if 'exec_time' in annotation_dict:
-                start_time_func = time.time()
-                value = func(*args, **kwargs)
-                end_time_func = time.time()
-                uuid = os.getenv('UUID')
-                kci = os.getenv('KCI')
-                resource_id = os.getenv('RESOURCE_ID')
-                component_name = os.getenv('COMPONENT_NAME')
-                start_time_job = get_start_time_from_event(os.getenv('EVENT', {}), start_time_func)
-                report_execution_time(uuid, kci, resource_id, component_name, 
-                                      start_time_job, start_time_func, end_time_func)
-                return value
             value = func(*args, **kwargs)
             return value
         return wrapper_annotation
@@ -0,0 +1,230 @@
+import os
+import threading
+
+import yaml
+
+try:
+    # C-accelerated loader (requires PyYAML built with LibYAML)
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+
+def load_yaml(filename):
+    ''' Load the YAML file 'filename' with the fastest available safe loader.
+    '''
+    with open(filename, 'r') as f:
+        return yaml.load(f, Loader=SafeLoader)
+
+
+class ApplicationModel():
+    ''' Parsed and indexed configuration of an AI-SPRINT application, shared by the
+        stages of the design pipeline: the DAG, the annotations, the candidate deployments
+        and resources, and the partitions of the components.
+
+        Each file is parsed once and indexed by component name (constant-time lookups).
+        The files are written by the pipeline itself (e.g., the annotations are parsed
+        again, the partitions are found by the partitioners), thus a file is parsed again
+        only if its size or modification time changed since the last load.
+
+        NOTE: the returned dictionaries are shared, thus they must not be modified.
+
+        Parameters:
+            application_dir (str): path to the AI-SPRINT application.
+    '''
+
+    def __init__(self, application_dir):
+        self.application_dir = application_dir
+        self.common_config_dir = os.path.join(application_dir, 'common_config')
+        self.designs_dir = os.path.join(application_dir, 'aisprint', 'designs')
+        # filename: ((inode, size, modification time), parsed file, indices)
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def _load(self, filename, build_index=None):
+        ''' Return (parsed file, indices) of 'filename', (None, None) if it does not exist.
+        '''
+        try:
+            st = os.stat(filename)
+        except FileNotFoundError:
+            return None, None
+        key = (st.st_ino, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._files.get(filename)
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+        data = load_yaml(filename)
+        index = build_index(data) if build_index is not None and data is not None else None
+        with self._lock:
+            self._files[filename] = (key, data, index)
+        return data, index
+
+    # Parsed files
+    # ------------
+
+    def load_file(self, filename):
+        ''' Parsed YAML file 'filename' (e.g., the DAG of a deployment), cached as the
+            application files. None if the file does not exist.
+        '''
+        return self._load(filename)[0]
+
+    @property
+    def dag(self):
+        ''' Parsed application_dag.yaml.
+        '''
+        return self._load(os.path.join(self.common_config_dir, 'application_dag.yaml'))[0]
+
+    @property
+    def application_name(self):
+        return self.dag['System']['name']
+
+    @property
+    def annotations(self):
+        ''' Parsed annotations.yaml ({main path: annotations of the component}).
+        '''
+        return self._load(os.path.join(self.common_config_dir, 'annotations.yaml'),
+                          self._index_annotations)[0]
+
+    @property
+    def candidate_deployments(self):
+        ''' Parsed candidate_deployments.yaml (None if missing).
+        '''
+        return self._load(os.path.join(self.common_config_dir, 'candidate_deployments.yaml'),
+                          self._index_candidate_deployments)[0]
+
+    @property
+    def candidate_resources(self):
+        ''' Parsed candidate_resources.yaml (None if missing).
+        '''
+        return self._load(os.path.join(self.common_config_dir, 'candidate_resources.yaml'),
+                          self._index_candidate_resources)[0]
+
+    @property
+    def component_partitions(self):
+        ''' Parsed component_partitions.yaml of the designs (None if missing).
+        '''
+        return self._load(os.path.join(self.designs_dir, 'component_partitions.yaml'))[0]
+
+    # Indices
+    # -------
+
+    def _index_annotations(self, annotations):
+        # component name: (main path, annotations)
+        index = {}
+        for main_path, component_annotations in annotations.items():
+            index[component_annotations['component_name']['name']] = (main_path, component_annotations)
+        return index
+
+    def _index_candidate_deployments(self, candidate_deployments):
+        # component name (e.g., 'C', 'C_partitionX_1'): candidate deployment
+        index = {}
+        for component_dict in (candidate_deployments.get('Components') or {}).values():
+            index.setdefault(str(component_dict.get('name', '')).strip(), component_dict)
+        return index
+
+    def _index_candidate_resources(self, candidate_resources):
+        # 'layers': {layer number: resources}, 'resources': {resource name: resource}
+        layers, resources = {}, {}
+        for domain in candidate_resources['System']['NetworkDomains'].values():
+            for layer_key, layer in (domain.get('ComputationalLayers') or {}).items():
+                layer_number = int(layer.get('number', layer_key.split('computationalLayer')[-1]))
+                for resource in (layer.get('Resources') or {}).values():
+                    layers.setdefault(layer_number, []).append(resource)
+                    resources.setdefault(resource.get('name'), resource)
+        return {'layers': layers, 'resources': resources}
+
+    def _annotations_index(self):
+        return self._load(os.path.join(self.common_config_dir, 'annotations.yaml'),
+                          self._index_annotations)[1] or {}
+
+    def _candidate_deployments_index(self):
+        return self._load(os.path.join(self.common_config_dir, 'candidate_deployments.yaml'),
+                          self._index_candidate_deployments)[1] or {}
+
+    def _candidate_resources_index(self):
+        return self._load(os.path.join(self.common_config_dir, 'candidate_resources.yaml'),
+                          self._index_candidate_resources)[1] or {'layers': {}, 'resources': {}}
+
+    # Lookups
+    # -------
+
+    def get_component_annotations(self, component_name):
+        ''' Annotations of the component ({} if the component is not annotated).
+        '''
+        index = self._annotations_index()
+        return index.get(component_name, (None, {}))[1]
+
+    def has_annotation(self, component_name, which_annotation):
+        return which_annotation in self.get_component_annotations(component_name)
+
+    def get_annotated_components(self, which_annotation):
+        ''' Names of the components with the annotation 'which_annotation'.
+        '''
+        index = self._annotations_index()
+        return [name for name, (_, a) in index.items() if which_annotation in a]
+
+    def get_alternative_components(self):
+        return self.dag['System'].get('alternative_components') or {}
+
+    def get_component_folder(self, component_name, dag=None):
+        ''' Folder of the code of the component (None if not found). The folder of an alternative
+            component (in 'dag', default: the application DAG) is next to the one of its parent.
+        '''
+        index = self._annotations_index()
+        if component_name in index:
+            return index[component_name][0].split('main.py')[0]
+        if dag is None:
+            dag = self.dag
+        for parent, alternatives in (dag['System'].get('alternative_components') or {}).items():
+            if parent in index and component_name in alternatives:
+                main_path = index[parent][0]
+                # remove basename
+                no_basename = main_path.rsplit(os.path.basename(os.path.normpath(
+                    main_path.split('main.py')[0])), 1)[0]
+                return os.path.join(no_basename, component_name)
+        return None
+
+    def get_partitions(self, component_name):
+        ''' Partitions (designs) of the component, ['base'] if not partitioned.
+        '''
+        component_partitions = self.component_partitions or {'components': {}}
+        return component_partitions['components'].get(component_name, {}).get('partitions', ['base'])
+
+    def get_candidate_deployment(self, component_name):
+        ''' Candidate deployment of the component (e.g., 'C' or 'C_partitionX_1'), None if missing.
+        '''
+        index = self._candidate_deployments_index()
+        return index.get(component_name)
+
+    def get_candidate_layers(self, component_name):
+        ''' Candidate execution layers of the component ([] if missing).
+        '''
+        candidate = self.get_candidate_deployment(component_name)
+        if candidate is None:
+            return []
+        return candidate.get('candidateExecutionLayers') or []
+
+    def get_layer_resources(self, layer):
+        ''' Candidate resources of the computational layer 'layer' (number).
+        '''
+        return self._candidate_resources_index()['layers'].get(layer, [])
+
+    def get_resource(self, resource_name):
+        ''' Candidate resource named 'resource_name', None if missing.
+        '''
+        return self._candidate_resources_index()['resources'].get(resource_name)
+
+
+# Models of the applications loaded by this process
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_application_model(application_dir):
+    ''' Return the ApplicationModel of the application, shared within the process.
+    '''
+    key = os.path.abspath(application_dir)
+    with _models_lock:
+        if key not in _models:
+            _models[key] = ApplicationModel(application_dir)
+        return _models[key]
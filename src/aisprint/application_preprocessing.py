@@ -2,67 +2,98 @@ import os
 import yaml
 import shutil
 
-from .utils import get_component_folder 
+from .utils import locked_file
+from .design_store import get_design_store
+from .application_model import get_application_model
 
 
 class ApplicationPreprocessor():
 
-    def __init__(self, application_dir):
+    def __init__(self, application_dir, application_model=None):
         
         self.application_dir = application_dir
+        # Parsed application files (see 'aisprint.application_model')
+        if application_model is None:
+            application_model = get_application_model(application_dir)
+        self.application_model = application_model
 
-    def create_base_design(self):
+    def get_components(self, dag_dict=None):
+        ''' Get the names of the components of the application, including the alternative components.
+        '''
+        if dag_dict is None:
+            dag_dict = self.application_model.dag
+        components = []
+        for component_name in dag_dict['System']['components']:
+            components.append(component_name)
+            # Check if the component has alternatives
+            if 'alternative_components' in dag_dict['System']:
+                if component_name in dag_dict['System']['alternative_components']:
+                    for alternative in dag_dict['System']['alternative_components'][component_name]:
+                        components.append(alternative)
+        return components
+
+    def create_base_design(self, components=None):
         ''' Create the base design and initialize the component partitions file.
+
+            Parameters:
+                components (list): names of the components whose designs are (re)created, 
+                    the designs of the other components are kept. If None, all the components.
         '''
 
         # Read DAG file
         # ----------------
         # DAG filename: 'application_dag.yaml' 
-        dag_file = os.path.join(self.application_dir, 'common_config', 'application_dag.yaml')
-        with open(dag_file, 'r') as f:
-            dag_dict = yaml.safe_load(f)
+        dag_dict = self.application_model.dag
         # ----------------
 
+        all_components = self.get_components(dag_dict)
+        if components is None:
+            components = all_components
+
         # Create base design
         # ---------------------
         print("\n")
         print("[AI-SPRINT]: " + "Starting creating base components' designs..")
         designs_dir = os.path.join(self.application_dir, 'aisprint', 'designs') 
+        # Files are materialized from the design store (hard links instead of copies)
+        design_store = get_design_store(self.application_dir)
         # For each component create a 'base' design
-        for component_name in dag_dict['System']['components']:
-            destination_dir = os.path.join(designs_dir, component_name, 'base')
+        for component_name in components:
+            # Previous designs of the component (base and partitions) are removed
+            component_dir = os.path.join(designs_dir, component_name)
+            if os.path.exists(component_dir):
+                shutil.rmtree(component_dir)
+            destination_dir = os.path.join(component_dir, 'base')
             
             # Get original folder name of the 'component_name'
-            component_folder = get_component_folder(self.application_dir, dag_dict, component_name)
+            component_folder = self.application_model.get_component_folder(component_name, dag_dict)
 
             # Copy code from the original folder to the 'component_name' design
-            shutil.copytree(component_folder, destination_dir)
-
-            # Check if the component has alternatives
-            if 'alternative_components' in dag_dict['System']:
-                if component_name in dag_dict['System']['alternative_components']:
-                    for alternative in dag_dict['System']['alternative_components'][component_name]:
-                        destination_dir = os.path.join(designs_dir, alternative, 'base')
-                        component_folder = get_component_folder(self.application_dir, dag_dict, alternative)
-                        shutil.copytree(component_folder, destination_dir)
+            design_store.materialize_tree(component_folder, destination_dir)
+        # The objects of the removed designs are dropped
+        design_store.prune()
 
         print("[AI-SPRINT]: " + "Done! Base designs created.")
 
         # Initialize the component_partitions.yaml in aisprint/designs
         print("\n")
         print("[AI-SPRINT]: " + "Preparing for SPACE4AI-D-partitioner..")
-        component_partitions = {'components': {}}
-        for component_name in dag_dict['System']['components']:
-            component_partitions['components'][component_name] = {}
-            component_partitions['components'][component_name]['partitions'] = ['base']
-            # Check if the component has alternatives
-            if 'alternative_components' in dag_dict['System']:
-                if component_name in dag_dict['System']['alternative_components']:
-                    for alternative in dag_dict['System']['alternative_components'][component_name]:
-                        component_partitions['components'][alternative] = {}
-                        component_partitions['components'][alternative]['partitions'] = ['base']
-        designs_dir = os.path.join(self.application_dir, 'aisprint', 'designs')
-        with open(os.path.join(designs_dir, 'component_partitions.yaml'), 'w') as f:
-            yaml.dump(component_partitions, f)
+        component_partitions_file = os.path.join(designs_dir, 'component_partitions.yaml')
+        with locked_file(component_partitions_file):
+            component_partitions = {'components': {}}
+            if os.path.exists(component_partitions_file):
+                with open(component_partitions_file, 'r') as f:
+                    component_partitions = yaml.safe_load(f) or component_partitions
+            # Partitions of the kept components are preserved
+            previous_partitions = component_partitions['components']
+            component_partitions['components'] = {}
+            for component_name in all_components:
+                if component_name in components or component_name not in previous_partitions:
+                    component_partitions['components'][component_name] = {}
+                    component_partitions['components'][component_name]['partitions'] = ['base']
+                else:
+                    component_partitions['components'][component_name] = previous_partitions[component_name]
+            with open(component_partitions_file, 'w') as f:
+                yaml.dump(component_partitions, f)
         print("[AI-SPRINT]: " + "Done! 'components_partitions.yaml' file initialized with base designs.")
         # ---------------------
\ No newline at end of file
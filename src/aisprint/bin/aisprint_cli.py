@@ -30,8 +30,12 @@ def new_application(application_name):
 
 @click.command()
 @click.option("--application_dir", help="Path to the AI-SPRINT application.", required=True)
-def design(application_dir):
-    run_design(application_dir)
+@click.option("--max_deployments", help="Maximum number of deployments generated besides the base one.", 
+              type=int, required=False)
+@click.option("--force", help="Run all the design stages, ignoring the build manifest.", is_flag=True, required=False)
+@click.option("--num_workers", help="Number of processes running the design stages.", type=int, required=False)
+def design(application_dir, max_deployments, force, num_workers):
+    run_design(application_dir, max_deployments, force, num_workers)
     print("\n")
     print("[AI-SPRINT]: " + "Done! Application designs and base deployment ready.")
 
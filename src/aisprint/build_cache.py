@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+
+import yaml
+
+from . import __version__
+from .design_store import get_design_store
+
+# Manifest of the design stages, relative to the application directory
+BUILD_MANIFEST_FILE = os.path.join('aisprint', '.build_manifest.yaml')
+
+# Files and directories not affecting the designs
+IGNORED_NAMES = ['__pycache__', '.DS_Store']
+
+
+def to_plain(value):
+    ''' Convert 'value' to plain Python types (e.g., tuples to lists, NumPy scalars to Python scalars)
+        to be stored in the manifest.
+    '''
+    if isinstance(value, dict):
+        return {str(k): to_plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(v) for v in value]
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+class BuildCache():
+    ''' Dependency-tracked cache of the stages of the design pipeline.
+
+        Each stage declares its inputs (file and directory digests, configuration values), hashed
+        in a single digest and stored in the manifest together with the stage outputs and (optional)
+        result. A stage is skipped if its digest is unchanged and its outputs still exist.
+
+        Parameters:
+            application_dir (str): path to the AI-SPRINT application.
+            force (bool): if True, all the stages are considered changed.
+    '''
+
+    def __init__(self, application_dir, force=False):
+        self.application_dir = application_dir
+        self.force = force
+        self.manifest_file = os.path.join(application_dir, BUILD_MANIFEST_FILE)
+        self.design_store = get_design_store(application_dir)
+        self.manifest = {'version': __version__, 'stages': {}, 'files': {}}
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r') as f:
+                manifest = yaml.safe_load(f) or {}
+            # A different version of the tools invalidates all the stages
+            if manifest.get('version') == __version__:
+                if not force:
+                    self.manifest['stages'] = manifest.get('stages', {})
+                self.manifest['files'] = manifest.get('files', {})
+
+    def _get_digest(self, path):
+        # Digests are cached in the manifest by (size, modification time), thus unchanged 
+        # files (e.g., large ONNX models) are not hashed again
+        st = os.stat(path)
+        key = os.path.relpath(os.path.abspath(path), os.path.abspath(self.application_dir))
+        cached = self.manifest['files'].get(key)
+        if cached is not None and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        digest = self.design_store.get_digest(path)
+        self.manifest['files'][key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def file_digest(self, path):
+        ''' Digest of the content of the file 'path' (None if missing).
+        '''
+        if not os.path.isfile(path):
+            return None
+        return self._get_digest(path)
+
+    def tree_digest(self, path):
+        ''' Digest of the content and relative paths of the files in the directory 'path' (None if missing).
+        '''
+        if not os.path.isdir(path):
+            return None
+        sha = hashlib.sha256()
+        for root, dirs, files in os.walk(path, followlinks=True):
+            dirs[:] = sorted([d for d in dirs if d not in IGNORED_NAMES])
+            for f in sorted(files):
+                if f in IGNORED_NAMES or f.endswith('.pyc'):
+                    continue
+                file_path = os.path.join(root, f)
+                sha.update(os.path.relpath(file_path, path).encode('utf-8'))
+                sha.update(self._get_digest(file_path).encode('utf-8'))
+        return sha.hexdigest()
+
+    def config_digest(self, filename):
+        ''' Digest of the file 'filename' in the 'common_config' directory.
+        '''
+        return self.file_digest(os.path.join(self.application_dir, 'common_config', filename))
+
+    def get_digest(self, inputs):
+        ''' Hash the inputs of a stage (JSON-serializable values).
+        '''
+        return hashlib.sha256(json.dumps(to_plain(inputs), sort_keys=True).encode('utf-8')).hexdigest()
+
+    def is_fresh(self, stage, digest):
+        ''' Check if the stage was already executed with the same inputs and its outputs exist.
+        '''
+        if self.force or stage not in self.manifest['stages']:
+            return False
+        entry = self.manifest['stages'][stage]
+        if entry['digest'] != digest:
+            return False
+        return all([os.path.exists(os.path.join(self.application_dir, output)) for output in entry['outputs']])
+
+    def get_result(self, stage):
+        return self.manifest['stages'][stage].get('result')
+
+    def record(self, stage, digest, outputs=(), result=None):
+        ''' Record the execution of the stage and save the manifest.
+
+            Parameters:
+                stage (str): name of the stage.
+                digest (str): digest of the inputs of the stage.
+                outputs (list): paths of the outputs, relative to the application directory.
+                result: value returned by the stage (plain types), returned when the stage is skipped.
+        '''
+        self.manifest['stages'][stage] = {'digest': digest, 'outputs': list(outputs), 'result': to_plain(result)}
+        self.save()
+
+    def invalidate(self, stage):
+        self.manifest['stages'].pop(stage, None)
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.manifest_file), exist_ok=True)
+        tmp_file = self.manifest_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            yaml.safe_dump(self.manifest, f, sort_keys=False)
+        os.replace(tmp_file, self.manifest_file)
@@ -3,6 +3,7 @@ import shutil
 import yaml
 
 from .deployment_generator import DeploymentGenerator
+from .tool_templates import copy_tool_dirs
 
 
 class AlternativeDeploymentGenerator(DeploymentGenerator): 
@@ -11,8 +12,11 @@ class AlternativeDeploymentGenerator(DeploymentGenerator):
         
         self.application_dir = application_dir
     
-    def create_dag(self, deployment_name, deployment):
-        
+    def build_dag(self, deployment_name, deployment):
+        ''' Build the DAG of the deployment (without writing it).
+
+            Return: the DAG dictionary of the deployment.
+        '''
         new_dag_dict = {'System': {}}
         new_dag_dict['System']['name'] = deployment_name
         new_dag_dict['System']['components'] = list(deployment['components'])
@@ -20,6 +24,10 @@ class AlternativeDeploymentGenerator(DeploymentGenerator):
 
         self.new_dag_dict = new_dag_dict
 
+        return new_dag_dict
+
+    def create_dag(self, deployment_name, deployment):
+        new_dag_dict = self.build_dag(deployment_name, deployment)
         with open(os.path.join(self.deployment_dir, 'application_dag.yaml'), 'w') as f:
             yaml.dump(new_dag_dict, f, sort_keys=False)
 
@@ -40,20 +48,7 @@ class AlternativeDeploymentGenerator(DeploymentGenerator):
         self.create_dag(deployment_name, deployment)
 
         # Copy tools directory
-        shutil.copytree(os.path.join(self.application_dir, 'space4ai-d'), 
-                        os.path.join(self.deployment_dir, 'space4ai-d'))
-        shutil.copytree(os.path.join(self.application_dir, 'space4ai-r'), 
-                        os.path.join(self.deployment_dir, 'space4ai-r'))
-        shutil.copytree(os.path.join(self.application_dir, 'oscar'), 
-                        os.path.join(self.deployment_dir, 'oscar'))
-        shutil.copytree(os.path.join(self.application_dir, 'oscarp'), 
-                        os.path.join(self.deployment_dir, 'oscarp'))
-        shutil.copytree(os.path.join(self.application_dir, 'pycompss'), 
-                        os.path.join(self.deployment_dir, 'pycompss'))
-        shutil.copytree(os.path.join(self.application_dir, 'im'), 
-                        os.path.join(self.deployment_dir, 'im'))
-        shutil.copytree(os.path.join(self.application_dir, 'ams'), 
-                        os.path.join(self.deployment_dir, 'ams'))
+        copy_tool_dirs(self.application_dir, self.deployment_dir)
 
         # Create 'src' with symbolic links to base designs
         os.makedirs(os.path.join(self.deployment_dir, 'src'))
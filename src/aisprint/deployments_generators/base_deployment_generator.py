@@ -3,6 +3,7 @@ import shutil
 import yaml
 
 from .deployment_generator import DeploymentGenerator
+from .tool_templates import copy_tool_dirs
 
 
 class BaseDeploymentGenerator(DeploymentGenerator): 
@@ -44,20 +45,7 @@ class BaseDeploymentGenerator(DeploymentGenerator):
                         os.path.join(self.deployment_dir, 'application_dag.yaml'))
 
         # Copy tools directory
-        shutil.copytree(os.path.join(self.application_dir, 'space4ai-d'), 
-                        os.path.join(self.deployment_dir, 'space4ai-d'))
-        shutil.copytree(os.path.join(self.application_dir, 'space4ai-r'), 
-                        os.path.join(self.deployment_dir, 'space4ai-r'))
-        shutil.copytree(os.path.join(self.application_dir, 'oscar'), 
-                        os.path.join(self.deployment_dir, 'oscar'))
-        shutil.copytree(os.path.join(self.application_dir, 'oscarp'), 
-                        os.path.join(self.deployment_dir, 'oscarp'))
-        shutil.copytree(os.path.join(self.application_dir, 'pycompss'), 
-                        os.path.join(self.deployment_dir, 'pycompss'))
-        shutil.copytree(os.path.join(self.application_dir, 'im'), 
-                        os.path.join(self.deployment_dir, 'im'))
-        shutil.copytree(os.path.join(self.application_dir, 'ams'), 
-                        os.path.join(self.deployment_dir, 'ams'))
+        copy_tool_dirs(self.application_dir, self.deployment_dir)
 
         # Create 'src' with symbolic links to base designs
         os.makedirs(os.path.join(self.deployment_dir, 'src'))
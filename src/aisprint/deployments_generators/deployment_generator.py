@@ -1,7 +1,8 @@
 import os
-import yaml
 from abc import ABC, abstractmethod
 
+from aisprint.application_model import get_application_model
+
 class DeploymentGenerator(ABC):
 
     def __init__(self, application_dir):
@@ -21,5 +22,15 @@ class DeploymentGenerator(ABC):
             os.makedirs(deployment_dir)
         self.deployment_dir = deployment_dir
 
-        with open(dag_filename, 'r') as f:
-            self.dag_dict = yaml.safe_load(f)
\ No newline at end of file
+        self.load_dag(dag_filename)
+
+    @property
+    def application_model(self):
+        ''' Parsed application files, shared by the generators (see 'aisprint.application_model').
+        '''
+        return get_application_model(self.application_dir)
+
+    def load_dag(self, dag_filename):
+        ''' Load the application DAG the deployment is built from.
+        '''
+        self.dag_dict = self.application_model.load_file(dag_filename)
\ No newline at end of file
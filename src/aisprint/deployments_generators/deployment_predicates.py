@@ -0,0 +1,320 @@
+import os
+from abc import ABC, abstractmethod
+
+from aisprint.utils import parse_dag
+from aisprint.application_model import get_application_model
+from aisprint.space4aidpartitioner.cost_model import get_network_profile
+
+
+def split_component_name(component):
+    ''' Split the name of a component of a deployment in (original component name, partition, segment),
+        e.g.: 'C_partition1_2' -> ('C', 'partition1', 2), 'C' -> ('C', None, None).
+    '''
+    splitted_name = component.rsplit('_partition', 1)
+    if len(splitted_name) == 1:
+        return component, None, None
+    which_partition, segment = splitted_name[1].split('_')
+    return splitted_name[0], 'partition' + which_partition, int(segment)
+
+def iter_layer_assignments(components, candidate_layers, predicates=()):
+    ''' Lazily enumerate the assignments of the components to their candidate layers, in the
+        same order of 'itertools.product'. The predicates are evaluated on each partial assignment
+        (prefix), thus all the assignments sharing an unfeasible prefix are pruned at once.
+
+        Parameters:
+            components (list): names of the components of the deployment.
+            candidate_layers (list): list of candidate layers of each component.
+            predicates (list): pruning predicates (see LayerPredicate).
+
+        Return: generator of tuples, with the layer of each component.
+    '''
+    assignment = []
+
+    def search(idx):
+        if idx == len(components):
+            yield tuple(assignment)
+            return
+        for layer in candidate_layers[idx]:
+            assignment.append(layer)
+            if all([predicate(components, assignment) for predicate in predicates]):
+                yield from search(idx + 1)
+            assignment.pop()
+
+    return search(0)
+
+
+class LayerPredicate(ABC):
+    ''' Pruning predicate of the layer assignments of a deployment.
+
+        A predicate is called with the components of the deployment and a partial assignment
+        (the layers of the first len(assignment) components), it checks only the constraints involving
+        the last assigned component and the previous ones, and returns False if the assignment
+        is unfeasible.
+    '''
+
+    name = 'predicate'
+
+    def __init__(self):
+        self.pruned = 0
+        self._cache = {}
+
+    def _prepare(self, components):
+        # Data depending only on the components, computed once per deployment
+        return None
+
+    @abstractmethod
+    def check(self, components, assignment, prepared):
+        ''' Return False if the partial assignment is unfeasible ('prepared' is the result of '_prepare').
+        '''
+
+    def __call__(self, components, assignment):
+        key = tuple(components)
+        if key not in self._cache:
+            self._cache[key] = self._prepare(components)
+        feasible = self.check(components, assignment, self._cache[key])
+        if not feasible:
+            self.pruned += 1
+        return feasible
+
+
+class LayerMonotonicity(LayerPredicate):
+    ''' Data flows from lower to higher computational layers: each component is assigned to a layer
+        which is not lower than the ones of its predecessors in the DAG (the segments of a partitioned
+        component follow the same rule, with the first segment receiving the inputs of the component
+        and the last one providing its outputs).
+
+        Parameters:
+            dag_dict (dict): parsed DAG (see 'aisprint.utils.parse_dag').
+    '''
+
+    name = 'layer monotonicity'
+
+    def __init__(self, dag_dict):
+        super().__init__()
+        self.dag_dict = dag_dict
+
+    def _prepare(self, components):
+        # Predecessors (indices) of each component of the deployment
+        first_segment = {}
+        last_segment = {}
+        segments = {}
+        for idx, component in enumerate(components):
+            component_name, which_partition, segment = split_component_name(component)
+            if which_partition is None:
+                first_segment[component_name] = last_segment[component_name] = idx
+                continue
+            segments[(component_name, segment)] = idx
+            if segment == 1:
+                first_segment[component_name] = idx
+            if component_name not in last_segment or segment > split_component_name(
+                    components[last_segment[component_name]])[2]:
+                last_segment[component_name] = idx
+
+        predecessors = [[] for _ in components]
+        for (component_name, segment), idx in segments.items():
+            if (component_name, segment - 1) in segments:
+                predecessors[idx].append(segments[(component_name, segment - 1)])
+        for component_name, next_dict in self.dag_dict.items():
+            if component_name not in last_segment:
+                continue
+            for next_component in next_dict['next']:
+                if next_component in first_segment:
+                    predecessors[first_segment[next_component]].append(last_segment[component_name])
+        return predecessors
+
+    def check(self, components, assignment, predecessors):
+        idx = len(assignment) - 1
+        layer = assignment[idx]
+        # Predecessors following the component in the enumeration order are checked
+        # when they are assigned, as successors
+        for predecessor in predecessors[idx]:
+            if predecessor < idx and assignment[predecessor] > layer:
+                return False
+        for successor, successor_predecessors in enumerate(predecessors[:idx]):
+            if idx in successor_predecessors and assignment[successor] < layer:
+                return False
+        return True
+
+
+class DeviceConstraints(LayerPredicate):
+    ''' A component can be assigned to a layer only if at least one of its candidate resources in the
+        layer satisfies the requirements of its containers (memory, computing units and trusted execution)
+        and the RAM required by its 'device_constraints' annotation.
+
+        Parameters:
+            candidate_deployments (dict): 'Components' of candidate_deployments.yaml.
+            candidate_resources (dict): parsed candidate_resources.yaml.
+            annotations (dict): parsed annotations (annotations.yaml).
+    '''
+
+    name = 'device constraints'
+
+    def __init__(self, candidate_deployments, candidate_resources, annotations):
+        super().__init__()
+        self.candidate_deployments = candidate_deployments
+        self.layers_resources = self._get_layers_resources(candidate_resources)
+        self.required_ram = {}
+        for _, component_annotations in annotations.items():
+            if 'device_constraints' in component_annotations:
+                ram = component_annotations['device_constraints'].get('ram')
+                if ram is not None:
+                    self.required_ram[component_annotations['component_name']['name']] = float(ram)
+        # Feasibility of each (component, layer)
+        self._feasible = {}
+
+    def _get_layers_resources(self, candidate_resources):
+        layers_resources = {}
+        for domain in candidate_resources['System']['NetworkDomains'].values():
+            for layer_key, layer in domain.get('ComputationalLayers', {}).items():
+                layer_number = int(layer.get('number', layer_key.split('computationalLayer')[-1]))
+                layers_resources.setdefault(layer_number, []).extend(layer.get('Resources', {}).values())
+        return layers_resources
+
+    def _get_candidate(self, component):
+        component_name, which_partition, segment = split_component_name(component)
+        searched_name = component_name
+        if which_partition is not None:
+            searched_name = component_name + '_partitionX_{}'.format(segment)
+        for candidate in self.candidate_deployments.values():
+            if candidate['name'] == searched_name:
+                return candidate
+        return None
+
+    def _resource_is_feasible(self, resource, container, required_ram):
+        memory = resource.get('memorySize')
+        if memory is not None:
+            if container.get('memorySize') is not None and float(container['memorySize']) > float(memory):
+                return False
+            if required_ram is not None and required_ram > float(memory):
+                return False
+        processors = resource.get('processors')
+        if processors:
+            computing_units = sum([processor.get('computingUnits', 1) for processor in processors.values()])
+            if container.get('computingUnits') is not None and float(container['computingUnits']) > computing_units:
+                return False
+        if container.get('trustedExecution', False):
+            # Trusted execution requires SGX processors
+            if not processors or not any([processor.get('SGXFlag', False) for processor in processors.values()]):
+                return False
+        return True
+
+    def is_feasible(self, component, layer):
+        ''' Check if 'component' can be assigned to 'layer'.
+        '''
+        if (component, layer) in self._feasible:
+            return self._feasible[(component, layer)]
+        feasible = True
+        candidate = self._get_candidate(component)
+        if candidate is not None and layer in self.layers_resources:
+            required_ram = self.required_ram.get(split_component_name(component)[0])
+            for container in (candidate.get('Containers') or {}).values():
+                candidate_resources = container.get('candidateExecutionResources')
+                resources = [resource for resource in self.layers_resources[layer]
+                             if not candidate_resources or resource.get('name') in candidate_resources]
+                if not any([self._resource_is_feasible(resource, container, required_ram)
+                            for resource in resources]):
+                    feasible = False
+                    break
+        self._feasible[(component, layer)] = feasible
+        return feasible
+
+    def check(self, components, assignment, prepared):
+        return self.is_feasible(components[len(assignment) - 1], assignment[-1])
+
+
+class QoSFeasibility(LayerPredicate):
+    ''' The time needed to transfer the tensors crossing the cuts of a partitioned component
+        (with the bandwidth and access delay of the network domain connecting the layers of the
+        segments) must not exceed the time constraints ('exec_time' annotation) of the component.
+        The thresholds of 'exec_time' are in milliseconds, while the transfer times are in seconds.
+        The transfer time is a lower bound of the execution time, thus only unfeasible assignments
+        are pruned. Cuts with unknown sizes or layers without a network domain are not checked.
+
+        Parameters:
+            partition_dict (dict): parsed component_partitions.yaml.
+            candidate_resources (dict): parsed candidate_resources.yaml.
+            annotations (dict): parsed annotations (annotations.yaml).
+    '''
+
+    name = 'QoS feasibility'
+
+    def __init__(self, partition_dict, candidate_resources, annotations):
+        super().__init__()
+        self.partition_dict = partition_dict
+        self.candidate_resources = candidate_resources
+        # Time constraint (in seconds) of each component
+        self.thresholds = {}
+        for _, component_annotations in annotations.items():
+            if 'exec_time' in component_annotations:
+                exec_time = component_annotations['exec_time']
+                thresholds = [float(exec_time[k]) for k in ['local_time_thr', 'global_time_thr']
+                              if exec_time.get(k) is not None]
+                if thresholds:
+                    # Milliseconds to seconds (unit of the transfer times)
+                    self.thresholds[component_annotations['component_name']['name']] = min(thresholds) / 1000
+        self._network_profiles = {}
+
+    def _get_network_profile(self, first_layer, second_layer):
+        key = (first_layer, second_layer)
+        if key not in self._network_profiles:
+            self._network_profiles[key] = get_network_profile(self.candidate_resources, first_layer, second_layer)
+        return self._network_profiles[key]
+
+    def _prepare(self, components):
+        # For each segment after the first one: (index of the previous segment, component name, cut size in bytes)
+        cuts = [None for _ in components]
+        segments = {}
+        for idx, component in enumerate(components):
+            component_name, which_partition, segment = split_component_name(component)
+            if which_partition is not None and component_name in self.thresholds:
+                segments[(component_name, which_partition, segment)] = idx
+        for (component_name, which_partition, segment), idx in segments.items():
+            previous = segments.get((component_name, which_partition, segment - 1))
+            if previous is None:
+                continue
+            boundaries = self.partition_dict['components'].get(component_name, {}).get('boundaries', {})
+            component_cuts = boundaries.get(which_partition, [])
+            if len(component_cuts) < segment - 1:
+                continue
+            encoded_bytes = component_cuts[segment - 2].get('encoded_bytes')
+            if encoded_bytes is not None:
+                cuts[idx] = (previous, component_name, encoded_bytes)
+        return cuts
+
+    def check(self, components, assignment, cuts):
+        idx = len(assignment) - 1
+        # Cuts whose segments are both assigned
+        assigned_cuts = [(segment_idx, cut) for segment_idx, cut in enumerate(cuts)
+                         if cut is not None and segment_idx <= idx and cut[0] <= idx]
+        # Only the cuts involving the last assigned component are new
+        new_cuts = [cut for segment_idx, cut in assigned_cuts if idx in [segment_idx, cut[0]]]
+        if not new_cuts:
+            return True
+        component_name = new_cuts[0][1]
+        transfer_time = 0.0
+        for segment_idx, cut in assigned_cuts:
+            if cut[1] != component_name:
+                continue
+            first_layer, second_layer = assignment[cut[0]], assignment[segment_idx]
+            if first_layer == second_layer:
+                continue
+            network_profile = self._get_network_profile(first_layer, second_layer)
+            if network_profile is not None:
+                transfer_time += network_profile.transfer_time(cut[2])
+        return transfer_time <= self.thresholds[component_name]
+
+
+def get_layer_predicates(application_dir, annotations, partition_dict=None, candidate_deployments=None):
+    ''' Build the pruning predicates of the layer assignments of an application.
+        Device constraints and QoS feasibility are checked only if the candidate_resources.yaml
+        file is available (and QoS feasibility only if the components are partitioned).
+    '''
+    dag_dict, _ = parse_dag(os.path.join(application_dir, 'common_config', 'application_dag.yaml'))
+    predicates = [LayerMonotonicity(dag_dict)]
+    candidate_resources = get_application_model(application_dir).candidate_resources
+    if candidate_resources is not None:
+        if candidate_deployments is not None:
+            predicates.append(DeviceConstraints(candidate_deployments, candidate_resources, annotations))
+        if partition_dict is not None:
+            predicates.append(QoSFeasibility(partition_dict, candidate_resources, annotations))
+    return predicates
@@ -0,0 +1,82 @@
+import os
+import json
+import hashlib
+
+from aisprint.design_store import get_design_store
+
+# Aliases of the deployments, relative to the application directory
+DEPLOYMENT_ALIASES_FILE = os.path.join('aisprint', 'deployments', 'deployment_aliases.yaml')
+
+
+class DeploymentSignature():
+    ''' Canonical signature of the deployments, identifying the equivalent ones.
+
+        The components of a deployment are normalized replacing the partition number with 'partitionX'
+        and adding the digest of the ONNX files of the segment, thus two partitions producing the same
+        segments (e.g., the same cut found twice) are equivalent. The signature is the hash of the
+        normalized DAG (components and dependencies) and layer assignment.
+
+        Parameters:
+            application_dir (str): path to the AI-SPRINT application.
+    '''
+
+    def __init__(self, application_dir):
+        self.designs_dir = os.path.join(application_dir, 'aisprint', 'designs')
+        self.design_store = get_design_store(application_dir)
+        # Digest of each (component, design)
+        self._segment_digests = {}
+
+    def get_segment_digest(self, component_name, design):
+        ''' Get the digest of the ONNX files of the design 'design' (e.g., 'partition1_2')
+            of the component. Return None for the 'base' design or if the design has no ONNX files.
+        '''
+        if design == 'base':
+            return None
+        if (component_name, design) not in self._segment_digests:
+            digests = []
+            onnx_dir = os.path.join(self.designs_dir, component_name, design, 'onnx')
+            if os.path.isdir(onnx_dir):
+                for root, _, files in os.walk(onnx_dir):
+                    for f in files:
+                        digests.append(self.design_store.get_digest(os.path.join(root, f)))
+            # The names of the ONNX files contain the partition number, thus only the content is used
+            self._segment_digests[(component_name, design)] = hashlib.sha256(
+                ''.join(sorted(digests)).encode('utf-8')).hexdigest() if digests else None
+        return self._segment_digests[(component_name, design)]
+
+    def normalize_component(self, component):
+        ''' Normalize the name of a component of a deployment DAG, e.g.:
+            'C_partition2_1' -> 'C_partitionX_1@<digest of the segment>'.
+        '''
+        splitted_name = component.rsplit('_partition', 1)
+        if len(splitted_name) == 1:
+            return component
+        component_name = splitted_name[0]
+        which_partition, segment = splitted_name[1].split('_')
+        normalized_name = component_name + '_partitionX_' + segment
+        digest = self.get_segment_digest(component_name, 'partition{}_{}'.format(which_partition, segment))
+        if digest is None:
+            # Unknown content: the partition is kept
+            return component
+        return normalized_name + '@' + digest
+
+    def get_signature(self, dag_dict, layers_assignment):
+        ''' Get the signature of a deployment.
+
+            Parameters:
+                dag_dict (dict): DAG of the deployment (application_dag.yaml format).
+                layers_assignment (dict): components-layers association of the deployment.
+
+            Return: the signature (hex string).
+        '''
+        components = dag_dict['System']['components']
+        dependencies = dag_dict['System']['dependencies'] or []
+        canonical = {
+            'components': sorted([self.normalize_component(c) for c in components]),
+            'dependencies': sorted([
+                [self.normalize_component(d[0]), self.normalize_component(d[1]), d[2]] for d in dependencies],
+                key=lambda d: json.dumps(d)),
+            'layers': sorted([
+                [self.normalize_component(c), layer] for c, layer in layers_assignment.items()],
+                key=lambda a: json.dumps(a))}
+        return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode('utf-8')).hexdigest()
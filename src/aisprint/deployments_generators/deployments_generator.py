@@ -1,4 +1,5 @@
 import os
+import re
 import shutil
 import yaml
 
@@ -9,105 +10,290 @@ from .deployment_generator import DeploymentGenerator
 from .base_deployment_generator import BaseDeploymentGenerator
 from .empty_deployment_generator import EmptyDeploymentGenerator
 from .alternative_deployment_generator import AlternativeDeploymentGenerator
+from .deployment_predicates import iter_layer_assignments, get_layer_predicates
+from .deployment_signature import DeploymentSignature, DEPLOYMENT_ALIASES_FILE
+from aisprint.application_model import get_application_model
 
 
 class DeploymentsGenerator(): 
 
-    def __init__(self, application_dir, alternative_deployments=None):
+    def __init__(self, application_dir, alternative_deployments=None, max_deployments=None, force=False,
+                 application_model=None):
         
         self.application_dir = application_dir
         
-        design_dir = os.path.join(self.application_dir, 'aisprint', 'designs') 
-        with open(os.path.join(application_dir, 'common_config', 'annotations.yaml'), 'r') as f:
-            self.annotations = yaml.safe_load(f)
-        if os.path.exists(os.path.join(design_dir, 'component_partitions.yaml')):
-            with open(os.path.join(design_dir, 'component_partitions.yaml'), 'r') as f:
-                self.partition_dict = yaml.safe_load(f)
+        # Parsed application files (see 'aisprint.application_model')
+        if application_model is None:
+            application_model = get_application_model(application_dir)
+        self.application_model = application_model
+        self.annotations = application_model.annotations
+        if application_model.component_partitions is not None:
+            self.partition_dict = application_model.component_partitions
         
         self.alternative_deployments = alternative_deployments
 
-        with open(os.path.join(self.application_dir, 'common_config', 'candidate_deployments.yaml'), 'r') as f:
-            self.candidate_deployments = yaml.safe_load(f)
-        self.candidate_deployments = self.candidate_deployments['Components']
+        self.candidate_deployments = application_model.candidate_deployments['Components']
+
+        # Maximum number of deployments generated besides the base one (None: no limit)
+        self.max_deployments = max_deployments
+        # If False, the folders of the unchanged deployments of a previous design are kept
+        self.force = force
+        self.deployments_dir = os.path.join(self.application_dir, 'aisprint', 'deployments')
+        # Predicates pruning the unfeasible layer assignments during the enumeration
+        self.predicates = get_layer_predicates(
+            self.application_dir, self.annotations, getattr(self, 'partition_dict', None), self.candidate_deployments)
     
-    def get_combinations(self):
+    def iter_combinations(self):
+        ''' Lazily enumerate the combinations of the components partitions (or 'base').
+        '''
         components = self.partition_dict['components']
         combinations = []
         for component in components:
             partitions = components[component]['partitions']
             filtered_partitions = np.unique([component + '_' + p.split('_')[0] for p in partitions])
             combinations.append(filtered_partitions)
-        return list(itertools.product(*combinations))
-    
-    def get_layer_combinations(self, combination):
+        return itertools.product(*combinations)
+
+    def get_num_segments(self, component_name, which_partition):
+        ''' Return the number of segments of the partition 'which_partition' (e.g., 'partition1')
+            of the component.
+        '''
+        partitions = self.partition_dict['components'][component_name]['partitions']
+        return len([p for p in partitions if p.split('_')[0] == which_partition])
+
+    def get_candidate_layers(self, combination):
+        ''' Get the components of the deployment defined by 'combination' (with a component 
+            for each segment of the partitions) and their candidate layers.
+
+            Return: (list of candidate layers, list of components) tuple.
+        '''
         combinations = []
         components_combination = []
         for component in combination:
             if 'base' == component.rsplit('_', 1)[1]:
-                for component_k in self.candidate_deployments:
-                    if self.candidate_deployments[component_k]['name'] == component.rsplit('_', 1)[0]:
-                        components_combination.append(component.rsplit('_', 1)[0])
-                        combinations.append(self.candidate_deployments[component_k]['candidateExecutionLayers'])
+                candidate = self.application_model.get_candidate_deployment(component.rsplit('_', 1)[0])
+                if candidate is not None:
+                    components_combination.append(component.rsplit('_', 1)[0])
+                    combinations.append(candidate['candidateExecutionLayers'])
             elif 'partition' in component.rsplit('_', 1)[1]:
-                for component_k in self.candidate_deployments:
-                    if self.candidate_deployments[component_k]['name'] == component.rsplit(
-                            '_partition', 1)[0] + '_partitionX_1':
-                        components_combination.append(component + '_1')
-                        combinations.append(self.candidate_deployments[component_k]['candidateExecutionLayers'])
-                for component_k in self.candidate_deployments:
-                    if self.candidate_deployments[component_k]['name'] == component.rsplit(
-                            '_partition', 1)[0] + '_partitionX_2':
-                        components_combination.append(component + '_2')
-                        combinations.append(self.candidate_deployments[component_k]['candidateExecutionLayers'])
-        return list(itertools.product(*combinations)), components_combination
-                
+                # Add a candidate for each segment of the partition ('partitionX_1', ..., 'partitionX_K')
+                component_name, which_partition = component.rsplit('_partition', 1)
+                for segment in range(1, self.get_num_segments(component_name, 'partition' + which_partition) + 1):
+                    candidate = self.application_model.get_candidate_deployment(
+                        component_name + '_partitionX_{}'.format(segment))
+                    if candidate is not None:
+                        components_combination.append(component + '_{}'.format(segment))
+                        combinations.append(candidate['candidateExecutionLayers'])
+                    else:
+                        print("[AI-SPRINT]: " + "WARNING: no '{}_partitionX_{}' component defined in ".format(
+                            component_name, segment) + "'candidate_deployments.yaml', the segment is not assigned to any layer.")
+        return combinations, components_combination
+
+    def iter_layer_combinations(self, combination):
+        ''' Lazily enumerate the feasible layer assignments of the deployment defined by 'combination', 
+            pruning them with the predicates during the enumeration.
+
+            Return: (generator of layer assignments, list of components) tuple.
+        '''
+        candidate_layers, components_combination = self.get_candidate_layers(combination)
+        return iter_layer_assignments(components_combination, candidate_layers, self.predicates), components_combination
+
+    def get_base_layers(self, combination):
+        ''' Get the layer assignment of the base deployment: the first candidate layer of each component.
+            The base deployment is never pruned.
+        '''
+        candidate_layers, components_combination = self.get_candidate_layers(combination)
+        if not all(candidate_layers):
+            return None, components_combination
+        return tuple([layers[0] for layers in candidate_layers]), components_combination
+
+    def budget_exhausted(self, num_deployment):
+        return self.max_deployments is not None and num_deployment >= self.max_deployments
+
+    def register_deployment(self, deployment_name, dag_dict, layers_assignment):
+        ''' Register the signature of a new deployment.
+            If an equivalent deployment already exists, the assignment is added to its aliases.
+
+            Return: True if the deployment is new, False otherwise.
+        '''
+        signature = self.signature.get_signature(dag_dict, layers_assignment)
+        if signature in self.signatures:
+            self.aliases[self.signatures[signature]]['aliases'].append(layers_assignment)
+            return False
+        self.signatures[signature] = deployment_name
+        self.aliases[deployment_name] = {'signature': signature, 'layers': layers_assignment, 'aliases': []}
+        return True
+
+    def get_previous_deployments(self):
+        ''' Get the signatures and layer assignments of the deployments created by the previous design (if any).
+        '''
+        aliases_file = os.path.join(self.application_dir, DEPLOYMENT_ALIASES_FILE)
+        if self.force or not os.path.exists(aliases_file):
+            return {}
+        with open(aliases_file, 'r') as f:
+            previous_aliases = yaml.safe_load(f) or {}
+        return previous_aliases
+
+    def remove_deployment(self, deployment_name):
+        deployment_dir = os.path.join(self.deployments_dir, deployment_name)
+        if os.path.lexists(deployment_dir):
+            shutil.rmtree(deployment_dir)
+
+    def deployment_is_unchanged(self, deployment_name, previous_deployments, dag_dict):
+        ''' Check if the folder of the deployment, created by the previous design, can be kept:
+            the deployment has the same signature (its designs are linked, thus they are up to date)
+            and the same DAG and layer assignment. The signature normalizes the partition numbers,
+            while 'application_dag.yaml' and the 'src' links use them, thus a deployment whose
+            partitions are renumbered is created again. Otherwise, the old folder is removed.
+        '''
+        deployment_dir = os.path.join(self.deployments_dir, deployment_name)
+        previous_deployment = previous_deployments.get(deployment_name) or {}
+        deployment = self.aliases[deployment_name]
+        if (previous_deployment.get('signature') == deployment['signature']
+                and previous_deployment.get('layers') == deployment['layers']
+                and self.load_deployment_dag(deployment_dir) == dag_dict):
+            return True
+        self.remove_deployment(deployment_name)
+        return False
+
+    def load_deployment_dag(self, deployment_dir):
+        ''' Load the DAG of the folder of a deployment, None if it does not exist.
+        '''
+        dag_filename = os.path.join(deployment_dir, 'application_dag.yaml')
+        if not os.path.isfile(dag_filename):
+            return None
+        with open(dag_filename, 'r') as f:
+            return yaml.safe_load(f)
+
+    def remove_stale_deployments(self, assignments_dict):
+        ''' Remove the folders of the deployments of a previous design not generated again.
+        '''
+        for deployment_name in os.listdir(self.deployments_dir):
+            if re.match(r'^deployment[0-9]+$', deployment_name) and deployment_name not in assignments_dict:
+                self.remove_deployment(deployment_name)
+
     def create_deployments(self):
+        ''' Create the base deployment and the deployments surviving the pruning predicates,
+            numbered contiguously ('deployment1', 'deployment2', ...) in the enumeration order,
+            until the 'max_deployments' budget is exhausted. Deployments equivalent to an already
+            created one (same canonical signature) are not created but saved as its aliases
+            in 'deployment_aliases.yaml'. The folders of the deployments unchanged since the previous
+            design are kept.
+
+            Return: dict with the deployment names as keys and the components-layers associations as values.
+        '''
         assignments_dict = {}
         num_deployment = 0
+        # Canonical signatures of the created deployments and aliases of each deployment
+        self.signature = DeploymentSignature(self.application_dir)
+        self.signatures = {}
+        self.aliases = {}
+        previous_deployments = self.get_previous_deployments()
+        dag_filename = os.path.join(self.application_dir, 'common_config', 'application_dag.yaml')
+        base_dag_dict = self.application_model.dag
         if self.alternative_deployments is None:
             # No components alternatives
-            combinations = self.get_combinations()
-            for combination in combinations:
-                layer_combinations, components_combination = self.get_layer_combinations(combination)
+            for combination in self.iter_combinations():
+                if self.budget_exhausted(num_deployment) and 'base' in assignments_dict:
+                    break
+                layer_combinations, components_combination = self.iter_layer_combinations(combination)
                 
                 num_base = len([c for c in combination if 'base' in c])
-                
-                for lc_idx, layer_combination in enumerate(layer_combinations):
-                    if len(combination) == num_base and lc_idx == 0:
+                base_layers = None
+                if len(combination) == num_base:
+                    base_layers, _ = self.get_base_layers(combination)
+                    if base_layers is not None:
+                        # The base deployment is always created again (it resets the optimal deployment)
+                        self.remove_deployment('base')
                         base_deployment_generator = BaseDeploymentGenerator(self.application_dir)
                         base_deployment_generator.create_deployment(
-                            deployment_name='base', 
-                            dag_filename=os.path.join(
-                                self.application_dir, 'common_config', 'application_dag.yaml'))
-                        assignments_dict['base'] = {k: v for k,v in zip(components_combination, layer_combination)}
-                    else:
-                        num_deployment += 1
-                        empty_deployment_generator = EmptyDeploymentGenerator(self.application_dir)
-                        empty_deployment_generator.create_deployment(
-                            deployment_name='deployment{}'.format(num_deployment), 
-                            dag_filename=os.path.join(self.application_dir, 'common_config', 'application_dag.yaml'), 
-                            partitions_dict=self.partition_dict, components_combination=combination)
-                        assignments_dict['deployment{}'.format(num_deployment)] = {k: v for k,v in zip(components_combination, layer_combination)}
-            return assignments_dict 
+                            deployment_name='base', dag_filename=dag_filename)
+                        assignments_dict['base'] = {k: v for k,v in zip(components_combination, base_layers)}
+                        self.register_deployment('base', base_dag_dict, assignments_dict['base'])
+
+                # DAG of the deployments of the combination
+                empty_deployment_generator = EmptyDeploymentGenerator(self.application_dir)
+                empty_deployment_generator.load_dag(dag_filename)
+                dag_dict = empty_deployment_generator.build_dag(self.partition_dict, combination)
+                
+                for layer_combination in layer_combinations:
+                    if layer_combination == base_layers:
+                        continue
+                    layers_assignment = {k: v for k,v in zip(components_combination, layer_combination)}
+                    if self.budget_exhausted(num_deployment):
+                        break
+                    if not self.register_deployment('deployment{}'.format(num_deployment + 1), dag_dict, layers_assignment):
+                        continue
+                    num_deployment += 1
+                    assignments_dict['deployment{}'.format(num_deployment)] = layers_assignment
+                    if self.deployment_is_unchanged('deployment{}'.format(num_deployment), previous_deployments, dag_dict):
+                        continue
+                    empty_deployment_generator = EmptyDeploymentGenerator(self.application_dir)
+                    empty_deployment_generator.create_deployment(
+                        deployment_name='deployment{}'.format(num_deployment), 
+                        dag_filename=dag_filename, 
+                        partitions_dict=self.partition_dict, components_combination=combination)
         else:
             # Components alternatives
             for deployment in self.alternative_deployments:
+                if self.budget_exhausted(num_deployment) and deployment != 'base':
+                    continue
                 components_combination = self.alternative_deployments[deployment]['components']
                 components_combination = [p + '_base' for p in components_combination]
-                layer_combinations, components_combination = self.get_layer_combinations(components_combination)
-                    
-                for lc_idx, layer_combination in enumerate(layer_combinations):
-                    if deployment == 'base' and lc_idx == 0:
+                layer_combinations, components_names = self.iter_layer_combinations(components_combination)
+                
+                base_layers = None
+                if deployment == 'base':
+                    base_layers, _ = self.get_base_layers(components_combination)
+                    if base_layers is not None:
+                        # The base deployment is always created again (it resets the optimal deployment)
+                        self.remove_deployment('base')
                         base_deployment_generator = BaseDeploymentGenerator(self.application_dir)
-                        base_deployment_generator.create_deployment(deployment_name='base', 
-                            dag_filename=os.path.join(self.application_dir, 'common_config', 'application_dag.yaml'))
-                        assignments_dict['base'] = {k: v for k,v in zip(components_combination, layer_combination)}
-                    else:
-                        num_deployment += 1
-                        empty_deployment_generator = AlternativeDeploymentGenerator(self.application_dir)
-                        empty_deployment_generator.create_deployment(deployment_name='deployment{}'.format(num_deployment), 
-                            dag_filename=os.path.join(self.application_dir, 'common_config', 'application_dag.yaml'), 
-                            deployment=self.alternative_deployments[deployment])
-                        assignments_dict['deployment{}'.format(num_deployment)] = {k: v for k,v in zip(components_combination, layer_combination)}
-
-            return assignments_dict 
\ No newline at end of file
+                        base_deployment_generator.create_deployment(deployment_name='base', dag_filename=dag_filename)
+                        assignments_dict['base'] = {k: v for k,v in zip(components_names, base_layers)}
+                        self.register_deployment('base', base_dag_dict, assignments_dict['base'])
+
+                # DAG of the deployments of the alternative
+                dag_dict = AlternativeDeploymentGenerator(self.application_dir).build_dag(
+                    deployment, self.alternative_deployments[deployment])
+                    
+                for layer_combination in layer_combinations:
+                    if layer_combination == base_layers:
+                        continue
+                    layers_assignment = {k: v for k,v in zip(components_names, layer_combination)}
+                    if self.budget_exhausted(num_deployment):
+                        break
+                    if not self.register_deployment('deployment{}'.format(num_deployment + 1), dag_dict, layers_assignment):
+                        continue
+                    num_deployment += 1
+                    assignments_dict['deployment{}'.format(num_deployment)] = layers_assignment
+                    if self.deployment_is_unchanged('deployment{}'.format(num_deployment), previous_deployments, dag_dict):
+                        continue
+                    empty_deployment_generator = AlternativeDeploymentGenerator(self.application_dir)
+                    empty_deployment_generator.create_deployment(deployment_name='deployment{}'.format(num_deployment), 
+                        dag_filename=dag_filename, 
+                        deployment=self.alternative_deployments[deployment])
+
+        self.remove_stale_deployments(assignments_dict)
+
+        # Save the signatures and the aliases of the deployments
+        with open(os.path.join(self.application_dir, DEPLOYMENT_ALIASES_FILE), 'w') as f:
+            yaml.dump(self.aliases, f, sort_keys=False)
+
+        self.print_summary(num_deployment)
+        return assignments_dict
+
+    def print_summary(self, num_deployment):
+        print("\n")
+        print("[AI-SPRINT]: " + "Generated the base deployment and {} other deployments.".format(num_deployment))
+        for predicate in self.predicates:
+            if predicate.pruned > 0:
+                print("             " + "- {} partial layer assignments pruned by {}".format(
+                    predicate.pruned, predicate.name))
+        num_aliases = sum([len(deployment['aliases']) for deployment in self.aliases.values()])
+        if num_aliases > 0:
+            print("             " + "- {} equivalent deployments collapsed (see '{}')".format(
+                num_aliases, os.path.basename(DEPLOYMENT_ALIASES_FILE)))
+        if self.budget_exhausted(num_deployment):
+            print("             " + "- Maximum number of deployments ({}) reached, ".format(self.max_deployments) +
+                  "the remaining ones are not generated.")
@@ -3,6 +3,7 @@ import shutil
 import yaml
 
 from .deployment_generator import DeploymentGenerator
+from .tool_templates import copy_tool_dirs
 
 
 class EmptyDeploymentGenerator(DeploymentGenerator): 
@@ -12,13 +13,7 @@ class EmptyDeploymentGenerator(DeploymentGenerator):
         self.application_dir = application_dir
     
     def component_has_early_exits(self, component):
-        with open(os.path.join(self.application_dir, 'common_config', 'annotations.yaml'), 'r') as f:
-            annotations = yaml.safe_load(f)
-        
-        for _, item_dict in annotations.items():
-            if (item_dict['component_name']['name'] == component and 'early_exits_model' in list(item_dict.keys())):
-                return True
-        return False
+        return self.application_model.has_annotation(component, 'early_exits_model')
     
     def get_transition_probability(self, dependencies, component1, component2):
         for dependency in dependencies:
@@ -27,14 +22,16 @@ class EmptyDeploymentGenerator(DeploymentGenerator):
         return 1
     
     def get_ee_transition_probability(self, component, idx):
-        with open(os.path.join(self.application_dir, 'common_config', 'annotations.yaml'), 'r') as f:
-            annotations = yaml.safe_load(f)
-        
-        for _, item_dict in annotations.items():
-            if (item_dict['component_name']['name'] == component and 'early_exits_model' in list(item_dict.keys())):
-                return item_dict['early_exits_model']['transition_probabilities'][idx]
+        item_dict = self.application_model.get_component_annotations(component)
+        if 'early_exits_model' in item_dict:
+            return item_dict['early_exits_model']['transition_probabilities'][idx]
     
-    def create_dag(self, partitions_dict, components_combination):
+    def build_dag(self, partitions_dict, components_combination):
+        ''' Build the DAG of the deployment (without writing it) and the designs of each component
+            it uses. The application DAG must be already loaded (see 'load_dag').
+
+            Return: the DAG dictionary of the deployment.
+        '''
 
         def is_the_first_in_a_dependency(component_name):
             base_dependencies = self.dag_dict['System']['dependencies']
@@ -57,8 +54,10 @@ class EmptyDeploymentGenerator(DeploymentGenerator):
                 c.rsplit('_partition', 1)[0] == component or c.rsplit('_base', 1)[0] == component)][0]
             combination = combination.split(component + '_')[1]
             partitions = components[component]['partitions']
-            filtered_partitions = [p for p in partitions if combination in p]
-            filtered_partitions = sorted(filtered_partitions)
+            # Segments of the selected partition, in chain order ('partitionN_1', ..., 'partitionN_K')
+            filtered_partitions = [p for p in partitions if p.split('_')[0] == combination]
+            filtered_partitions = sorted(
+                filtered_partitions, key=lambda p: int(p.rsplit('_', 1)[1]) if '_' in p else 0)
             filtered_dict[component] = filtered_partitions
             if self.component_has_early_exits(component):
                 ee_components.append(component)
@@ -257,6 +256,10 @@ class EmptyDeploymentGenerator(DeploymentGenerator):
         self.new_dag_dict = new_dag_dict
         self.design_dict = design_dict
 
+        return new_dag_dict
+
+    def create_dag(self, partitions_dict, components_combination):
+        new_dag_dict = self.build_dag(partitions_dict, components_combination)
         with open(os.path.join(self.deployment_dir, 'application_dag.yaml'), 'w') as f:
             yaml.dump(new_dag_dict, f, sort_keys=False)
     
@@ -276,20 +279,7 @@ class EmptyDeploymentGenerator(DeploymentGenerator):
         self.create_dag(partitions_dict, components_combination)
 
         # Copy tools directory
-        shutil.copytree(os.path.join(self.application_dir, 'space4ai-d'), 
-                        os.path.join(self.deployment_dir, 'space4ai-d'))
-        shutil.copytree(os.path.join(self.application_dir, 'space4ai-r'), 
-                        os.path.join(self.deployment_dir, 'space4ai-r'))
-        shutil.copytree(os.path.join(self.application_dir, 'oscar'), 
-                        os.path.join(self.deployment_dir, 'oscar'))
-        shutil.copytree(os.path.join(self.application_dir, 'oscarp'), 
-                        os.path.join(self.deployment_dir, 'oscarp'))
-        shutil.copytree(os.path.join(self.application_dir, 'pycompss'), 
-                        os.path.join(self.deployment_dir, 'pycompss'))
-        shutil.copytree(os.path.join(self.application_dir, 'im'), 
-                        os.path.join(self.deployment_dir, 'im'))
-        shutil.copytree(os.path.join(self.application_dir, 'ams'), 
-                        os.path.join(self.deployment_dir, 'ams'))
+        copy_tool_dirs(self.application_dir, self.deployment_dir)
 
         # Create 'src' with symbolic links to base designs
         os.makedirs(os.path.join(self.deployment_dir, 'src'))
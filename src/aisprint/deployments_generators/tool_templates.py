@@ -0,0 +1,19 @@
+import os
+import shutil
+
+from aisprint.design_store import clone_file
+
+# Tools directories of the application included in every deployment
+TOOL_DIRS = ['space4ai-d', 'space4ai-r', 'oscar', 'oscarp', 'pycompss', 'im', 'ams']
+
+
+def copy_tool_dirs(application_dir, deployment_dir):
+    ''' Copy the tools directories of the application into a deployment. The tools
+        (e.g., SPACE4AI-D, OSCAR-P, AMS) write their files in place in these directories,
+        thus each deployment gets its own copy of the files. Files are reflinked if the
+        filesystem supports it (i.e., the data blocks are shared until a file is written).
+    '''
+    for tool_dir in TOOL_DIRS:
+        shutil.copytree(os.path.join(application_dir, tool_dir),
+                        os.path.join(deployment_dir, tool_dir),
+                        copy_function=clone_file, dirs_exist_ok=True)
@@ -6,17 +6,45 @@ import yaml
 from aisprint.application_preprocessing import ApplicationPreprocessor
 from aisprint.deployments_generators import DeploymentsGenerator
 
-from .utils import parse_dag, get_annotation_manager, print_header
+from .utils import parse_dag, get_annotation_manager, run_annotation_manager, print_header
 from .annotations_parsing import run_aisprint_parser
+from .build_cache import BuildCache
+from .application_model import get_application_model
+from .design_scheduler import DesignScheduler
 
-def run_design(application_dir):
+def print_skipped(stage):
+    print("\n")
+    print("[AI-SPRINT]: " + "{}: unchanged since the last design, skipped.".format(stage))
+
+def get_component_digest(build_cache, application_model, component_name):
+    ''' Digest of the inputs of the designs of a component: its code and models, its annotations
+        and the configuration files used by the partitioners.
+    '''
+    component_folder = application_model.get_component_folder(component_name)
+    return build_cache.get_digest({
+        'src': build_cache.tree_digest(component_folder) if component_folder is not None else None,
+        'annotations': application_model.get_component_annotations(component_name),
+        'application_dag': build_cache.config_digest('application_dag.yaml'),
+        'candidate_deployments': build_cache.config_digest('candidate_deployments.yaml'),
+        'candidate_resources': build_cache.config_digest('candidate_resources.yaml')})
+
+def run_design(application_dir, max_deployments=None, force=False, num_workers=None):
 
     """ Execute the AI-SPRINT pipeline to create the possible application designs:
         
         1. Read DAG file
         2. Parse AI-SPRINT annotations
         3. Create components' designs 
-        4. Create AI-SPRINT possible deployments 
+        4. Create AI-SPRINT possible deployments (at most 'max_deployments' besides the base one)
+
+        The application files are parsed once in the ApplicationModel shared by the stages.
+
+        Each stage declares its inputs in the build manifest ('aisprint/.build_manifest.yaml'):
+        the stages whose inputs did not change since the last design are skipped (unless 'force' is True), 
+        and only the designs of the changed components are created again.
+
+        The annotation managers creating the designs run in parallel on 'num_workers' 
+        processes (default: number of CPUs).
     """
 
     # print("\n")
@@ -56,51 +84,130 @@ def run_design(application_dir):
 
     # ----------------
 
+    build_cache = BuildCache(application_dir, force=force)
+    # Parsed application files, shared by the stages (files are parsed again only if changed)
+    application_model = get_application_model(application_dir)
+
     # 2) Parse and validate AI-SPRINT annotations
     # -------------------------------------------
-    run_aisprint_parser(application_dir=application_dir)
+    annotations_file = os.path.join(application_dir, 'common_config', 'annotations.yaml')
+    annotations_digest = build_cache.get_digest({
+        'main': {component_dir: build_cache.file_digest(os.path.join(application_dir, 'src', component_dir, 'main.py'))
+                 for component_dir in components_dirs}})
+    if build_cache.is_fresh('annotations', annotations_digest):
+        print_skipped("Parsing AI-SPRINT annotations")
+    else:
+        run_aisprint_parser(application_dir=application_dir)
+        build_cache.record('annotations', annotations_digest, outputs=[os.path.relpath(annotations_file, application_dir)])
     # -------------------------------------------
 
     # 3) Create AI-SPRINT base design with the Application Pre-Processor 
     # ------------------------------------------------------------------
-    application_preprocessor = ApplicationPreprocessor(application_dir=application_dir)
-    application_preprocessor.create_base_design()
+    # Only the designs of the components whose inputs changed are created
+    application_preprocessor = ApplicationPreprocessor(
+        application_dir=application_dir, application_model=application_model)
+    components = application_preprocessor.get_components()
+    components_digests = {component_name: get_component_digest(
+        build_cache, application_model, component_name) for component_name in components}
+    changed_components = [component_name for component_name in components if not build_cache.is_fresh(
+        'component:' + component_name, components_digests[component_name])]
+    if changed_components:
+        application_preprocessor.create_base_design(components=changed_components)
+    else:
+        print_skipped("Creating base components' designs")
     # ---------------------------------------
     
-    # 4) Run partitionable_model annotation manager 
-    # ---------------------------------------------
-    # Run partitionable_model annotation manager
-    annotation_manager = get_annotation_manager(
-        application_dir=application_dir, which_annotation='detect_metric_drift')
-    annotation_manager.process_annotations()
-    # ---------------------------------------------
+    # 4-7) Run the annotation managers creating the designs
+    # ----------------------------------------------------
+    # Independent managers, and the partitioners of different components, run in parallel
+    scheduler = DesignScheduler(num_workers=num_workers)
 
-    # 5) Run partitionable_model annotation manager 
-    # ---------------------------------------------
-    # Run partitionable_model annotation manager
-    annotation_manager = get_annotation_manager(
-        application_dir=application_dir, which_annotation='partitionable_model')
-    annotation_manager.process_annotations()
-    # ---------------------------------------------
-    
-    # 6) Run early_exits_model annotation manager 
-    # ---------------------------------------------
-    # Run early_exits_model annotation manager
-    annotation_manager = get_annotation_manager(
-        application_dir=application_dir, which_annotation='early_exits_model')
-    annotation_manager.process_annotations()
-    # ---------------------------------------------
-    
-    # 7) Run model_performance annotation manager 
-    # ---------------------------------------------
-    # Run model_performance annotation manager
-    annotation_manager = get_annotation_manager(
-        application_dir=application_dir, which_annotation='model_performance')
-    alternative_deployments = annotation_manager.process_annotations()
-    # ---------------------------------------------
+    # detect_metric_drift annotation manager
+    drift_digest = build_cache.get_digest({'annotations': build_cache.file_digest(annotations_file)})
+    if build_cache.is_fresh('detect_metric_drift', drift_digest):
+        print_skipped("Creating drift detector component")
+    else:
+        scheduler.add_task('detect_metric_drift', run_annotation_manager, 
+                           (application_dir, 'detect_metric_drift'))
+
+    # partitionable_model and early_exits_model annotation managers (only on the changed components):
+    # one task for each component, whose partitioner runs in the task process
+    if changed_components:
+        annotated_groups = {}
+        for which_annotation in ['partitionable_model', 'early_exits_model']:
+            annotated_components = application_model.get_annotated_components(which_annotation)
+            annotated_groups[which_annotation] = [[c] for c in changed_components if c in annotated_components]
+        # The tasks of a component run one after the other, thus the partitioners of 
+        # different components run concurrently and share the workers
+        partitioned_components = set([c for groups in annotated_groups.values() for group in groups for c in group])
+        partitioner_workers = max(1, scheduler.num_workers // max(1, len(partitioned_components)))
+        # Last task writing the designs of each component
+        component_tasks = {}
+        for which_annotation in ['partitionable_model', 'early_exits_model']:
+            components_groups = annotated_groups[which_annotation]
+            if not components_groups:
+                # The manager only reports that there is nothing to partition
+                components_groups = [changed_components]
+            for components_group in components_groups:
+                task_name = '{}:{}'.format(which_annotation, ','.join(components_group))
+                # The early exits of a component are created after its partitions
+                dependencies = [component_tasks[c] for c in components_group if c in component_tasks]
+                scheduler.add_task(task_name, run_annotation_manager, 
+                                   (application_dir, which_annotation, 
+                                    {'components': components_group, 'num_workers': partitioner_workers}), 
+                                   dependencies=dependencies)
+                for c in components_group:
+                    component_tasks[c] = task_name
+    else:
+        print_skipped("Running SPACE4AI-D-partitioner")
+
+    # model_performance annotation manager
+    performance_digest = build_cache.get_digest({
+        'annotations': build_cache.file_digest(annotations_file),
+        'application_dag': build_cache.config_digest('application_dag.yaml'),
+        'candidate_deployments': build_cache.config_digest('candidate_deployments.yaml'),
+        'candidate_resources': build_cache.config_digest('candidate_resources.yaml'),
+        'components': components_digests})
+    if build_cache.is_fresh('model_performance', performance_digest):
+        print_skipped("Computing metrics for alternative deployments")
+    else:
+        scheduler.add_task('model_performance', run_annotation_manager, (application_dir, 'model_performance'))
+
+    results = scheduler.run()
+
+    if 'detect_metric_drift' in results:
+        build_cache.record('detect_metric_drift', drift_digest)
+    # The designs of the changed components are complete
+    for component_name in changed_components:
+        build_cache.record('component:' + component_name, components_digests[component_name], 
+                           outputs=[os.path.join('aisprint', 'designs', component_name)])
+    if 'model_performance' in results:
+        alternative_deployments = results['model_performance']
+        build_cache.record('model_performance', performance_digest, result=alternative_deployments)
+    else:
+        alternative_deployments = build_cache.get_result('model_performance')
+    # ----------------------------------------------------
+
+    # Deployments and QoS constraints depend on all the designs
+    deployments_digest = build_cache.get_digest({
+        'components': components_digests,
+        'component_partitions': build_cache.file_digest(
+            os.path.join(application_dir, 'aisprint', 'designs', 'component_partitions.yaml')),
+        'annotations': build_cache.file_digest(annotations_file),
+        'application_dag': build_cache.config_digest('application_dag.yaml'),
+        'candidate_deployments': build_cache.config_digest('candidate_deployments.yaml'),
+        'candidate_resources': build_cache.config_digest('candidate_resources.yaml'),
+        'alternative_deployments': alternative_deployments,
+        'max_deployments': max_deployments})
+    qos_filename = os.path.join(
+        application_dir, 'aisprint/deployments', 'multi_cluster_qos_constraints.yaml')
+    if build_cache.is_fresh('deployments', deployments_digest):
+        print_skipped("Generating deployments and QoS constraints")
+        return
 
     # 8) Create all possible deployments (empty) with multi-cluster QoS constraints
-    deployments_generator = DeploymentsGenerator(application_dir, alternative_deployments)
+    deployments_generator = DeploymentsGenerator(
+        application_dir, alternative_deployments, max_deployments, force, application_model=application_model)
     deployments_dict = deployments_generator.create_deployments()
     # deployments_dict contains the deployments and the components-layers associations
     # 'base': 
@@ -119,7 +226,7 @@ def run_design(application_dir):
 
     # Run exec_time annotation manager for base deployment 
     annotation_manager = get_annotation_manager(
-        application_dir=application_dir, which_annotation='exec_time')
+        application_dir=application_dir, which_annotation='exec_time', application_model=application_model)
     print("\n")
     print("[AI-SPRINT]: " + "Generating QoS constraints {} deployments..".format(len(deployments_dict.keys())))
     input_args = {'deployment_name': 'base', 'layers_assignment': deployments_dict['base']} 
@@ -135,20 +242,25 @@ def run_design(application_dir):
         curr_qos_dict = annotation_manager.process_annotations(input_args)
         multi_cluster_dict['System']['Deployments'][deployment_name] = curr_qos_dict
     # Save multi_cluster_dict
-    qos_filename = os.path.join(
-        application_dir, 'aisprint/deployments', 'multi_cluster_qos_constraints.yaml')
     with open(qos_filename, 'w') as f:
         yaml.dump(multi_cluster_dict, f, sort_keys=False) 
 
     print("             " + "Done! QoS constraints generated.\n")
+    build_cache.record('deployments', deployments_digest, outputs=[os.path.relpath(qos_filename, application_dir)])
     # -------------------------------------------------
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("--application_dir", help="Path to the AI-SPRINT application.", required=True)
+    parser.add_argument("--max_deployments", help="Maximum number of deployments generated besides the base one.", 
+                        type=int, required=False)
+    parser.add_argument("--force", help="Run all the design stages, ignoring the build manifest.", action='store_true')
+    parser.add_argument("--num_workers", help="Number of processes running the design stages.", 
+                        type=int, required=False)
     args = vars(parser.parse_args())
 
     application_dir = args['application_dir']
 
-    run_design(application_dir=application_dir)
+    run_design(application_dir=application_dir, max_deployments=args['max_deployments'], force=args['force'],
+               num_workers=args['num_workers'])
     
\ No newline at end of file
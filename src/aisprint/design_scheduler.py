@@ -0,0 +1,144 @@
+import io
+import os
+import sys
+import traceback
+import multiprocessing
+from contextlib import redirect_stdout, redirect_stderr
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+
+def _run_task(function, args):
+    ''' Execute a task in a worker process, capturing its progress output.
+
+        Return: (result, error traceback or None, stdout, stderr).
+    '''
+    stdout, stderr = io.StringIO(), io.StringIO()
+    result, error = None, None
+    with redirect_stdout(stdout), redirect_stderr(stderr):
+        try:
+            result = function(*args)
+        except Exception:
+            error = traceback.format_exc()
+    return result, error, stdout.getvalue(), stderr.getvalue()
+
+
+class DesignTask():
+    ''' Task of the design pipeline.
+
+        Parameters:
+            name (str): name of the task.
+            function (callable): module-level function executing the task (it is sent to the workers).
+            args (tuple): arguments of the function.
+            dependencies (list): names of the tasks to be completed before this one.
+    '''
+
+    def __init__(self, name, function, args=(), dependencies=()):
+        self.name = name
+        self.function = function
+        self.args = tuple(args)
+        self.dependencies = list(dependencies)
+
+
+class DesignScheduler():
+    ''' Scheduler of the design tasks over a pool of processes.
+
+        Tasks are declared with their dependencies and a task starts as soon as all its
+        dependencies are completed, thus independent tasks (e.g., different annotation managers,
+        or the same manager on different components) run in parallel. The output of each task
+        is captured and printed in the declaration order of the tasks, so the progress report
+        does not depend on the scheduling. Tasks writing shared files must serialize their
+        updates (see 'aisprint.utils.locked_file').
+
+        Parameters:
+            num_workers (int): number of processes (default: number of CPUs). With a single
+                worker the tasks are executed in the current process, in declaration order.
+    '''
+
+    def __init__(self, num_workers=None):
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        self.num_workers = max(1, num_workers)
+        self.tasks = {}
+
+    def add_task(self, name, function, args=(), dependencies=()):
+        ''' Declare a task. Dependencies must be declared before the task, thus the tasks
+            form a DAG and the declaration order is a valid execution order.
+        '''
+        if name in self.tasks:
+            raise Exception("Design task '{}' already declared.".format(name))
+        for dependency in dependencies:
+            if dependency not in self.tasks:
+                raise Exception("Dependency '{}' of design task '{}' not declared.".format(dependency, name))
+        self.tasks[name] = DesignTask(name, function, args, dependencies)
+
+    def _run_sequential(self):
+        results = {}
+        for name, task in self.tasks.items():
+            results[name] = task.function(*task.args)
+        return results
+
+    def _create_executor(self, num_workers):
+        # Forked workers inherit the loaded modules
+        if 'fork' in multiprocessing.get_all_start_methods():
+            mp_context = multiprocessing.get_context('fork')
+        else:
+            mp_context = multiprocessing.get_context('spawn')
+        return ProcessPoolExecutor(max_workers=num_workers, mp_context=mp_context)
+
+    def run(self):
+        ''' Execute the tasks.
+
+            Return: dict with the result of each task, in declaration order.
+        '''
+        num_workers = min(self.num_workers, len(self.tasks))
+        if num_workers <= 1:
+            return self._run_sequential()
+
+        print("\n")
+        print("[AI-SPRINT]: " + "Running {} design tasks on {} processes..".format(len(self.tasks), num_workers))
+
+        names = list(self.tasks.keys())
+        outputs = {}
+        results = {}
+        failed = None
+        printed = 0
+        running = {}
+        with self._create_executor(num_workers) as executor:
+            while True:
+                # Submit the ready tasks (none after a failure)
+                if failed is None:
+                    for name in names:
+                        if name in outputs or name in running.values():
+                            continue
+                        if all([dependency in outputs for dependency in self.tasks[name].dependencies]):
+                            task = self.tasks[name]
+                            running[executor.submit(_run_task, task.function, task.args)] = name
+                if not running:
+                    break
+                done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    result, error, stdout, stderr = future.result()
+                    outputs[name] = (stdout, stderr)
+                    results[name] = result
+                    if error is not None and failed is None:
+                        failed = (name, error)
+                # Print the output of the completed tasks, in declaration order
+                while printed < len(names) and names[printed] in outputs:
+                    stdout, stderr = outputs[names[printed]]
+                    sys.stdout.write(stdout)
+                    sys.stderr.write(stderr)
+                    printed += 1
+                sys.stdout.flush()
+
+        # After a failure, the output of the completed tasks is printed anyway
+        for name in names[printed:]:
+            if name in outputs:
+                sys.stdout.write(outputs[name][0])
+                sys.stderr.write(outputs[name][1])
+        if failed is not None:
+            raise RuntimeError("Design task '{}' failed:\n{}".format(*failed))
+
+        print("\n")
+        print("[AI-SPRINT]: " + "Done! {} design tasks completed.".format(len(self.tasks)))
+        return {name: results[name] for name in names}
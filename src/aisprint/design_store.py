@@ -0,0 +1,180 @@
+import os
+import stat
+import shutil
+import hashlib
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows: files are hard-linked or copied
+    fcntl = None
+
+# ioctl request cloning a file (reflink) on Linux copy-on-write filesystems (e.g., Btrfs, XFS)
+FICLONE = 0x40049409
+
+# Store folder, relative to the application directory
+DESIGN_STORE_DIR = os.path.join('aisprint', '.design_store')
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def reflink_file(src, dst):
+    ''' Clone 'src' to 'dst' sharing the data blocks (copy-on-write).
+        Raise OSError if the filesystem does not support it.
+    '''
+    if fcntl is None:
+        raise OSError("Reflinks are not supported on this platform.")
+    with open(src, 'rb') as src_file:
+        with open(dst, 'wb') as dst_file:
+            try:
+                fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+            except OSError:
+                dst_file.close()
+                os.remove(dst)
+                raise
+    shutil.copystat(src, dst)
+
+
+def clone_file(src, dst):
+    ''' Copy 'src' to 'dst' with a reflink if supported, with a regular copy otherwise.
+    '''
+    try:
+        reflink_file(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class DesignStore():
+    ''' Content-addressed store of the files of the designs.
+
+        Each distinct file (content and permissions) is stored once in the store folder
+        and materialized in the designs as a hard link of the stored object, thus unchanged
+        files (e.g., model weights, datasets) are shared by the base design and all the
+        partition designs instead of being copied. Objects are added to the store with
+        a reflink (or a copy) of the original file, so the application sources are never
+        linked. Where hard links are not supported (e.g., store and designs on different
+        filesystems) the objects are reflinked, and then copied.
+
+        NOTE: materialized files share the data with the store, thus they must be replaced
+        (removed and written again), not modified in place.
+
+        Parameters:
+            store_dir (str): path to the folder of the store.
+    '''
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.objects_dir = os.path.join(store_dir, 'objects')
+        # Digest of the already hashed files, identified by (device, inode, size, mtime)
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def _get_digest(self, path, st):
+        key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+
+    def get_digest(self, path):
+        ''' Return the SHA-256 digest (hex) of the content of the file 'path'.
+        '''
+        return self._get_digest(path, os.stat(path))
+
+    def add_file(self, path):
+        ''' Add the file 'path' to the store (if not already stored).
+
+            Return: path to the stored object.
+        '''
+        st = os.stat(path)
+        digest = self._get_digest(path, st)
+        # Hard links share the permissions, thus they are part of the address
+        mode = stat.S_IMODE(st.st_mode)
+        object_path = os.path.join(self.objects_dir, digest[:2], '{}-{:o}'.format(digest[2:], mode))
+        if os.path.exists(object_path):
+            return object_path
+
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        tmp_path = '{}.{}.{}.tmp'.format(object_path, os.getpid(), threading.get_ident())
+        clone_file(path, tmp_path)
+        os.chmod(tmp_path, mode)
+        # Atomic publication: concurrent writers of the same object keep the first one
+        try:
+            os.link(tmp_path, object_path)
+        except FileExistsError:
+            pass
+        except OSError:
+            os.replace(tmp_path, object_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        # The designs linking the object are not hashed again
+        object_st = os.stat(object_path)
+        with self._lock:
+            self._digests[(object_st.st_dev, object_st.st_ino, object_st.st_size, object_st.st_mtime_ns)] = digest
+        return object_path
+
+    def materialize_file(self, src, dst):
+        ''' Materialize the file 'src' at 'dst' (which is replaced if it exists),
+            hard-linking the stored object if possible.
+        '''
+        object_path = self.add_file(src)
+        if os.path.lexists(dst):
+            os.remove(dst)
+        try:
+            os.link(object_path, dst)
+        except OSError:
+            clone_file(object_path, dst)
+
+    def materialize_tree(self, src_dir, dst_dir, exclude=()):
+        ''' Materialize the directory 'src_dir' at 'dst_dir', as 'shutil.copytree' does
+            (symbolic links are followed).
+
+            Parameters:
+                src_dir (str): source directory.
+                dst_dir (str): destination directory.
+                exclude (list): names of the files and directories in 'src_dir' (top level only)
+                    not to be materialized.
+        '''
+        os.makedirs(dst_dir, exist_ok=True)
+        for root, dirs, files in os.walk(src_dir, followlinks=True):
+            relative_root = os.path.relpath(root, src_dir)
+            if relative_root == os.curdir:
+                dirs[:] = [d for d in dirs if d not in exclude]
+                files = [f for f in files if f not in exclude]
+                relative_root = ''
+            for d in dirs:
+                os.makedirs(os.path.join(dst_dir, relative_root, d), exist_ok=True)
+            for f in files:
+                self.materialize_file(os.path.join(root, f), os.path.join(dst_dir, relative_root, f))
+        shutil.copystat(src_dir, dst_dir)
+
+    def prune(self):
+        ''' Remove the stored objects which are not used by any design (i.e., not hard-linked).
+
+            Return: number of removed objects.
+        '''
+        removed = 0
+        if not os.path.exists(self.objects_dir):
+            return removed
+        for root, _, files in os.walk(self.objects_dir):
+            for f in files:
+                object_path = os.path.join(root, f)
+                if os.stat(object_path).st_nlink == 1:
+                    os.remove(object_path)
+                    removed += 1
+        return removed
+
+
+def get_design_store(application_dir):
+    ''' Return the DesignStore of the application.
+    '''
+    return DesignStore(os.path.join(application_dir, DESIGN_STORE_DIR))
@@ -2,128 +2,379 @@ import os
 import numpy as np
 import yaml
 import time
+import signal
+import asyncio
 import traceback
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
-from utils import (init_test, get_metric_values, get_influxdb_client, 
-                   get_minio_client, run_drift_test, update_metric_drift_state, DriftDetectorLogger)
+from utils import (init_test, get_metric_points, get_influxdb_client, get_minio_client, run_drift_test,
+                   update_metric_drift_state, update_status, DriftDetectorLogger)
 
+# Default timeout (in seconds) of the queries to InfluxDB
+DEFAULT_QUERY_TIMEOUT = 60
+# Default time (in seconds) before the last received point queried again by each run:
+# points can be written late (e.g., by the buffered reporters of the components)
+DEFAULT_QUERY_LOOKBACK = 300
 
-def main(metrics, detection_interval, data_collection_period, 
-         minio_client, influxdb_client, logger):
-    
-    logger.log("Starting Drift Detector algorithm..")
-    logger.log("The following metrics will be monitored")
-    
-    for metric_name in metrics.keys():
-        for metric_field in metrics[metric_name].keys():
-            logger.log("Metric: {}, Field: {}".format(metric_name, metric_field))
-            logger.log(" - Statistical Test: {}".format(metrics[
-                metric_name][metric_field]['statistical_test']))
-            logger.log(" - Test Threshold: {}".format(metrics[
-                metric_name][metric_field]['test_threshold']))
-            logger.log(" - Monitoring Period: {}".format(metrics[
-                metric_name][metric_field]['monitoring_period']))
 
-    is_first_period = {}   # This allows to identify the first period
-    for metric_name, metric_dict in metrics.items():
-        is_first_period[metric_name] = {}
-        for metric_field, field_dict in metric_dict.items():
-            is_first_period[metric_name][metric_field] = True
+def to_isoformat(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+class MetricMonitor():
+    ''' Drift detection of a metric field, run every 'detection_interval' hours.
+
+        The values of the last monitoring period are kept in a window, thus each run
+        fetches only the points after the last one received, minus a lookback margin to
+        catch late points (the already received points are not added again). The
+        statistical test is initialized with the values of the first run (x_ref).
+
+        Parameters:
+            metric_name (str): name of the metric (InfluxDB measurement).
+            metric_field (str): field of the metric.
+            field_dict (dict): configuration of the field ('statistical_test', 'test_threshold',
+                'monitoring_period' and, optionally, 'detection_interval', 'query_timeout' 
+                and 'query_lookback').
+            detection_interval (float): default detection interval (in hours).
+            query_timeout (float): default timeout (in seconds) of the queries.
+            query_lookback (float): default lookback margin (in seconds) of the queries.
+    '''
+
+    def __init__(self, metric_name, metric_field, field_dict, detection_interval, query_timeout,
+                 query_lookback=DEFAULT_QUERY_LOOKBACK):
+        self.metric_name = metric_name
+        self.metric_field = metric_field
+        self.statistical_test = field_dict['statistical_test']
+        self.test_threshold = field_dict['test_threshold']
+        self.monitoring_period = field_dict['monitoring_period']
+        self.detection_interval = field_dict.get('detection_interval', detection_interval)
+        self.query_timeout = field_dict.get('query_timeout', query_timeout)
+        self.query_lookback = field_dict.get('query_lookback', query_lookback)
+
+        self.test = None
+        # (time, value) points sorted by time, and their multiplicity
+        self.window = deque()
+        self.window_counts = Counter()
+        self.last_time = None
+        self.drift_state = 0
+
+        # Query of the last run (still pending if it timed out and has not returned yet)
+        self.query = None
+
+        self.next_run = None
+        self.last_run = None
+        self.last_latency = None
+        self.last_error = None
+        self.runs = 0
 
-    at_least_one_drifted = False
+    def get_query_start(self):
+        # Only the points after the last one received minus the lookback margin 
+        # (and in the monitoring period)
+        window_start = datetime.now(timezone.utc) - timedelta(hours=self.monitoring_period)
+        if self.last_time is None:
+            return window_start
+        return max(self.last_time - timedelta(seconds=self.query_lookback), window_start)
 
-    drift_state_dict = {}
+    def update_window(self, points):
+        ''' Merge the queried points into the window and drop the ones out of the monitoring period.
+            The queried points already in the window (same time and value) are not added again.
 
-    while(not at_least_one_drifted):
-        # Run the detection algorithm each detection_interval hours
-        time.sleep(detection_interval * 3600)
+            Return: the values in the window (N x 1).
+        '''
+        new_points = []
+        for point, count in Counter(points).items():
+            new_points += [point] * (count - self.window_counts[point])
+        if new_points:
+            new_points.sort(key=lambda point: point[0])
+            if self.last_time is not None and new_points[0][0] < self.last_time:
+                # Late points: the window is sorted again
+                self.window = deque(sorted(list(self.window) + new_points, key=lambda point: point[0]))
+            else:
+                self.window.extend(new_points)
+            self.window_counts.update(new_points)
+            self.last_time = self.window[-1][0]
+        window_start = datetime.now(timezone.utc) - timedelta(hours=self.monitoring_period)
+        while self.window and self.window[0][0] < window_start:
+            point = self.window.popleft()
+            self.window_counts[point] -= 1
+            if self.window_counts[point] == 0:
+                del self.window_counts[point]
+        return np.reshape(np.array([value for _, value in self.window]), [-1, 1])
 
+    def get_status(self):
+        return {'statistical_test': self.statistical_test,
+                'detection_interval': self.detection_interval,
+                'drift_state': self.drift_state,
+                'initialized': self.test is not None,
+                'runs': self.runs,
+                'window_size': len(self.window),
+                'last_run': to_isoformat(self.last_run),
+                'last_latency': None if self.last_latency is None else round(self.last_latency, 3),
+                'last_error': self.last_error,
+                'next_run': to_isoformat(self.next_run)}
+
+
+class DriftDetectorScheduler():
+    ''' Event-driven scheduler of the drift detection.
+
+        Each metric field runs with its own detection interval and query timeout, and the
+        queries and the statistical tests run in worker threads, thus slow queries do not
+        delay the other metrics. A thread cannot be cancelled, thus the queries are bounded by
+        the timeout of the InfluxDB client as well, and a new query of a metric field is not
+        started while the previous one is still running. The logs and the state files are uploaded in order by a
+        dedicated thread. When a drift is detected, the monitoring ends and the data
+        collection period starts. SIGTERM and SIGINT stop the detector gracefully (the
+        running checks are completed). The status of the detector (next run time and latency
+        of the last run of each metric) is saved in 'drift_detector_status.yaml'.
+
+        Parameters:
+            metrics (dict): configuration of the metrics ({metric: {field: field configuration}}).
+            detection_interval (float): default detection interval (in hours).
+            data_collection_period (float): data collection period (in hours) after a drift.
+            minio_client: MinIO client.
+            influxdb_client: InfluxDB client.
+            logger (DriftDetectorLogger): logger.
+            query_timeout (float): default timeout (in seconds) of the queries.
+            query_lookback (float): default lookback margin (in seconds) of the queries.
+    '''
+
+    def __init__(self, metrics, detection_interval, data_collection_period,
+                 minio_client, influxdb_client, logger, query_timeout=DEFAULT_QUERY_TIMEOUT,
+                 query_lookback=DEFAULT_QUERY_LOOKBACK):
+        self.data_collection_period = data_collection_period
+        self.minio_client = minio_client
+        self.influxdb_client = influxdb_client
+        self.logger = logger
+        self.monitors = []
         for metric_name, metric_dict in metrics.items():
-            if not metric_name in drift_state_dict:
-                drift_state_dict[metric_name] = {}
             for metric_field, field_dict in metric_dict.items():
-                if not metric_field in drift_state_dict[metric_name]:
-                    drift_state_dict[metric_name][metric_field] = 0 
-                if is_first_period[metric_name][metric_field]:
-                    # Get x_ref and initialize the test
-                    # x_ref -> 1 x N
-                    logger.log("Initializing x_ref for metric: {}".format(metric_name))
-                    x_ref = get_metric_values(
-                        influxdb_client, field_dict['monitoring_period'], metric_name, metric_field)
-                    logger.log("Done!")
-
-                    if x_ref is None:
-                        continue
-
-                    # Init test
-                    logger.log("Initializing statistical test for metric: {}, field: {}".format(
-                        metric_name, metric_field))
-                    test_obj = init_test(
-                        field_dict['statistical_test'], x_ref, field_dict['test_threshold'])
-                    logger.log("Done!")
-
-                    metrics[metric_name][metric_field]['test'] = test_obj  
-
-                    # Initilize metric state
-                    drift_state_dict[metric_name][metric_field] = 0
-                    update_metric_drift_state(minio_client, drift_state_dict) 
-
-                    is_first_period[metric_name][metric_field] = False
-
-                else:
-                    # Get the metric values over the user-defined monitoring period
-                    logger.log("Running statistical test for metric: {}, field: {}".format(
-                        metric_name, metric_field))
-                    metric_values = get_metric_values(
-                        influxdb_client, field_dict['monitoring_period'], metric_name, metric_field)
-                    # Run the statistical test
-                    drift_state = run_drift_test(metrics[metric_name][metric_field]['test'], metric_values) 
-                    logger.log("Drift state: {}".format(drift_state))
-
-                    # Drift result
-                    if drift_state == 1: # DRIFTED!
-                        logger.log("Drift detected!")
-                        at_least_one_drifted = True
-                        # Save metric drift state
-                        drift_state_dict[metric_name][metric_field] = drift_state
-                        update_metric_drift_state(minio_client, drift_state_dict)
-
-        if at_least_one_drifted:
-            logger.log("Starting data collection period..")
-            time.sleep(data_collection_period * 3600)
-            
-            # Update metric drift state 
-            drift_state = 2  # DATA COLLECTION PERIOD END
-            for metric_name in drift_state_dict.keys():
-                for metric_field in drift_state_dict[metric_name].keys():
-                    if drift_state_dict[metric_name][metric_field] == 1:
-                        drift_state_dict[metric_name][metric_field] = drift_state
-            update_metric_drift_state(minio_client, drift_state_dict)
-
-            logger.log("Done! Collected data is available.")
-            logger.log("Ending drift detector..Done!") 
+                self.monitors.append(MetricMonitor(
+                    metric_name, metric_field, field_dict, detection_interval, query_timeout, query_lookback))
+        self.state = 'starting'
+        # Queries and statistical tests
+        self.executor = ThreadPoolExecutor(max_workers=max(4, len(self.monitors)))
+        # Uploads (logs, drift state and status), in order
+        self.io_executor = ThreadPoolExecutor(max_workers=1)
+
+    def _log(self, txt):
+        try:
+            self.logger.log(txt)
+        except Exception:
+            print(txt)
+
+    def log(self, txt):
+        self.loop.run_in_executor(self.io_executor, self._log, txt)
+
+    def log_exception(self):
+        for line in traceback.format_exc().split('\n'):
+            self.log(line)
+
+    def get_drift_state_dict(self):
+        drift_state_dict = {}
+        for monitor in self.monitors:
+            drift_state_dict.setdefault(monitor.metric_name, {})[monitor.metric_field] = monitor.drift_state
+        return drift_state_dict
+
+    async def save_drift_state(self):
+        await self.loop.run_in_executor(
+            self.io_executor, update_metric_drift_state, self.minio_client, self.get_drift_state_dict())
+
+    def _update_status(self, status_dict):
+        try:
+            update_status(self.minio_client, status_dict)
+        except Exception:
+            print(traceback.format_exc())
+
+    def save_status(self):
+        status_dict = {'state': self.state, 'updated': to_isoformat(time.time()), 'metrics': {}}
+        for monitor in self.monitors:
+            status_dict['metrics'].setdefault(monitor.metric_name, {})[monitor.metric_field] = monitor.get_status()
+        self.loop.run_in_executor(self.io_executor, self._update_status, status_dict)
+
+    async def wait_event(self, event, timeout):
+        ''' Wait for the event at most 'timeout' seconds. Return True if the event is set.
+        '''
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return event.is_set()
+
+    async def check(self, monitor):
+        ''' Run the drift detection of the metric field once.
+        '''
+        started = time.time()
+        monitor.last_run = started
+        monitor.runs += 1
+        if monitor.query is not None and not monitor.query.done():
+            # The query of the previous run timed out and its thread is still running
+            monitor.last_error = 'Previous query still running'
+            self.log("Previous query still running, run skipped for metric: {}, field: {}".format(
+                monitor.metric_name, monitor.metric_field))
+            return
+        monitor.query = self.loop.run_in_executor(
+            self.executor, get_metric_points, self.influxdb_client, monitor.get_query_start(),
+            monitor.metric_name, monitor.metric_field)
+        # The result of a query completed after its timeout is discarded
+        monitor.query.add_done_callback(lambda query: query.cancelled() or query.exception())
+        try:
+            # Shielded: on timeout the query stays pending until its thread returns
+            points = await asyncio.wait_for(asyncio.shield(monitor.query), monitor.query_timeout)
+        except asyncio.TimeoutError:
+            monitor.last_error = 'Query timeout ({} s)'.format(monitor.query_timeout)
+            self.log("Query timeout ({} s) for metric: {}, field: {}".format(
+                monitor.query_timeout, monitor.metric_name, monitor.metric_field))
             return
-                
+        except Exception:
+            monitor.last_error = traceback.format_exc().strip().split('\n')[-1]
+            self.log_exception()
+            return
+        metric_values = monitor.update_window(points)
+        monitor.last_latency = time.time() - started
+        monitor.last_error = None
+
+        if len(metric_values) == 0:
+            self.log('No metrics found on InfluxDB yet (metric: {}, field: {})'.format(
+                monitor.metric_name, monitor.metric_field))
+            return
+
+        if monitor.test is None:
+            # Initialize the test with x_ref (values of the first monitoring period)
+            self.log("Initializing statistical test for metric: {}, field: {}".format(
+                monitor.metric_name, monitor.metric_field))
+            monitor.test = await self.loop.run_in_executor(
+                self.executor, init_test, monitor.statistical_test, metric_values, monitor.test_threshold)
+            self.log("Done!")
+            monitor.drift_state = 0
+            await self.save_drift_state()
+        else:
+            self.log("Running statistical test for metric: {}, field: {}".format(
+                monitor.metric_name, monitor.metric_field))
+            drift_state = await self.loop.run_in_executor(
+                self.executor, run_drift_test, monitor.test, metric_values)
+            self.log("Drift state: {} (metric: {}, field: {})".format(
+                drift_state, monitor.metric_name, monitor.metric_field))
+            if drift_state == 1: # DRIFTED!
+                self.log("Drift detected!")
+                monitor.drift_state = drift_state
+                await self.save_drift_state()
+        monitor.last_latency = time.time() - started
+
+    async def monitor(self, monitor):
+        while True:
+            interval = monitor.detection_interval * 3600
+            monitor.next_run = time.time() + interval
+            self.save_status()
+            if await self.wait_event(self.monitoring_end, interval):
+                return
+            try:
+                await self.check(monitor)
+            except Exception:
+                monitor.last_error = traceback.format_exc().strip().split('\n')[-1]
+                self.log_exception()
+            if monitor.drift_state == 1:
+                self.monitoring_end.set()
+                return
+
+    def stop(self):
+        self.log("Stopping Drift Detector..")
+        self.shutdown.set()
+        self.monitoring_end.set()
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        # End of the monitoring (drift detected or shutdown) and shutdown
+        self.monitoring_end = asyncio.Event()
+        self.shutdown = asyncio.Event()
+        for sig in [signal.SIGTERM, signal.SIGINT]:
+            try:
+                self.loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        try:
+            self.state = 'running'
+            await asyncio.gather(*[self.monitor(monitor) for monitor in self.monitors])
+
+            if any([monitor.drift_state == 1 for monitor in self.monitors]) and not self.shutdown.is_set():
+                self.state = 'data_collection'
+                self.save_status()
+                self.log("Starting data collection period..")
+                if await self.wait_event(self.shutdown, self.data_collection_period * 3600):
+                    self.state = 'stopped'
+                    self.log("Drift Detector stopped during the data collection period.")
+                    return
+
+                # Update metric drift state
+                for monitor in self.monitors:
+                    if monitor.drift_state == 1:
+                        monitor.drift_state = 2  # DATA COLLECTION PERIOD END
+                await self.save_drift_state()
+                self.state = 'completed'
+                self.log("Done! Collected data is available.")
+                self.log("Ending drift detector..Done!")
+            else:
+                self.state = 'stopped'
+                self.log("Drift Detector stopped.")
+        finally:
+            for monitor in self.monitors:
+                monitor.next_run = None
+            self.save_status()
+            # Queries still running (e.g., after a timeout) are not waited
+            self.executor.shutdown(wait=False)
+            self.io_executor.shutdown(wait=True)
+
+
+def main(metrics, detection_interval, data_collection_period,
+         minio_client, influxdb_client, logger, query_timeout=DEFAULT_QUERY_TIMEOUT,
+         query_lookback=DEFAULT_QUERY_LOOKBACK):
+
+    logger.log("Starting Drift Detector algorithm..")
+    logger.log("The following metrics will be monitored")
+
+    for metric_name in metrics.keys():
+        for metric_field in metrics[metric_name].keys():
+            field_dict = metrics[metric_name][metric_field]
+            logger.log("Metric: {}, Field: {}".format(metric_name, metric_field))
+            logger.log(" - Statistical Test: {}".format(field_dict['statistical_test']))
+            logger.log(" - Test Threshold: {}".format(field_dict['test_threshold']))
+            logger.log(" - Monitoring Period: {}".format(field_dict['monitoring_period']))
+            logger.log(" - Detection Interval: {}".format(field_dict.get('detection_interval', detection_interval)))
+
+    scheduler = DriftDetectorScheduler(metrics, detection_interval, data_collection_period,
+                                       minio_client, influxdb_client, logger, query_timeout, query_lookback)
+    asyncio.run(scheduler.run())
+
 if __name__ == '__main__':
-    
-    # Load Drift Detector config 
+
+    # Load Drift Detector config
     with open('./drift_detector_config.yaml', 'r') as f:
         drift_detector_config = yaml.safe_load(f)
 
     metrics = drift_detector_config['metrics']
     detection_interval = drift_detector_config['detection_interval']
     data_collection_period = drift_detector_config['data_collection_period']
-    
-    influxdb_client = get_influxdb_client() 
+    query_timeout = drift_detector_config.get('query_timeout', DEFAULT_QUERY_TIMEOUT)
+    query_lookback = drift_detector_config.get('query_lookback', DEFAULT_QUERY_LOOKBACK)
+    # The client timeout bounds the queries running in the worker threads
+    max_query_timeout = max([query_timeout] + [
+        field_dict.get('query_timeout', query_timeout)
+        for metric_dict in metrics.values() for field_dict in metric_dict.values()])
+
+    influxdb_client = get_influxdb_client(max_query_timeout)
     minio_client = get_minio_client()
 
     logger = DriftDetectorLogger(minio_client)
 
     try:
-        main(metrics, detection_interval, data_collection_period, 
-             minio_client, influxdb_client, logger)
+        main(metrics, detection_interval, data_collection_period,
+             minio_client, influxdb_client, logger, query_timeout, query_lookback)
     except:
-        exception = traceback.format_exc() 
+        exception = traceback.format_exc()
         exception = exception.split('\n')
         for line in exception:
-            logger.log(line)
\ No newline at end of file
+            logger.log(line)
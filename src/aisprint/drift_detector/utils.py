@@ -25,11 +25,18 @@ def run_drift_test(test, metric_values):
     drifted = preds['data']['is_drift']
     return drifted 
 
-def get_influxdb_client():
+def get_influxdb_client(timeout=None):
+    ''' Get the InfluxDB client. 'timeout' (in seconds) is the timeout of the HTTP requests,
+        thus a query does not block its thread longer than it.
+    '''
+    kwargs = {}
+    if timeout is not None:
+        # InfluxDBClient timeout is in milliseconds
+        kwargs['timeout'] = int(timeout * 1000)
     client = InfluxDBClient(
         url=os.getenv('DRIFT_DETECTOR_INFLUXDB_URL'),
         token=os.getenv('DRIFT_DETECTOR_INFLUXDB_TOKEN'),
-        org='ai-sprint')
+        org='ai-sprint', **kwargs)
     return client
 
 def get_minio_client():
@@ -79,6 +86,32 @@ def get_metric_values(client, time_range, metric, field, logger=None):
     
     return np.reshape(np.array(metric_values), [-1, 1]) 
 
+def get_metric_points(client, start, metric, field):
+    ''' Get the (time, value) points of the metric field with time not earlier than 'start'
+        (datetime), sorted by time. Return an empty list if there are no points.
+    '''
+    query = (
+        'from (bucket: bucket)'
+        ' |> range(start: start)'
+        ' |> filter(fn: (r) => r._measurement == metric and r._field == field)'
+        ' |> keep (columns: ["_time", "_value"])'
+        ' |> group()'
+        ' |> sort(columns: ["_time"])'
+    )
+    params = {'bucket': os.getenv('BUCKET_NAME'),
+              'start': start,
+              'metric': metric,
+              'field': field}
+
+    api = client.query_api()
+    results = api.query(query=query, params=params)
+
+    points = []
+    for table in results:
+        for record in table:
+            points.append((record.get_time(), record.get_value()))
+    return points
+
 def update_metric_drift_state(minio_client, drift_state_dict):
     with open('drift_state.yaml', 'w') as f:
         yaml.dump(drift_state_dict, f)
@@ -87,6 +120,15 @@ def update_metric_drift_state(minio_client, drift_state_dict):
         os.getenv('DRIFT_DETECTOR_MINIO_BUCKET'), 
         'drift_state.yaml')
 
+def update_status(minio_client, status_dict):
+    with open('drift_detector_status.yaml.tmp', 'w') as f:
+        yaml.dump(status_dict, f, sort_keys=False)
+    os.replace('drift_detector_status.yaml.tmp', 'drift_detector_status.yaml')
+    minio_client.upload_file(
+        'drift_detector_status.yaml', 
+        os.getenv('DRIFT_DETECTOR_MINIO_BUCKET'), 
+        'drift_detector_status.yaml')
+
 class DriftDetectorLogger:
     def __init__(self, minio_client):
         self.minio_client = minio_client
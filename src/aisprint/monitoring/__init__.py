@@ -1 +1,3 @@
-from .monitoring import report_execution_time
\ No newline at end of file
+from .monitoring import report_execution_time, report_phase_time
+from .reporter import Reporter, get_reporter, set_reporter
+from .sinks import Sink, FileSink, InfluxDBSink
\ No newline at end of file
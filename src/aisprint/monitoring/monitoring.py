@@ -1,43 +1,60 @@
-import os
-import pandas as pd
-
-# NOTE: JUST FOR TESTING, IT MUST BE IMPLEMENTED TO STORE THE RUNTIME INFO TO INFLUXDB
-
-# InfluxDB address (represented as a 'csv' file)
-INFLUXDB_ADDR = './influxdb.csv'
-
-def report_execution_time(uuid, kci, resource_id, component_name, 
-                          start_time_job, start_time_func, end_time_func):
-
-    ''' Prototype function for sending runtime information to InfluxDB. 
-    This function is executed by the 'exec_time' decorator during component's execution.
-
-    NOTE: JUST FOR TESTING IT SIMULATES THE WRITING ON INFLUXDB BY WRITING ON A CSV FILE.
-        
-        Parameters:
-            uuid (str): universally unique identifier associated to a specific file.
-            kci (str): kubernetes cluster identifier.
-            resource_id (str): identifier of the resource on which the specific application component
-                has been deployed.
-            component_name (str): user-defined name of the application component.
-            start_time_job (float): job creation time including the creation time of the input 
-                file in the MinIO storage.
-            start_time_func (float): starting time of the main function of the monitored component.
-            end_time_func (float): end time of the main function of the monitored component.
-    '''
-
-
-    # Create the entry to be stored into InfluxDB
-    entry = {'uuid': [uuid], 'resource_id': [resource_id], 'component_name': [component_name],
-            'start_time_job': [start_time_job], 'start_time_func': [start_time_func], 'end_time_func': [end_time_func]}
-
-
-    if os.path.exists(INFLUXDB_ADDR):
-        # csv file already exists, thus it must be updated 
-        dataframe = pd.read_csv(INFLUXDB_ADDR)
-        dataframe = dataframe.append(pd.DataFrame(entry))
-    else:
-        # csv does not exist. Let's initialize a new dataframe!
-        dataframe = pd.DataFrame(entry)
-
-    dataframe.to_csv(INFLUXDB_ADDR, index=False)
\ No newline at end of file
+from .reporter import get_reporter
+
+# Measurement name of the execution time records
+EXEC_TIME_MEASUREMENT = 'exec_time'
+
+def report_execution_time(uuid, kci, resource_id, component_name, 
+                          start_time_job, start_time_func, end_time_func):
+
+    ''' Send runtime information to the monitoring sink (InfluxDB or a local file).
+    This function is executed by the 'exec_time' decorator during component's execution.
+
+    The record is only enqueued in the in-memory buffer of the process-wide reporter,
+    which writes the records in batches (InfluxDB line protocol) from a background thread.
+        
+        Parameters:
+            uuid (str): universally unique identifier associated to a specific file.
+            kci (str): kubernetes cluster identifier.
+            resource_id (str): identifier of the resource on which the specific application component
+                has been deployed.
+            component_name (str): user-defined name of the application component.
+            start_time_job (float): job creation time including the creation time of the input 
+                file in the MinIO storage.
+            start_time_func (float): starting time of the main function of the monitored component.
+            end_time_func (float): end time of the main function of the monitored component.
+    '''
+
+    tags = {'component_name': component_name, 'resource_id': resource_id, 'kci': kci}
+    fields = {'uuid': uuid, 'start_time_job': float(start_time_job),
+              'start_time_func': float(start_time_func), 'end_time_func': float(end_time_func)}
+
+    get_reporter().report(EXEC_TIME_MEASUREMENT, tags, fields, timestamp_ns=int(end_time_func * 1e9))
+
+# Measurement name of the phase (span) time records
+PHASE_TIME_MEASUREMENT = 'phase_time'
+
+def report_phase_time(uuid, kci, resource_id, component_name, phase,
+                      start_time_phase, end_time_phase):
+
+    ''' Send the execution time of a named phase of a component (e.g., 'pre-processing',
+    'inference', 'post-processing') to the monitoring sink.
+    This function is executed by the 'phase' context manager, the records share 
+    the reporting pipeline of 'report_execution_time'.
+
+        Parameters:
+            uuid (str): universally unique identifier associated to a specific file.
+            kci (str): kubernetes cluster identifier.
+            resource_id (str): identifier of the resource on which the specific application component
+                has been deployed.
+            component_name (str): user-defined name of the application component.
+            phase (str): name of the phase.
+            start_time_phase (float): starting time of the phase.
+            end_time_phase (float): end time of the phase.
+    '''
+
+    tags = {'component_name': component_name, 'resource_id': resource_id, 'kci': kci, 'phase': phase}
+    fields = {'uuid': uuid, 'start_time_phase': float(start_time_phase),
+              'end_time_phase': float(end_time_phase),
+              'duration': float(end_time_phase) - float(start_time_phase)}
+
+    get_reporter().report(PHASE_TIME_MEASUREMENT, tags, fields, timestamp_ns=int(end_time_phase * 1e9))
@@ -0,0 +1,231 @@
+import os
+import atexit
+import threading
+from collections import deque
+
+from .sinks import FileSink, InfluxDBSink
+
+# Policies applied when the buffer is full
+DROP_OLDEST = 'drop_oldest'   # ring buffer: the oldest record is overwritten
+DROP_NEWEST = 'drop_newest'   # the new record is discarded
+BLOCK = 'block'               # backpressure: the caller waits for the flusher
+
+REPORTER_POLICIES = [DROP_OLDEST, DROP_NEWEST, BLOCK]
+
+
+def _escape_key(value):
+    # Measurement names, tag keys/values and field keys
+    return str(value).replace('\\', '\\\\').replace(',', '\\,').replace('=', '\\=').replace(' ', '\\ ')
+
+def _format_field(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return '{}i'.format(value)
+    if isinstance(value, float):
+        return repr(value)
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def to_line_protocol(measurement, tags, fields, timestamp_ns=None):
+    ''' Format a record in InfluxDB line protocol. Tags and fields with None value are skipped.
+
+        Parameters:
+            measurement (str): name of the measurement.
+            tags (dict): indexed metadata of the record.
+            fields (dict): values of the record.
+            timestamp_ns (int): timestamp of the record in nanoseconds.
+    '''
+    line = _escape_key(measurement)
+    for k, v in tags.items():
+        if v is None or v == '':
+            continue
+        line += ',' + _escape_key(k) + '=' + _escape_key(v)
+    line += ' ' + ','.join(
+        [_escape_key(k) + '=' + _format_field(v) for k, v in fields.items() if v is not None])
+    if timestamp_ns is not None:
+        line += ' ' + str(int(timestamp_ns))
+    return line
+
+
+class Reporter():
+    ''' Buffered, non-blocking reporter of runtime records.
+
+        Records are stored in a bounded in-memory buffer and written in batches
+        to the sink by a background flusher thread, thus the caller never waits for I/O
+        (unless the 'block' policy is selected and the buffer is full).
+
+        Parameters:
+            sink (Sink): destination of the records.
+            capacity (int): maximum number of buffered records.
+            batch_size (int): maximum number of records written with a single sink call.
+            flush_interval (float): maximum time (in seconds) a record waits in the buffer.
+            policy (str): what to do when the buffer is full, one in REPORTER_POLICIES.
+            block_timeout (float): maximum waiting time (in seconds) with the 'block' policy,
+                None to wait indefinitely. The record is dropped when the timeout expires.
+    '''
+
+    def __init__(self, sink, capacity=10000, batch_size=500, flush_interval=1.0,
+                 policy=DROP_OLDEST, block_timeout=None):
+        if policy not in REPORTER_POLICIES:
+            raise ValueError("Unknown reporter policy '{}'. Allowed policies: {}".format(
+                policy, REPORTER_POLICIES))
+        self.sink = sink
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self.dropped = 0
+        self.failed = 0
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._thread = None
+        self._pid = None
+
+    def report(self, measurement, tags, fields, timestamp_ns=None):
+        ''' Enqueue a record. Return False if the record has been dropped.
+        '''
+        record = (measurement, tags, fields, timestamp_ns)
+        with self._cond:
+            if self._closed:
+                # Late records (e.g., reported by other atexit hooks) are written directly
+                self._write([record])
+                return True
+            if len(self._buffer) >= self.capacity:
+                if self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                elif self.policy == DROP_OLDEST:
+                    self._buffer.popleft()
+                    self.dropped += 1
+                else:
+                    self._ensure_flusher()
+                    self._cond.notify_all()
+                    if not self._cond.wait_for(
+                            lambda: len(self._buffer) < self.capacity or self._closed,
+                            timeout=self.block_timeout):
+                        self.dropped += 1
+                        return False
+                    if self._closed:
+                        # Woken up by close(): the buffer is no longer drained by the flusher
+                        self._write([record])
+                        return True
+            self._buffer.append(record)
+            self._ensure_flusher()
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+        return True
+
+    def flush(self):
+        ''' Synchronously write all the buffered records.
+        '''
+        with self._cond:
+            batch = list(self._buffer)
+            self._buffer.clear()
+            self._cond.notify_all()
+        self._write(batch)
+
+    def close(self):
+        ''' Stop the flusher thread and write the remaining records.
+        '''
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=max(1.0, 2 * self.flush_interval))
+        self.flush()
+        self.sink.close()
+
+    def _ensure_flusher(self):
+        # Called with the lock held. The thread is (re)started lazily, also in forked processes
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name='aisprint-reporter-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or len(self._buffer) >= min(self.batch_size, self.capacity),
+                    timeout=self.flush_interval)
+                batch = []
+                while self._buffer and len(batch) < self.batch_size:
+                    batch.append(self._buffer.popleft())
+                # Wake up producers waiting for free space (backpressure)
+                self._cond.notify_all()
+                stop = self._closed and not self._buffer
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        if not batch:
+            return
+        lines = [to_line_protocol(*record) for record in batch]
+        with self._write_lock:
+            try:
+                self.sink.write(lines)
+            except Exception as e:
+                self.failed += len(lines)
+                print("[AI-SPRINT]: " + "Unable to report {} monitoring records: {}".format(len(lines), e))
+
+
+def get_default_sink():
+    ''' Build the sink from the environment:
+            - MONITORING_SINK: 'file' (default) or 'influxdb'
+            - MONITORING_FILE: path of the file sink (default './influxdb.lp')
+            - MONITORING_INFLUXDB_URL, MONITORING_INFLUXDB_BUCKET,
+              MONITORING_INFLUXDB_ORG, MONITORING_INFLUXDB_TOKEN: InfluxDB sink
+    '''
+    sink_type = os.getenv('MONITORING_SINK', 'file')
+    if sink_type == 'influxdb':
+        return InfluxDBSink(
+            url=os.getenv('MONITORING_INFLUXDB_URL'),
+            bucket=os.getenv('MONITORING_INFLUXDB_BUCKET'),
+            org=os.getenv('MONITORING_INFLUXDB_ORG', 'ai-sprint'),
+            token=os.getenv('MONITORING_INFLUXDB_TOKEN'))
+    elif sink_type == 'file':
+        return FileSink(os.getenv('MONITORING_FILE', './influxdb.lp'))
+    raise ValueError("Unknown monitoring sink '{}'. Allowed sinks: ['file', 'influxdb']".format(sink_type))
+
+
+_reporter = None
+_reporter_lock = threading.Lock()
+
+def get_reporter():
+    ''' Return the process-wide Reporter, creating it at the first call.
+        Buffered records are flushed when the process exits.
+    '''
+    global _reporter
+    if _reporter is None:
+        with _reporter_lock:
+            if _reporter is None:
+                reporter = Reporter(
+                    get_default_sink(),
+                    capacity=int(os.getenv('MONITORING_BUFFER_CAPACITY', 10000)),
+                    batch_size=int(os.getenv('MONITORING_BATCH_SIZE', 500)),
+                    flush_interval=float(os.getenv('MONITORING_FLUSH_INTERVAL', 1.0)),
+                    policy=os.getenv('MONITORING_POLICY', DROP_OLDEST))
+                atexit.register(reporter.close)
+                _reporter = reporter
+    return _reporter
+
+def set_reporter(reporter):
+    ''' Replace the process-wide Reporter (e.g., to use a custom sink).
+        The previous reporter is closed.
+    '''
+    global _reporter
+    with _reporter_lock:
+        previous = _reporter
+        _reporter = reporter
+        atexit.register(reporter.close)
+    if previous is not None and previous is not reporter:
+        previous.close()
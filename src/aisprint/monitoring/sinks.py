@@ -0,0 +1,71 @@
+import os
+import urllib.parse
+import urllib.request
+from abc import ABC, abstractmethod
+
+
+class Sink(ABC):
+    ''' Destination of the batched line-protocol records produced by the reporter.
+    '''
+
+    @abstractmethod
+    def write(self, lines):
+        ''' Write a batch of records.
+
+            Parameters:
+                lines (list of str): records in InfluxDB line protocol.
+        '''
+        pass
+
+    def close(self):
+        pass
+
+
+class FileSink(Sink):
+    ''' Append the records to a local file (one line-protocol record per line).
+
+        Parameters:
+            path (str): path of the file.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, lines):
+        if not lines:
+            return
+        dirname = os.path.dirname(self.path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        # A single append per batch: concurrent writers never interleave partial lines
+        with open(self.path, 'a') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+class InfluxDBSink(Sink):
+    ''' Send the records to an InfluxDB-compatible HTTP write endpoint (API v2).
+
+        Parameters:
+            url (str): base URL of the InfluxDB server (e.g., 'http://influxdb:8086').
+            bucket (str): destination bucket.
+            org (str): InfluxDB organization.
+            token (str): authentication token.
+            timeout (float): timeout (in seconds) of each write request.
+    '''
+
+    def __init__(self, url, bucket, org='ai-sprint', token=None, timeout=5.0):
+        query = urllib.parse.urlencode({'org': org, 'bucket': bucket, 'precision': 'ns'})
+        self.write_url = url.rstrip('/') + '/api/v2/write?' + query
+        self.token = token
+        self.timeout = timeout
+
+    def write(self, lines):
+        if not lines:
+            return
+        headers = {'Content-Type': 'text/plain; charset=utf-8'}
+        if self.token:
+            headers['Authorization'] = 'Token ' + self.token
+        request = urllib.request.Request(
+            self.write_url, data='\n'.join(lines).encode('utf-8'), headers=headers, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
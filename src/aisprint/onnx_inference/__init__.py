@@ -1 +1,4 @@
-from .onnx_inference import load_and_inference
\ No newline at end of file
+from .onnx_inference import load_and_inference
+from .onnx_inference import load_and_inference_batch
+from .session_pool import SessionPool, get_session_pool
+from .wire_format import save_tensors, load_tensors, TensorFile
\ No newline at end of file
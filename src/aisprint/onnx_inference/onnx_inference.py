@@ -1,70 +1,146 @@
-import os
-import onnx
-import onnxruntime as ort
-import pandas as pd
+import numpy as np
 
-def get_exit_node(exit_node_df):
-    exit_node = pd.read_pickle(exit_node_df).iloc[0].exit_node
-    return exit_node
+from .session_pool import get_session_pool, get_exit_node
+from ..annotations.annotations import phase
 
-def load_and_inference(onnx_file, input_dict):
-    onnx_model = onnx.load(onnx_file)
-    onnx.checker.check_model(onnx_model)
-    onnx.helper.printable_graph(onnx_model.graph)
-
-    # Check whether the onnx folder contains 'exit_nodes.df' file
-    exit_node_file = os.path.join(os.path.dirname(onnx_file), 'exit_node.df')
-    is_ee_model = False
-    if os.path.exists(exit_node_file):
-        is_ee_model = True
-
-    #To get the inputs we must ignore the initializers, otherwise it would seem like we have a lot of inputs in some cases
-    input_all = [node.name for node in onnx_model.graph.input]
-    input_initializer =  [node.name for node in onnx_model.graph.initializer]
-    net_feed_input = list(set(input_all) - set(input_initializer))
-
-    so = ort.SessionOptions()
-    
-    # Get available providers
-    available_providers = ort.get_available_providers()
-    
-    ort_session = ort.InferenceSession(onnx_file, so, providers=available_providers)
-
-    session_input = {}
-    for node_name in net_feed_input:
-        session_input[node_name] = input_dict[node_name] 
+# Name of the phase recorded around the session run
+INFERENCE_PHASE = 'inference'
 
-    result = ort_session.run(None, session_input)
+def _build_return(model_entry, input_dict, result):
+    ''' Build the values returned by 'load_and_inference' from the session results
+        of a single request.
+    '''
+    net_feed_input = model_entry.net_feed_input
 
     return_dict = {}
-    outputs = onnx_model.graph.output
 
-    if is_ee_model:
+    if model_entry.is_ee_model:
         ee_return = []
-        exit_node = get_exit_node(exit_node_file)
-    
+        exit_node = model_entry.exit_node
+
     # NOTE: the following supposes ordered results
-    for idx, output in enumerate(outputs):
-        if is_ee_model:
-            if output.name != exit_node:
-                return_dict[output.name] = result[idx]
+    for idx, output_name in enumerate(model_entry.outputs):
+        if model_entry.is_ee_model:
+            if output_name != exit_node:
+                return_dict[output_name] = result[idx]
             else:
                 ee_return.append(result[idx])
         else:
-            return_dict[output.name] = result[idx]
+            return_dict[output_name] = result[idx]
 
     if 'keep' in input_dict and input_dict:
         if input_dict['keep']:
             # Forward input tensors
             for input in net_feed_input:
                 return_dict[input] = input_dict[input]
-    
+
     # Unused input must be forwarded
     for input in input_dict:
         if input not in net_feed_input:
             return_dict[input] = input_dict[input]
-    
-    if is_ee_model:
+
+    if model_entry.is_ee_model:
         return return_dict, ee_return
     else:
-        return return_dict, result
\ No newline at end of file
+        return return_dict, result
+
+def load_and_inference(onnx_file, input_dict):
+    # Get the cached session and graph metadata (loaded only at the first call)
+    model_entry = get_session_pool().get(onnx_file)
+
+    session_input = {}
+    for node_name in model_entry.net_feed_input:
+        session_input[node_name] = input_dict[node_name]
+
+    with phase(INFERENCE_PHASE):
+        result = model_entry.session.run(None, session_input)
+
+    return _build_return(model_entry, input_dict, result)
+
+def _get_batch_sizes(model_entry, input_dicts):
+    ''' Return the batch size of each request if the feed tensors of all the requests
+        can be stacked along the batch axis, None otherwise.
+    '''
+    if not model_entry.dynamic_batch:
+        return None
+
+    batch_sizes = []
+    for input_dict in input_dicts:
+        batch_size = None
+        for node_name in model_entry.net_feed_input:
+            tensor = input_dict[node_name]
+            if not isinstance(tensor, np.ndarray) or tensor.ndim == 0:
+                return None
+            if batch_size is None:
+                batch_size = tensor.shape[0]
+            elif tensor.shape[0] != batch_size:
+                return None
+        batch_sizes.append(batch_size)
+
+    # Stacked tensors must agree on the non-batch dimensions and on the type
+    for node_name in model_entry.net_feed_input:
+        first = input_dicts[0][node_name]
+        for input_dict in input_dicts[1:]:
+            tensor = input_dict[node_name]
+            if tensor.shape[1:] != first.shape[1:] or tensor.dtype != first.dtype:
+                return None
+    return batch_sizes
+
+def load_and_inference_batch(onnx_file, input_dicts):
+    ''' Batched version of 'load_and_inference'.
+
+        The feed tensors of the requests are concatenated along the batch (first) axis,
+        the session is run once and the outputs are split back per request.
+        When the requests cannot be stacked (e.g., fixed batch size in the model, outputs
+        without the batch axis, different shapes or types) or the batched run fails,
+        they are run one at a time.
+
+        Parameters:
+            onnx_file (str): path to the ONNX model.
+            input_dicts (list of dict): one 'input_dict' for each request,
+                as in 'load_and_inference'.
+
+        Return:
+            list with the (return_dict, result) tuple of each request, as returned
+            by 'load_and_inference'.
+    '''
+    input_dicts = list(input_dicts)
+    if len(input_dicts) == 0:
+        return []
+
+    model_entry = get_session_pool().get(onnx_file)
+
+    batch_sizes = None
+    if len(input_dicts) > 1:
+        batch_sizes = _get_batch_sizes(model_entry, input_dicts)
+
+    if batch_sizes is not None:
+        session_input = {}
+        for node_name in model_entry.net_feed_input:
+            session_input[node_name] = np.concatenate(
+                [input_dict[node_name] for input_dict in input_dicts], axis=0)
+
+        try:
+            with phase(INFERENCE_PHASE):
+                batched_result = model_entry.session.run(None, session_input)
+        except Exception as e:
+            # Failed runs are not reported: the requests are run one at a time
+            batched_result = None
+            print("[AI-SPRINT]: " + "Batched inference of {} failed, running {} requests one at a time: {}".format(
+                model_entry.onnx_file, len(input_dicts), e))
+
+        if batched_result is not None:
+            # The batch axis of the outputs is tied to the inputs' one by the model (see 'dynamic_batch')
+            total_batch = sum(batch_sizes)
+            for output_name, output in zip(model_entry.outputs, batched_result):
+                if output.shape[0] != total_batch:
+                    raise Exception("Output '{}' of {} has batch size {}, expected {}.".format(
+                        output_name, model_entry.onnx_file, output.shape[0], total_batch))
+            split_points = np.cumsum(batch_sizes)[:-1]
+            splitted_outputs = [np.split(output, split_points, axis=0) for output in batched_result]
+            return [
+                _build_return(model_entry, input_dict, [outputs[idx] for outputs in splitted_outputs])
+                for idx, input_dict in enumerate(input_dicts)]
+
+    # Fallback: one session call for each request
+    return [load_and_inference(onnx_file, input_dict) for input_dict in input_dicts]
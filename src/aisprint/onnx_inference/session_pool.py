@@ -0,0 +1,190 @@
+import os
+import threading
+from collections import OrderedDict
+
+import onnx
+import onnxruntime as ort
+import pandas as pd
+
+# Default limits of the process-wide session pool.
+# They can be overridden through the following environment variables:
+#   - AISPRINT_SESSION_POOL_MAX_SESSIONS: maximum number of cached sessions
+#   - AISPRINT_SESSION_POOL_MAX_MB: memory budget (in MB) of the cached sessions
+DEFAULT_MAX_SESSIONS = 8
+DEFAULT_MAX_MB = 2048
+
+
+class ModelEntry():
+    ''' Cached ONNX Runtime session together with the graph metadata
+        required by 'load_and_inference'.
+
+        Parameters:
+            onnx_file (str): path to the ONNX model.
+            mtime (float): modification time of the ONNX file when it was loaded.
+            size (int): estimated memory footprint of the session (in bytes).
+            session (ort.InferenceSession): the ONNX Runtime session.
+            net_feed_input (list of str): true inputs of the model (initializers excluded).
+            outputs (list of str): ordered names of the model outputs.
+            exit_node (str): name of the early-exit output ('exit_node.df'), None if the
+                model is not an early-exit segment.
+            dynamic_batch (bool): True if the true inputs and the outputs share the same
+                symbolic batch (first) axis.
+    '''
+
+    def __init__(self, onnx_file, mtime, size, session,
+                 net_feed_input, outputs, exit_node=None, dynamic_batch=False):
+        self.onnx_file = onnx_file
+        self.mtime = mtime
+        self.size = size
+        self.session = session
+        self.net_feed_input = net_feed_input
+        self.outputs = outputs
+        self.exit_node = exit_node
+        self.dynamic_batch = dynamic_batch
+
+    @property
+    def is_ee_model(self):
+        return self.exit_node is not None
+
+
+class SessionPool():
+    ''' Process-wide registry of ONNX Runtime sessions.
+
+        Sessions are keyed by the absolute path and the modification time of the ONNX file
+        and of its 'exit_node.df' file (if any), thus a model overwritten on disk, or whose
+        exit node is added, changed or removed, is transparently reloaded. Least-recently-used
+        sessions are evicted when either the number of sessions or the memory budget
+        (estimated with the size of the ONNX file) is exceeded.
+
+        Parameters:
+            max_sessions (int): maximum number of cached sessions.
+            max_bytes (int): memory budget of the cached sessions (in bytes).
+    '''
+
+    def __init__(self, max_sessions=DEFAULT_MAX_SESSIONS, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._used_bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def used_bytes(self):
+        return self._used_bytes
+
+    def get(self, onnx_file):
+        ''' Return the ModelEntry of 'onnx_file', loading it if it is not cached yet.
+        '''
+        onnx_file = os.path.abspath(onnx_file)
+        mtime = os.path.getmtime(onnx_file)
+        # None if the model has no early exit
+        exit_node_mtime = None
+        exit_node_file = get_exit_node_file(onnx_file)
+        if os.path.exists(exit_node_file):
+            exit_node_mtime = os.path.getmtime(exit_node_file)
+        key = (onnx_file, mtime, exit_node_mtime)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        # Load outside the lock: loading a model can take a while and
+        # must not block the inference of the already cached models
+        entry = self._load(onnx_file, mtime)
+
+        with self._lock:
+            # Another thread could have loaded the same model in the meanwhile
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            # Drop stale versions of the same file
+            for stale_key in [k for k in self._entries if k[0] == onnx_file]:
+                self._remove(stale_key)
+            self._entries[key] = entry
+            self._used_bytes += entry.size
+            self._evict(keep=key)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._used_bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._used_bytes -= entry.size
+
+    def _evict(self, keep):
+        # Evict least-recently-used sessions, but always keep the requested one
+        while len(self._entries) > 1 and (
+                len(self._entries) > self.max_sessions or self._used_bytes > self.max_bytes):
+            oldest_key = next(iter(self._entries))
+            if oldest_key == keep:
+                break
+            self._remove(oldest_key)
+
+    def _load(self, onnx_file, mtime):
+        onnx_model = onnx.load(onnx_file)
+        onnx.checker.check_model(onnx_model)
+
+        #To get the inputs we must ignore the initializers, otherwise it would seem like we have a lot of inputs in some cases
+        input_initializer = set([node.name for node in onnx_model.graph.initializer])
+        net_feed_input = [node.name for node in onnx_model.graph.input
+                          if node.name not in input_initializer]
+        outputs = [output.name for output in onnx_model.graph.output]
+
+        # Check whether the onnx folder contains 'exit_node.df' file
+        exit_node = None
+        exit_node_file = get_exit_node_file(onnx_file)
+        if os.path.exists(exit_node_file):
+            exit_node = get_exit_node(exit_node_file)
+
+        so = ort.SessionOptions()
+
+        # Get available providers
+        available_providers = ort.get_available_providers()
+
+        session = ort.InferenceSession(onnx_file, so, providers=available_providers)
+
+        # Requests can be stacked and the outputs split back only if the true inputs and
+        # the outputs share the same symbolic first dimension (i.e., the batch axis)
+        first_dims = [node.shape[0] if node.shape else None for node in session.get_inputs()
+                      if node.name in net_feed_input]
+        first_dims += [node.shape[0] if node.shape else None for node in session.get_outputs()]
+        dynamic_batch = len(first_dims) > 0 and isinstance(first_dims[0], str) and all(
+            [dim == first_dims[0] for dim in first_dims])
+
+        return ModelEntry(onnx_file=onnx_file, mtime=mtime, size=os.path.getsize(onnx_file),
+                          session=session, net_feed_input=net_feed_input, outputs=outputs,
+                          exit_node=exit_node, dynamic_batch=dynamic_batch)
+
+
+def get_exit_node_file(onnx_file):
+    return os.path.join(os.path.dirname(onnx_file), 'exit_node.df')
+
+def get_exit_node(exit_node_df):
+    exit_node = pd.read_pickle(exit_node_df).iloc[0].exit_node
+    return exit_node
+
+
+_session_pool = None
+_session_pool_lock = threading.Lock()
+
+def get_session_pool():
+    ''' Return the process-wide SessionPool, creating it at the first call.
+    '''
+    global _session_pool
+    if _session_pool is None:
+        with _session_pool_lock:
+            if _session_pool is None:
+                max_sessions = int(os.getenv(
+                    'AISPRINT_SESSION_POOL_MAX_SESSIONS', DEFAULT_MAX_SESSIONS))
+                max_mb = float(os.getenv('AISPRINT_SESSION_POOL_MAX_MB', DEFAULT_MAX_MB))
+                _session_pool = SessionPool(
+                    max_sessions=max_sessions, max_bytes=int(max_mb * 1024 * 1024))
+    return _session_pool
@@ -0,0 +1,284 @@
+import os
+import json
+import mmap
+import zlib
+import pickle
+import struct
+from collections.abc import Mapping
+
+import numpy as np
+
+# Layout of the files exchanged between partition segments:
+#   - MAGIC (8 bytes)
+#   - length of the header (little-endian unsigned 64-bit integer)
+#   - header (JSON, utf-8), describing each entry (kind, dtype, shape, offset, size, compression)
+#   - data region, with each entry starting at an ALIGNMENT-bytes boundary
+# NumPy arrays are stored as raw contiguous buffers, thus uncompressed arrays are
+# memory-mapped without copies. Any other value is pickled.
+# Floating point arrays can be quantized (lossy) and any entry can be compressed (lossless):
+# both are reverted when the entry is loaded.
+MAGIC = b'AISPRTW1'
+ALIGNMENT = 64
+
+COMPRESSIONS = [None, 'zlib', 'zstd', 'lz4']
+QUANTIZATIONS = [None, 'fp16', 'int8']
+
+# Codecs applied to the tensors crossing a partition boundary ('boundary_codec' 
+# argument of the 'partitionable_model' annotation)
+BOUNDARY_CODECS = [None, 'fp16', 'int8', 'zlib', 'zstd', 'lz4']
+
+# Environment variable defining the default compression of 'save_tensors'
+COMPRESSION_ENV = 'AISPRINT_WIRE_COMPRESSION'
+
+
+def _padding(position):
+    return (ALIGNMENT - position % ALIGNMENT) % ALIGNMENT
+
+def _get_codec_module(compression):
+    # zstd and lz4 are optional dependencies, imported only when used
+    try:
+        if compression == 'zstd':
+            import zstandard
+            return zstandard
+        if compression == 'lz4':
+            import lz4.frame
+            return lz4.frame
+    except ImportError as e:
+        package = 'zstandard' if compression == 'zstd' else 'lz4'
+        raise ImportError(
+            "Compression '{}' requires the '{}' package (pip install {}).".format(
+                compression, package, package)) from e
+    return zlib
+
+def _compress(payload, compression, level):
+    module = _get_codec_module(compression)
+    if compression == 'zstd':
+        return module.ZstdCompressor(level=level).compress(payload)
+    if compression == 'lz4':
+        return module.compress(payload, compression_level=level)
+    return module.compress(payload, level)
+
+def _decompress(payload, compression):
+    module = _get_codec_module(compression)
+    if compression == 'zstd':
+        # The content size is written in the frame by 'ZstdCompressor.compress'
+        return module.ZstdDecompressor().decompress(payload)
+    return module.decompress(payload)
+
+def _quantize(array, quantization):
+    # Return (quantized array, quantization parameters), parameters are None if the 
+    # array is not quantized (i.e., not a floating point array)
+    if quantization is None or array.dtype.kind != 'f' or array.size == 0:
+        return array, None
+    if quantization == 'fp16':
+        if array.dtype.itemsize <= 2:
+            return array, None
+        return array.astype(np.float16), {'type': 'fp16'}
+    # int8 affine quantization: x = scale * (q - zero_point), zero is exactly represented
+    if not np.all(np.isfinite(array)):
+        return array, None
+    low = min(float(array.min()), 0.0)
+    high = max(float(array.max()), 0.0)
+    scale = (high - low) / 255.0
+    if scale == 0.0:
+        scale = 1.0
+    zero_point = int(np.clip(np.round(-128 - low / scale), -128, 127))
+    quantized = np.clip(np.round(array / scale) + zero_point, -128, 127).astype(np.int8)
+    return quantized, {'type': 'int8', 'scale': scale, 'zero_point': zero_point}
+
+def _dequantize(array, quantization, dtype):
+    if quantization['type'] == 'int8':
+        array = (array.astype(np.float32) - quantization['zero_point']) * np.float32(quantization['scale'])
+    return array.astype(dtype)
+
+def _encode_entry(value, quantization=None):
+    # Return (header entry, payload)
+    if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+        array = np.ascontiguousarray(value)
+        entry = {'kind': 'ndarray',
+                 'dtype': np.lib.format.dtype_to_descr(array.dtype),
+                 'shape': list(array.shape)}
+        stored, parameters = _quantize(array, quantization)
+        if parameters is not None:
+            entry['quantization'] = parameters
+            entry['stored_dtype'] = np.lib.format.dtype_to_descr(stored.dtype)
+        return entry, memoryview(stored.reshape(-1).view(np.uint8))
+    return {'kind': 'pickle'}, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+def get_codec_options(codec):
+    ''' Get the 'save_tensors' arguments (quantization, compression) of a boundary codec.
+    '''
+    if codec not in BOUNDARY_CODECS:
+        raise ValueError("Unknown boundary codec '{}'. Allowed codecs: {}".format(codec, BOUNDARY_CODECS))
+    if codec in QUANTIZATIONS:
+        return {'quantization': codec, 'compression': None}
+    return {'quantization': None, 'compression': codec}
+
+def save_tensors(path, tensors, compression=None, level=1, quantization=None, codec=None):
+    ''' Save a dictionary of tensors (and any other picklable value) to 'path'.
+
+        Parameters:
+            path (str): destination file.
+            tensors (dict): values to be saved, keyed by name.
+            compression (str): one in COMPRESSIONS. If None, the value of the
+                AISPRINT_WIRE_COMPRESSION environment variable is used (default: no compression).
+                Entries are stored compressed only if this reduces their size.
+                'zstd' and 'lz4' require the 'zstandard' and 'lz4' packages.
+            level (int): compression level.
+            quantization (str): one in QUANTIZATIONS, applied to the floating point arrays.
+                'fp16' casts them to half precision, 'int8' applies an affine quantization 
+                (per tensor). The arrays are loaded with their original dtype.
+            codec (str): one in BOUNDARY_CODECS, shortcut to set either 'quantization' 
+                or 'compression'.
+    '''
+    if codec is not None:
+        options = get_codec_options(codec)
+        quantization = options['quantization'] or quantization
+        compression = options['compression'] or compression
+    if compression is None:
+        compression = os.getenv(COMPRESSION_ENV) or None
+    if compression not in COMPRESSIONS:
+        raise ValueError("Unknown compression '{}'. Allowed compressions: {}".format(compression, COMPRESSIONS))
+    if quantization not in QUANTIZATIONS:
+        raise ValueError("Unknown quantization '{}'. Allowed quantizations: {}".format(quantization, QUANTIZATIONS))
+
+    entries = {}
+    payloads = []
+    offset = 0
+    for name, value in tensors.items():
+        entry, payload = _encode_entry(value, quantization)
+        entry['nbytes'] = payload.nbytes if isinstance(payload, memoryview) else len(payload)
+        entry['compression'] = None
+        if compression is not None and entry['nbytes'] > 0:
+            compressed = _compress(payload, compression, level)
+            if len(compressed) < entry['nbytes']:
+                payload = compressed
+                entry['compression'] = compression
+        entry['stored_nbytes'] = payload.nbytes if isinstance(payload, memoryview) else len(payload)
+        offset += _padding(offset)
+        entry['offset'] = offset
+        offset += entry['stored_nbytes']
+        entries[str(name)] = entry
+        payloads.append(payload)
+
+    header = json.dumps({'entries': entries}).encode('utf-8')
+    data_start = len(MAGIC) + 8 + len(header)
+    data_start += _padding(data_start)
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        f.write(b'\0' * (data_start - f.tell()))
+        for entry, payload in zip(entries.values(), payloads):
+            f.write(b'\0' * (data_start + entry['offset'] - f.tell()))
+            f.write(payload)
+
+
+class TensorFile(Mapping):
+    ''' Mapping over a file written by 'save_tensors'.
+
+        The file is memory-mapped and the entries are decoded lazily, only when they
+        are accessed (and then cached). Uncompressed and not quantized arrays are views on 
+        the mapped file, i.e., they are not copied unless they are modified.
+        The mapping is released by 'close' (or at the end of a 'with' block).
+
+        Parameters:
+            path (str): path of the file.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._buffer = None
+        self._cache = {}
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("'{}' is not a tensors file.".format(path))
+            header_length, = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_length).decode('utf-8'))
+            data_start = len(MAGIC) + 8 + header_length
+            data_start += _padding(data_start)
+            # Copy-on-write mapping: arrays can be modified in place without touching the file
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        self._entries = header['entries']
+        self._data_start = data_start
+
+    def close(self):
+        ''' Release the cached entries and the mapping of the file. Arrays still in use
+            (views on the mapped file) remain valid: the mapping is then released with the last of them.
+        '''
+        self._cache.clear()
+        if self._buffer is not None:
+            buffer, self._buffer = self._buffer, None
+            try:
+                buffer.close()
+            except BufferError:
+                pass
+
+    @property
+    def closed(self):
+        return self._buffer is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def __getitem__(self, name):
+        if name in self._cache:
+            return self._cache[name]
+        if self._buffer is None:
+            raise ValueError("Tensors file '{}' is closed.".format(self.path))
+        entry = self._entries[name]
+        start = self._data_start + entry['offset']
+        if entry['compression'] is not None:
+            payload = bytearray(_decompress(self._buffer[start:start+entry['stored_nbytes']], 
+                                            entry['compression']))
+        elif entry['kind'] == 'ndarray':
+            payload = memoryview(self._buffer)[start:start+entry['nbytes']]
+        else:
+            payload = self._buffer[start:start+entry['nbytes']]
+
+        if entry['kind'] == 'ndarray':
+            dtype = np.lib.format.descr_to_dtype(entry['dtype'])
+            if 'quantization' in entry:
+                stored_dtype = np.lib.format.descr_to_dtype(entry['stored_dtype'])
+                value = np.frombuffer(payload, dtype=stored_dtype).reshape(entry['shape'])
+                value = _dequantize(value, entry['quantization'], dtype)
+            else:
+                value = np.frombuffer(payload, dtype=dtype).reshape(entry['shape'])
+        else:
+            value = pickle.loads(payload)
+        self._cache[name] = value
+        return value
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def nbytes(self, name):
+        ''' Return the (uncompressed, but quantized) size in bytes of the entry 'name'.
+        '''
+        return self._entries[name]['nbytes']
+
+
+def load_tensors(path):
+    ''' Load the values saved by 'save_tensors' as a lazy mapping (TensorFile).
+        Files saved with pickle (by previous versions of the generated code) are also supported.
+        The TensorFile can be used as a context manager, closing the file at the end of the block:
+            with load_tensors(path) as tensors:
+                ...
+    '''
+    with open(path, 'rb') as f:
+        is_tensors_file = f.read(len(MAGIC)) == MAGIC
+    if not is_tensors_file:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    return TensorFile(path)
@@ -0,0 +1,153 @@
+import os
+
+import onnx
+import numpy as np
+
+from aisprint.space4aidpartitioner.graph_index import ONNXGraphIndex
+from aisprint.space4aidpartitioner.cost_model import GraphCostModel, get_resources_profiles
+
+# Objectives of the deployments: 1 if higher is better, -1 if lower is better
+OBJECTIVES = {'metric': 1, 'latency': -1, 'cost': -1}
+
+
+class ComponentProfiles():
+    ''' Estimated execution time (seconds per request) and cost of the components.
+
+        The time is estimated with the static cost model of the ONNX model of the component
+        ('onnx/<component>.onnx' in its folder) on its first candidate resource in
+        candidate_deployments.yaml. An alternative component without a candidate deployment
+        runs on the resources of the original component. The cost is the busy time of the
+        resource times its 'cost' (per hour) in candidate_resources.yaml.
+
+        Parameters:
+            application_model (ApplicationModel): model of the AI-SPRINT application.
+    '''
+
+    def __init__(self, application_model):
+        self.application_model = application_model
+        self._profiles = {}
+        self._resources = None
+
+    def _get_resource(self, component_name, original_component):
+        for name in [component_name, original_component]:
+            candidate = self.application_model.get_candidate_deployment(name)
+            if candidate is None:
+                continue
+            try:
+                return candidate['Containers']['container1']['candidateExecutionResources'][0]
+            except (KeyError, IndexError, TypeError):
+                return None
+        return None
+
+    def _get_flops(self, component_name):
+        component_folder = self.application_model.get_component_folder(component_name)
+        if component_folder is None:
+            return None
+        onnx_file = os.path.join(component_folder, 'onnx', component_name + '.onnx')
+        if not os.path.exists(onnx_file):
+            return None
+        return GraphCostModel(ONNXGraphIndex(onnx.load(onnx_file))).total_flops
+
+    def get(self, component_name, original_component=None):
+        ''' Return the estimated (time, cost) of the component, None if it cannot be estimated
+            (e.g., no ONNX model or candidate resource).
+        '''
+        if component_name in self._profiles:
+            return self._profiles[component_name]
+        if self._resources is None:
+            candidate_resources = self.application_model.candidate_resources
+            self._resources = get_resources_profiles(candidate_resources) if candidate_resources else {}
+
+        profile = None
+        resource_name = self._get_resource(component_name, original_component or component_name)
+        if resource_name in self._resources:
+            flops = self._get_flops(component_name)
+            if flops is not None:
+                device, _ = self._resources[resource_name]
+                time = device.compute_time(flops)
+                resource = self.application_model.get_resource(resource_name) or {}
+                profile = (time, time * float(resource.get('cost', 0)) / 3600)
+        self._profiles[component_name] = profile
+        return profile
+
+
+def get_execution_probabilities(components, dependencies):
+    ''' Probability that each component is executed for a request: 1 for the components without
+        predecessors, the highest over the predecessors of (probability of the predecessor x
+        transition probability) for the other ones.
+    '''
+    predecessors = {c: [] for c in components}
+    for dependency in dependencies:
+        predecessors[dependency[1]].append((dependency[0], dependency[2]))
+
+    probabilities = {}
+
+    def get_probability(component):
+        if component not in probabilities:
+            if not predecessors[component]:
+                probabilities[component] = 1.0
+            else:
+                probabilities[component] = max(
+                    [get_probability(p) * float(transition) for p, transition in predecessors[component]])
+        return probabilities[component]
+
+    for component in components:
+        get_probability(component)
+    return probabilities
+
+
+def estimate_deployment(profiles, components, dependencies, original_components):
+    ''' Expected latency and cost per request of the deployment, weighting the estimates of the
+        components by their execution probability. Components without an estimate are not considered.
+
+        Return: dict with 'latency' and 'cost'.
+    '''
+    probabilities = get_execution_probabilities(components, dependencies)
+    latency, cost = 0.0, 0.0
+    for component, original_component in zip(components, original_components):
+        profile = profiles.get(component, original_component)
+        if profile is not None:
+            latency += probabilities[component] * profile[0]
+            cost += probabilities[component] * profile[1]
+    return {'latency': latency, 'cost': cost}
+
+
+def get_pareto_front(points, keep=()):
+    ''' Find the points that are not dominated, i.e., no other point is at least as good in all the
+        objectives (see OBJECTIVES) and strictly better in one of them.
+
+        Parameters:
+            points (dict): values of the objectives of each point ({name: {objective: value}}).
+            keep (list): names of the points always kept (even if dominated).
+
+        Return: list of the non-dominated points and dict with the dominated points as keys
+            and (dominating point, reasons) as values.
+    '''
+    names = list(points.keys())
+    objectives = list(OBJECTIVES.keys())
+    # Values oriented so that higher is better
+    values = np.array([[OBJECTIVES[o] * points[name][o] for o in objectives] for name in names], dtype=float)
+
+    # Points are visited from the best one (lexicographic order), thus a point can be dominated
+    # only by the points already in the front (dominance is transitive)
+    order = np.lexsort(values.T[::-1])[::-1]
+    front = []
+    dominated = {}
+    for idx in order:
+        if front:
+            front_values = values[front]
+            dominating = np.all(front_values >= values[idx], axis=1) & np.any(front_values > values[idx], axis=1)
+            if np.any(dominating):
+                dominator = front[int(np.argmax(dominating))]
+                reasons = []
+                for o in objectives:
+                    comparison = '>=' if OBJECTIVES[o] > 0 else '<='
+                    reasons.append("{} {:.4g} {} {:.4g}".format(
+                        o, points[names[dominator]][o], comparison, points[names[idx]][o]))
+                dominated[names[idx]] = (names[dominator], reasons)
+                continue
+        front.append(idx)
+
+    for name in keep:
+        dominated.pop(name, None)
+    return [name for name in names if name not in dominated], dominated
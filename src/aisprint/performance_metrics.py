@@ -0,0 +1,329 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Metrics of the 'model_performance' annotation
+METRICS = ['average_accuracy', 'average_f1', 'average_precision', 'average_recall']
+# Metric names accepted for compatibility
+METRIC_ALIASES = {'accuracy': 'average_accuracy',
+                  'f1': 'average_f1', 'precision': 'average_precision', 'recall': 'average_recall'}
+
+
+def get_metric_name(metric):
+    ''' Return the name of the metric in METRICS (resolving the aliases).
+        Raise an Exception if the metric is not supported.
+    '''
+    metric = METRIC_ALIASES.get(metric, metric)
+    if metric not in METRICS:
+        raise Exception("Metric '{}' is not supported. Supported metrics: {}".format(metric, METRICS))
+    return metric
+
+
+def load_class_weights(application_dir):
+    ''' Load the weights of the classes ('src/class_weights.csv', with a column for each class),
+        None if not defined (i.e., metrics are averaged with the same weight).
+    '''
+    weights_file = os.path.join(application_dir, 'src', 'class_weights.csv')
+    if not os.path.exists(weights_file):
+        return None
+    class_weights = pd.read_csv(weights_file)
+    return {str(c): float(class_weights[c].iloc[0]) for c in class_weights.columns}
+
+
+def compose_filter_rates(rates, next_rates):
+    ''' Rates of two binary filters in series (a sample is passed if both filters pass it),
+        assuming that the filters err independently given the class of the sample. The numbers
+        of positive and negative samples are the ones of 'rates'. Arrays are broadcast.
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        TP = rates['TP'] * next_rates['TP'] / (next_rates['TP'] + next_rates['FN'])
+        FP = rates['FP'] * next_rates['FP'] / (next_rates['FP'] + next_rates['TN'])
+    return {'TP': TP, 'FP': FP, 'FN': rates['TP'] + rates['FN'] - TP, 'TN': rates['FP'] + rates['TN'] - FP}
+
+
+class ConfusionMatrices():
+    ''' Cache of the confusion matrices of the components, each one loaded once from
+        'src/<component>/classification_performance' ('confusion_matrix.npy' and
+        'class_names_dictionary.csv').
+
+        Parameters:
+            application_dir (str): path to the AI-SPRINT application.
+    '''
+
+    def __init__(self, application_dir):
+        self.application_dir = application_dir
+        self._matrices = {}
+        self._lock = threading.Lock()
+
+    def get(self, component):
+        ''' Return (class names, confusion matrix) of the component, with the rows and columns
+            of the matrix in the order of the class names (rows: true class, columns: predicted class).
+        '''
+        with self._lock:
+            if component not in self._matrices:
+                performance_dir = os.path.join(
+                    self.application_dir, 'src', component, 'classification_performance')
+                cm = np.load(os.path.join(performance_dir, 'confusion_matrix.npy'))
+                class_names = pd.read_csv(os.path.join(performance_dir, 'class_names_dictionary.csv'))
+                names = [str(c) for c in class_names['class']]
+                indices = np.asarray(class_names['index'], dtype=int)
+                self._matrices[component] = (names, np.asarray(cm, dtype=float)[np.ix_(indices, indices)])
+            return self._matrices[component]
+
+
+class FilterClassifierMetrics():
+    ''' Metrics of the deployments made of a binary filter followed by a classifier, evaluated
+        for all the (filter, classifier) pairs at once as array operations.
+
+        The filter discards the 'filtered_class' (e.g., 'object'), which is added to the classes of
+        the classifier. If the classifier also predicts the filtered class ('classifier_filtered_class'),
+        the samples wrongly passed by the filter can still be classified correctly.
+
+        Parameters:
+            confusion_matrices (ConfusionMatrices): confusion matrices of the components.
+            filtered_class (str): class discarded by the filter.
+            classifier_filtered_class (str): filtered class predicted by the classifier (None if not predicted).
+            class_weights (dict): weight of each class in the averages (None: same weights).
+    '''
+
+    def __init__(self, confusion_matrices, filtered_class, classifier_filtered_class=None, class_weights=None):
+        self.confusion_matrices = confusion_matrices
+        self.filtered_class = filtered_class
+        self.classifier_filtered_class = classifier_filtered_class
+        self.class_weights = class_weights
+        # Confusion matrices of the classifiers, stacked with the classes in the same order
+        self._classifiers_matrices = {}
+
+    def get_filter_rates(self, filters):
+        ''' Return the rates of the filters as a dict of arrays ('TP', 'FP', 'FN', 'TN'), where
+            the positive class is the one passed to the classifier.
+        '''
+        rates = {'TP': [], 'FP': [], 'FN': [], 'TN': []}
+        for filter in filters:
+            names, cm = self.confusion_matrices.get(filter)
+            if self.filtered_class not in names:
+                raise Exception("Class '{}' not found in the classes of the filter '{}'.".format(
+                    self.filtered_class, filter))
+            index = names.index(self.filtered_class)
+            rates['TN'].append(cm[index, index])
+            rates['FN'].append(cm[1-index, index])
+            rates['TP'].append(cm[1-index, 1-index])
+            rates['FP'].append(cm[index, 1-index])
+        return {k: np.asarray(v, dtype=float) for k, v in rates.items()}
+
+    def _get_classifiers_matrices(self, classifiers):
+        # Confusion matrices of the classifiers (n_classifiers, K, K) with the classes in the same order
+        key = tuple(classifiers)
+        if key in self._classifiers_matrices:
+            return self._classifiers_matrices[key]
+        classes, _ = self.confusion_matrices.get(classifiers[0])
+        matrices = []
+        for classifier in classifiers:
+            names, cm = self.confusion_matrices.get(classifier)
+            if set(names) != set(classes):
+                raise Exception("Classifiers '{}' and '{}' do not have the same classes.".format(
+                    classifiers[0], classifier))
+            order = [names.index(c) for c in classes]
+            matrices.append(cm[np.ix_(order, order)])
+        self._classifiers_matrices[key] = (classes, np.stack(matrices))
+        return self._classifiers_matrices[key]
+
+    def evaluate(self, metric, filters, classifiers):
+        ''' Evaluate the metric for all the (filter, classifier) pairs.
+
+            Parameters:
+                metric (str): one of METRICS (or an alias).
+                filters (list): names of the filter components.
+                classifiers (list): names of the classifier components.
+
+            Return: array (n_filters, n_classifiers) with the value of the metric.
+        '''
+        return self.evaluate_rates(metric, self.get_filter_rates(filters), classifiers)
+
+    def evaluate_rates(self, metric, rates, classifiers):
+        ''' Evaluate the metric for the filters with the given rates (e.g., filters in series,
+            see 'compose_filter_rates') followed by each classifier.
+
+            Return: array (n_filters, n_classifiers) with the value of the metric.
+        '''
+        metric = get_metric_name(metric)
+        classes, cms = self._get_classifiers_matrices(classifiers)
+        # Classes of the deployments: the filtered class followed by the classifier classes
+        entries = [self.filtered_class] + classes
+        is_filtered = np.array([c == self.filtered_class for c in entries])
+
+        # Shapes: filters (n_f, 1, 1), classifiers (1, n_c, K)
+        TPf, FPf, FNf, TNf = [np.reshape(rates[k], -1)[:, None, None] for k in ['TP', 'FP', 'FN', 'TN']]
+        TP = np.diagonal(cms, axis1=1, axis2=2)[None]
+        FP = cms.sum(axis=1)[None] - TP
+        FN = cms.sum(axis=2)[None] - TP
+        total_sum = cms.sum(axis=(1, 2))[None, :, None]
+
+        # Per-class values of the classifier classes, then of the entries
+        if metric in ['average_precision', 'average_f1']:
+            precisions = self._get_entries(is_filtered, *self._precision(
+                TPf, FPf, FNf, TNf, TP, FP, total_sum, cms, classes))
+        if metric in ['average_recall', 'average_f1']:
+            recalls = self._get_entries(is_filtered, *self._recall(
+                TPf, FPf, FNf, TNf, TP, FN, total_sum, classes))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if metric == 'average_precision':
+                return self._average(precisions, entries)
+            if metric == 'average_recall':
+                return self._average(recalls, entries)
+            if metric == 'average_accuracy':
+                accuracies = self._get_entries(is_filtered, *self._accuracy(
+                    TPf, FPf, TNf, TP, classes))
+                return self._average(accuracies, entries)
+            # F1 of each class (a class listed twice is considered once)
+            unique = [idx for idx, c in enumerate(entries) if c not in entries[:idx]]
+            f1s = 2 * precisions[..., unique] * recalls[..., unique] / (
+                precisions[..., unique] + recalls[..., unique])
+            return self._average(f1s, [entries[idx] for idx in unique])
+
+    def _filtered_index(self, classes):
+        # Index of the filtered class among the classes of the classifier
+        if self.filtered_class not in classes:
+            raise Exception("Class '{}' not found in the classes of the classifiers.".format(self.filtered_class))
+        return classes.index(self.filtered_class)
+
+    def _precision(self, TPf, FPf, FNf, TNf, TP, FP, total_sum, cms, classes):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if self.classifier_filtered_class is None:
+                # The classifier does not predict the filtered-out class
+                filtered = TNf / (TNf + FNf)
+                values = (TPf * TP) / ((TPf * TP) + (TPf * FP) + (FPf * (TP + FP) / total_sum))
+                return filtered, values
+            # The classifier predicts the filtered-out class (the same of the filter)
+            idx = self._filtered_index(classes)
+            filtered = (TNf + FPf * TP[..., idx:idx+1]) / (
+                TNf + (FPf * TP[..., idx:idx+1]) + FNf + (TPf * FP[..., idx:idx+1]))
+            # FP due to the filtered class, and without its contribution
+            FPfclass = cms[:, classes.index(self.classifier_filtered_class), :][None]
+            FPnof = FP - FPfclass
+            values = (TPf * TP) / ((TPf * TP) + (TPf * FPnof) + (FPf * FPfclass))
+            return filtered, values
+
+    def _recall(self, TPf, FPf, FNf, TNf, TP, FN, total_sum, classes):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = (TPf * TP) / ((TPf * TP) + (TPf * FN) + (FNf * (TP + FN) / total_sum))
+            if self.classifier_filtered_class is None:
+                # The classifier does not predict the filtered-out class
+                return TNf / (TNf + FPf), values
+            idx = self._filtered_index(classes)
+            filtered = (TNf + FPf * TP[..., idx:idx+1]) / (
+                TNf + (FPf * TP[..., idx:idx+1]) + (FPf * FN[..., idx:idx+1]))
+            return filtered, values
+
+    def _accuracy(self, TPf, FPf, TNf, TP, classes):
+        values = TPf * TP
+        if self.classifier_filtered_class is None:
+            return TNf, values
+        idx = self._filtered_index(classes)
+        return TNf + (FPf * TP[..., idx:idx+1]), values
+
+    def _get_entries(self, is_filtered, filtered, values):
+        # Values of the entries (n_f, n_c, len(entries)): the filtered class (wherever it is listed)
+        # takes the filtered value, the other classes the classifier values
+        shape = np.broadcast_shapes(filtered.shape[:2], values.shape[:2])
+        filtered = np.broadcast_to(filtered, shape + (1,))
+        values = np.broadcast_to(values, shape + (values.shape[-1],))
+        values = np.concatenate([filtered, values], axis=-1)
+        return np.where(is_filtered, filtered, values)
+
+    def _average(self, values, entries):
+        if self.class_weights is None:
+            return (values / len(entries)).sum(axis=-1)
+        weights = np.array([self.class_weights[c] for c in entries])
+        return (values * weights).sum(axis=-1)
+
+
+class PipelineSearch():
+    ''' Branch-and-bound search of the deployments of a pipeline made of a chain of binary filters
+        followed by a classifier, where each component has alternative implementations.
+
+        The filters in series are equivalent to a single filter (see 'compose_filter_rates'), thus
+        a deployment is evaluated as (composed filter, classifier). The metrics do not decrease if
+        a filter passes more positive or fewer negative samples, therefore the metric of a partial
+        deployment (the first filters chosen) completed with ideal filters, passing the highest
+        rate of positives and the lowest rate of negatives among the alternatives of the remaining
+        filters, bounds the metric of all its completions. Partial deployments (and classifiers)
+        whose bound is below the threshold are pruned without enumerating their deployments.
+
+        NOTE: as the metrics, the bound assumes confusion matrices normalized by the number of samples.
+
+        Parameters:
+            metrics (FilterClassifierMetrics): metrics of the (filter, classifier) pairs.
+            stages (list): alternatives of each filter of the chain, the original filter first.
+            classifiers (list): alternatives of the classifier, the original classifier first.
+    '''
+
+    def __init__(self, metrics, stages, classifiers):
+        self.metrics = metrics
+        self.stages = [list(alternatives) for alternatives in stages]
+        self.classifiers = list(classifiers)
+        self.stages_rates = [metrics.get_filter_rates(alternatives) for alternatives in self.stages]
+        # Ideal filter equivalent to the filters from each stage to the last one
+        self.ideal_rates = [None] * (len(self.stages) + 1)
+        self.ideal_rates[-1] = {'TP': 1.0, 'FN': 0.0, 'FP': 1.0, 'TN': 0.0}
+        for idx in reversed(range(len(self.stages))):
+            rates = self.stages_rates[idx]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                positive = np.max(rates['TP'] / (rates['TP'] + rates['FN']))
+                negative = np.min(rates['FP'] / (rates['FP'] + rates['TN']))
+            self.ideal_rates[idx] = compose_filter_rates(
+                {'TP': positive, 'FN': 1 - positive, 'FP': negative, 'TN': 1 - negative}, self.ideal_rates[idx+1])
+        # Number of deployments pruned by the last search
+        self.pruned = 0
+
+    def search(self, metric, metric_thr=None):
+        ''' Find the deployments with metric not lower than 'metric_thr' (all if None). The original
+            deployment (original filters and classifier) is always returned.
+
+            Return: list of (filters, classifier, metric value, transition probabilities), where the
+                transition probability of a filter is the fraction of the samples reaching the filter
+                that it passes.
+        '''
+        self.pruned = 0
+        deployments = []
+        self._search(metric, metric_thr, 0, None, [], [], list(range(len(self.classifiers))), True, deployments)
+        return deployments
+
+    def _num_completions(self, stage):
+        # Number of choices of the filters from 'stage' to the last one
+        return int(np.prod([len(alternatives) for alternatives in self.stages[stage:]]))
+
+    def _search(self, metric, metric_thr, stage, rates, filters, probabilities, candidates, original, deployments):
+        last = stage == len(self.stages) - 1
+        if rates is None:
+            composed = self.stages_rates[stage]
+            # Transition probability of the first filter, as in the DAG
+            stage_probabilities = composed['TP'] + composed['FP']
+        else:
+            composed = compose_filter_rates(rates, self.stages_rates[stage])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                stage_probabilities = (composed['TP'] + composed['FP']) / (rates['TP'] + rates['FP'])
+
+        # Metric (last filter) or bound (ideal remaining filters) for the candidate classifiers
+        bound_rates = composed if last else compose_filter_rates(composed, self.ideal_rates[stage+1])
+        values = self.metrics.evaluate_rates(metric, bound_rates, [self.classifiers[c] for c in candidates])
+
+        for idx, filter in enumerate(self.stages[stage]):
+            is_original = original and idx == 0
+            # The original classifier is always kept with the original filters
+            selected = [j for j, c in enumerate(candidates) if metric_thr is None or 
+                        values[idx, j] >= metric_thr or (is_original and c == 0)]
+            self.pruned += (len(candidates) - len(selected)) * self._num_completions(stage + 1)
+            if not selected:
+                continue
+            if last:
+                for j in selected:
+                    deployments.append((filters + [filter], self.classifiers[candidates[j]], values[idx, j].item(), 
+                                        probabilities + [stage_probabilities[idx].item()]))
+            else:
+                self._search(metric, metric_thr, stage + 1, {k: v[idx] for k, v in composed.items()}, 
+                             filters + [filter], probabilities + [stage_probabilities[idx].item()], 
+                             [candidates[j] for j in selected], is_original, deployments)
@@ -1,4 +1,5 @@
 from .space4aidpartitioner import SPACE4AIDPartitioner
 from .ee_space4aidpartitioner import EESPACE4AIDPartitioner
 from .code_partitioner import CodePartitioner
-from .ee_code_partitioner import EECodePartitioner
\ No newline at end of file
+from .ee_code_partitioner import EECodePartitioner
+from .graph_index import ONNXGraphIndex
\ No newline at end of file
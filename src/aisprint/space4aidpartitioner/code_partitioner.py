@@ -1,13 +1,15 @@
 import os
-import yaml
 import shutil
 
 from multiprocessing import Process
-
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 import re
 
+from .main_script import MainScript
+from aisprint.design_store import get_design_store
+from aisprint.application_model import get_application_model
+
 
 class CodePartitioner():
     ''' Temporary partitioner that, given a partitionable model:
@@ -16,238 +18,221 @@ class CodePartitioner():
         - Generate the Python code to execute the partitions
     '''
 
-    def __init__(self, application_dir):
+    def __init__(self, application_dir, application_model=None):
 
         self.application_dir = application_dir
         self.designs_dir = os.path.join(
             self.application_dir, 'aisprint', 'designs')
+        self.design_store = get_design_store(self.application_dir)
+        # Parsed annotations, indexed by component
+        if application_model is None:
+            application_model = get_application_model(self.application_dir)
+        self.application_model = application_model
         self.partitionable_components = self.get_partitionable_components()
     
     def get_partitionable_components(self):
-        components = []
-        with open(os.path.join(self.application_dir, 'common_config', 'annotations.yaml'), 'r') as f:
-            annotations = yaml.load(f, yaml.FullLoader)    
-        for _, item in annotations.items():
-            if 'partitionable_model' in item:
-                components.append(item['component_name']['name'])
-        return components
+        return self.application_model.get_annotated_components('partitionable_model')
     
-    def generate_code_partitions(self):
+    def generate_code_partitions(self, num_workers=None, components=None):
+        ''' Generate the code of the segments of all the partitionable components.
+            The 'main.py' script of each component is parsed once, then the segments are
+            written (together with the other files of the base design) by a pool of 
+            'num_workers' threads (default: ThreadPoolExecutor default).
+            If 'components' is provided, only the code of those components is generated.
+        '''
         
         # Get list of partitions
         component_dirs = next(os.walk(self.designs_dir))[1]
 
-        for component_dir in component_dirs:
-            component_name = os.path.normpath(component_dir)
-
-            if component_name not in self.partitionable_components:
-                continue
-            
-            # Get list of partitions
-            partition_dirs = next(os.walk(
-                os.path.join(self.designs_dir, component_dir)))[1]
-            
-            partition_dirs = [p for p in partition_dirs if 'partition' in p]
-
-            if partition_dirs == []:
-                continue
-            
-            print("\n")
-            print("             " + "- Generating code for the component: {}".format(component_name))
+        generated = []
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            for component_dir in component_dirs:
+                component_name = os.path.normpath(component_dir)
+
+                if component_name not in self.partitionable_components:
+                    continue
+                if components is not None and component_name not in components:
+                    continue
+                
+                # Get list of partitions
+                partition_dirs = next(os.walk(
+                    os.path.join(self.designs_dir, component_dir)))[1]
+                
+                partition_dirs = [p for p in partition_dirs if 'partition' in p]
+
+                if partition_dirs == []:
+                    continue
+                
+                print("\n")
+                print("             " + "- Generating code for the component: {}".format(component_name))
+                
+                codes = self._generate_component_code(component_name, partition_dirs)
+                futures = [executor.submit(self._write_segment, component_name, segment, code) 
+                           for segment, code in codes.items()]
+                generated.append((component_name, list(codes), futures))
+
+            for component_name, segments, futures in generated:
+                for future in futures:
+                    future.result()
+                print("             " + "  Done! Code generated for segments of {}:".format(component_name), segments)
+
+    def _generate_component_code(self, component_name, partition_dirs):
+        ''' Generate the code of the segments in 'partition_dirs'.
+
+            Return: dict with the segments as keys and their code as values.
+        '''
+        item = self.application_model.get_component_annotations(component_name)
+        has_exec_time = 'exec_time' in item
+        orig_onnx_file = item['partitionable_model']['onnx_file']
+        boundary_codec = item['partitionable_model'].get('boundary_codec', None)
+
+        main_script = MainScript(os.path.join(self.designs_dir, component_name, 'base', 'main.py'))
         
-            # Check component has exec_time
-            with open(os.path.join(self.application_dir, 'common_config', 'annotations.yaml'), 'r') as f:
-                annotations = yaml.load(f, yaml.FullLoader)
-
-            has_exec_time = False
-            for _, item in annotations.items():
-                if item['component_name']['name'] == component_name:
-                    if 'exec_time' in item:
-                        has_exec_time = True
-                    orig_onnx_file = item['partitionable_model']['onnx_file']
-            
-            # 1st half
-            first_half = [p for p in partition_dirs if re.search("^partition[1-9]+_1", p)]
-            self._generate_first_half_code(
-                component_name=component_name, first_half=first_half, 
-                has_exec_time=has_exec_time, orig_onnx_file=orig_onnx_file)
-            
-            # 2nd half
-            second_half = [p for p in partition_dirs if re.search("^partition[1-9]+_2", p)]
-            self._generate_second_half_code(
-                component_name=component_name, second_half=second_half, has_exec_time=has_exec_time)
-
-            # Copy all the other files, except onnx nad main.py 
-            for h in first_half+second_half:
-                base_dir = os.path.join(self.designs_dir, component_name, 'base')
-                # Copy dirs
-                for dir in next(os.walk(base_dir))[1]:
-                    if dir != 'onnx':
-                        shutil.copytree(
-                            os.path.join(base_dir, dir), 
-                            os.path.join(self.designs_dir, component_name, h, dir))
-                # Copy files
-                for file in next(os.walk(base_dir))[2]:
-                    if file != 'main.py':
-                        shutil.copyfile(
-                            os.path.join(base_dir, file), 
-                            os.path.join(self.designs_dir, component_name, h, file))
-            print("             " + "  Done! Code generated for segments:", first_half + second_half)
-        
-    def _generate_first_half_code(self, component_name, first_half, 
-                                  has_exec_time, orig_onnx_file):
-
-        base_design = os.path.join(self.designs_dir, component_name, 'base')
-        # Get main script
-        with open(os.path.join(base_design, 'main.py'), 'r') as f:
-            main_code = f.readlines()
+        # Number of segments of each partition ('partitionN_1', ..., 'partitionN_K')
+        num_segments = {}
+        for p in partition_dirs:
+            partition, segment = p.rsplit('_', 1)
+            num_segments[partition] = max(num_segments.get(partition, 0), int(segment))
+
+        def segment_position(p):
+            partition, segment = p.rsplit('_', 1)
+            if int(segment) == 1:
+                return 'first'
+            elif int(segment) == num_segments[partition]:
+                return 'last'
+            return 'middle'
+
+        codes = {}
+
+        # 1st half
+        first_half = [p for p in partition_dirs if re.search("^partition[0-9]+_1$", p)]
+        codes.update(self._generate_first_half_code(
+            main_script=main_script, first_half=first_half, 
+            has_exec_time=has_exec_time, orig_onnx_file=orig_onnx_file, 
+            boundary_codec=boundary_codec))
         
-        inference_row = [l for l in main_code if ('load_and_inference' in l and 'import' not in l)]
-        if len(inference_row) > 1:
-            raise Exception(
-                "Multiple ONNX load_and_inference calls found in {} script. Only one is allowed.".format(
-                    os.path.join(base_design, 'main.py')))
-        elif len(inference_row) == 0:
-            raise Exception(
-                "ONNX load_and_inference call required in {} script.".format(
-                    os.path.join(base_design, 'main.py')))
+        # Middle segments (partitions with more than 2 segments)
+        middle_segments = [p for p in partition_dirs if segment_position(p) == 'middle']
+        if middle_segments:
+            codes.update(self._generate_middle_segments_code(
+                main_script=main_script, middle_segments=middle_segments, 
+                boundary_codec=boundary_codec))
+
+        # 2nd half (last segment)
+        second_half = [p for p in partition_dirs if re.search("^partition[0-9]+_[0-9]+$", p) 
+                       and segment_position(p) == 'last']
+        codes.update(self._generate_second_half_code(
+            main_script=main_script, second_half=second_half, has_exec_time=has_exec_time))
+        return codes
+
+    def _write_segment(self, component_name, segment, code):
+        partition_dir = os.path.join(self.designs_dir, component_name, segment)
+        with open(os.path.join(partition_dir, 'main.py'), 'w') as f:
+            f.write(code)
+
+        # Link all the other files, except onnx nad main.py, from the design store
+        base_dir = os.path.join(self.designs_dir, component_name, 'base')
+        self.design_store.materialize_tree(base_dir, partition_dir, exclude=['onnx', 'main.py'])
         
-        inference_line = np.where(np.array(main_code) == inference_row[0])[0][0]
-
-        inference_str = main_code[inference_line]
-        inference_str_res, inference_cmd = inference_str.split("=")
-
-        # Compute number of spaces at the beginning
-        spaces_str = ""
-        for i in range(len(inference_str_res)):
-            if inference_str_res[i] not in [" ", "\t"]:
-                break
-            if inference_str_res[i]  == " ":
-                spaces_str += " "
-            elif inference_str_res[i] == "\t":
-                spaces_str += "\t"
-        dict_res, out_res = inference_str_res.replace(" ", "").replace("\t", "").split(',')
-        new_inference_str = inference_str 
-        
-        # Get __name__ line
-        name_row = [l for l in main_code if ("__name__=='__main__'" in l.replace(" ", "") and 'import' not in l)]
-        name_line = np.where(np.array(main_code) == name_row[0])[0][0]
+    def _get_save_str(self, spaces_str, dict_res, boundary_codec):
+        # The codec is recorded in the saved file, thus loading does not depend on it
+        codec_str = ""
+        if boundary_codec is not None:
+            codec_str = ", codec='{}'".format(boundary_codec)
+        return spaces_str + "save_tensors(args['output'], " + dict_res + codec_str + ")\n\n"
+
+    def _get_load_and_inference_strs(self, main_script):
+        # Generate tensors load str (the file is memory-mapped and decoded lazily)
+        load_str = main_script.indent + "input_dict = load_tensors(args['input'])\n"
+        new_inference_str = (main_script.indent + main_script.dict_res + ", " + main_script.out_res + " =" + 
+                             " load_and_inference(args['onnx_file'], input_dict)\n")
+        return load_str, new_inference_str
+
+    def _get_name_main_code(self, pad_str, segment):
+        # New if __name__ == '__main__' of the segments reading the output of the previous one
+        gen_script = ["\n"]
+        gen_script += ["if __name__ == '__main__':\n"]
+        gen_script += [pad_str + "parser = argparse.ArgumentParser()\n"]
+        gen_script += [pad_str + "parser.add_argument('-i', '--input', required=True, help='path to input file')\n"]
+        gen_script += [pad_str + "parser.add_argument('-o', '--output', help='path to output directory')\n"]
+        gen_script += [pad_str + "parser.add_argument('-y', '--onnx_file', default='onnx/{}.onnx', help='complete path to tge ONNX model')\n".format(segment)]
+        gen_script += [pad_str + "args = vars(parser.parse_args())\n"]
+        gen_script += [pad_str + "input_filename = args['input'].split('/')[-1]\n"]
+        gen_script += [pad_str + "args['output'] = os.path.join(os.path.dirname(args['output']), input_filename)\n"]
+        gen_script += [pad_str + "main(args)"]
+        return gen_script
+
+    def _generate_first_half_code(self, main_script, first_half, 
+                                  has_exec_time, orig_onnx_file, boundary_codec=None):
 
         # Generate save string
-        save_str = ""
-        save_str += spaces_str
-        save_str += "with open(args['output'], 'wb') as f:\n"
-        save_str += spaces_str
-        if "\t" in spaces_str:
-            save_str += "\t"
-        else:
-            save_str += "    "
-        save_str += "pickle.dump(" + dict_res + ", f)\n\n"
+        save_str = self._get_save_str(main_script.indent, main_script.dict_res, boundary_codec)
 
         # Start generating new script
         
-        # Add new import for pickle
-        gen_script = ["import pickle\n\n"]
+        # Add new import for the tensors hand-off between segments
+        gen_script = ["from aisprint.onnx_inference import save_tensors, load_tensors\n\n"]
 
         # Add pre-processing + inference + save
-        gen_script += main_code[0:inference_line]
-        gen_script += [new_inference_str]
+        gen_script += main_script.preprocessing()
+        gen_script += main_script.inference()
         gen_script += [save_str]
-        gen_script += main_code[name_line:]
-
+        gen_script += main_script.after_main()
 
+        codes = {}
         for fh in first_half:
-            partition_dir = os.path.join(self.designs_dir, component_name, fh)
-            idx_onnx_line = 0
-            for idx, line in enumerate(gen_script):
-                if '--onnx_file' in line:
-                    new_onnx_file_line = line.replace(
-                        '{}'.format(orig_onnx_file), '{}.onnx'.format(fh))
-                    idx_onnx_line = idx
-            new_gen_script = gen_script[:idx_onnx_line] + [new_onnx_file_line] + gen_script[idx_onnx_line+1:]
-            with open(os.path.join(partition_dir, 'main.py'), 'w') as f:
-                f.writelines(new_gen_script)
-
-    def _generate_second_half_code(self, component_name, second_half, has_exec_time):
-
-        base_design = os.path.join(self.designs_dir, component_name, 'base')
-        # Get main script
-        with open(os.path.join(base_design, 'main.py'), 'r') as f:
-            main_code = f.readlines()
-        
-        # Get load_and_inference line
-        inference_row = [l for l in main_code if ('load_and_inference' in l and 'import' not in l)]
-        if len(inference_row) > 1:
-            raise Exception(
-                "Multiple ONNX load_and_inference calls found in {} script. Only one is allowed.".format(
-                    os.path.join(base_design, 'main.py')))
-        elif len(inference_row) == 0:
-            raise Exception(
-                "ONNX load_and_inference call required in {} script.".format(
-                    os.path.join(base_design, 'main.py')))
-        
-        inference_line = np.where(np.array(main_code) == inference_row[0])[0][0]
+            new_gen_script = gen_script + main_script.name_main(
+                onnx_file='{}.onnx'.format(fh), orig_onnx_file=orig_onnx_file)
+            codes[fh] = "".join(new_gen_script)
+        return codes
 
-        inference_str = main_code[inference_line]
-        inference_str_res, inference_cmd = inference_str.split("=")
-        
-        # Compute number of spaces at the beginning
-        spaces_str = ""
-        for i in range(len(inference_str_res)):
-            if inference_str_res[i] not in [" ", "\t"]:
-                break
-            if inference_str_res[i]  == " ":
-                spaces_str += " "
-            elif inference_str_res[i] == "\t":
-                spaces_str += "\t"
-        dict_res, out_res = inference_str_res.replace(" ", "").replace("\t", "").split(',')
-        new_inference_str = spaces_str + dict_res + ", " + out_res + " =" + " load_and_inference(args['onnx_file'], input_dict)\n"
-
-        # Get main script line
-        main_row = [l for l in main_code if ('def main(' in l and 'import' not in l)]
-        main_line = np.where(np.array(main_code) == main_row[0])[0][0]
-        
-        # Get __name__ line
-        name_row = [l for l in main_code if ("__name__=='__main__'" in l.replace(" ", "") and 'import' not in l)]
-        name_line = np.where(np.array(main_code) == name_row[0])[0][0]
-
-        # Generate pickle load str
-        load_str = ""
-        load_str += spaces_str
-        load_str += "with open(args['input'], 'rb') as f:\n"
-        load_str += spaces_str
-        if "\t" in spaces_str:
-            load_str += "\t"
-        else:
-            load_str += "    "
-        load_str += "input_dict = pickle.load(f)\n"
+    def _generate_second_half_code(self, main_script, second_half, has_exec_time):
+
+        load_str, new_inference_str = self._get_load_and_inference_strs(main_script)
 
         # Start generating new script
         
-        # Add new import for pickle
-        gen_script = ["import pickle\n\n"]
+        # Add new import for the tensors hand-off between segments
+        gen_script = ["from aisprint.onnx_inference import save_tensors, load_tensors\n\n"]
         gen_script += ["import os\n\n"]
         
         # Add load + inference + post-processing
-        gen_script += main_code[0:main_line+1]
+        gen_script += main_script.main_header()
         gen_script += [load_str]
         gen_script += [new_inference_str]
-        gen_script += main_code[inference_line+1:name_line] 
+        gen_script += main_script.postprocessing()
+        gen_script += main_script.after_main()
 
-        # Add new if __name__ == '__main__'
-        gen_script += ["\n"]
-        gen_script += ["if __name__ == '__main__':\n"]
-        gen_script += [spaces_str + "parser = argparse.ArgumentParser()\n"]
-        gen_script += [spaces_str + "parser.add_argument('-i', '--input', required=True, help='path to input file')\n"]
-        gen_script += [spaces_str + "parser.add_argument('-o', '--output', help='path to output directory')\n"]
-        gen_script += [spaces_str + "args = vars(parser.parse_args())\n"]
-        gen_script += [spaces_str + "input_filename = args['input'].split('/')[-1]\n"]
-        gen_script += [spaces_str + "args['output'] = os.path.join(os.path.dirname(args['output']), input_filename)\n"]
-        gen_script += [spaces_str + "main(args)"]
-        
+        codes = {}
         for sh in second_half:
-            partition_dir = os.path.join(self.designs_dir, component_name, sh)
-            new_onnx_line = [spaces_str + "parser.add_argument('-y', '--onnx_file', default='onnx/{}.onnx', help='complete path to tge ONNX model')\n".format(sh)]
-            new_gen_script = gen_script[:-4] + new_onnx_line + gen_script[-4:]
-            with open(os.path.join(partition_dir, 'main.py'), 'w') as f:
-                f.writelines(new_gen_script)
\ No newline at end of file
+            codes[sh] = "".join(gen_script + self._get_name_main_code(main_script.pad, sh))
+        return codes
+
+    def _generate_middle_segments_code(self, main_script, middle_segments, boundary_codec=None):
+        ''' Generate the code of the intermediate segments of the partitions with more than
+            2 segments: the output of the previous segment is loaded, the inference is run and
+            the result is saved for the next segment.
+        '''
+
+        load_str, new_inference_str = self._get_load_and_inference_strs(main_script)
+
+        # Generate save string
+        save_str = self._get_save_str(main_script.indent, main_script.dict_res, boundary_codec)
+
+        # Start generating new script
+        
+        # Add new import for the tensors hand-off between segments
+        gen_script = ["from aisprint.onnx_inference import save_tensors, load_tensors\n\n"]
+        gen_script += ["import os\n\n"]
+        
+        # Add load + inference + save
+        gen_script += main_script.main_header()
+        gen_script += [load_str]
+        gen_script += [new_inference_str]
+        gen_script += [save_str]
+        gen_script += main_script.after_main()
+
+        codes = {}
+        for segment in middle_segments:
+            codes[segment] = "".join(gen_script + self._get_name_main_code(main_script.pad, segment))
+        return codes
@@ -0,0 +1,363 @@
+import numpy as np
+
+from onnx import TensorProto
+
+from aisprint.application_model import get_application_model
+
+from .dominators import get_valid_cuts
+
+# Size (in bytes) of the ONNX tensor element types
+DTYPE_SIZES = {
+    TensorProto.FLOAT: 4, TensorProto.UINT8: 1, TensorProto.INT8: 1,
+    TensorProto.UINT16: 2, TensorProto.INT16: 2, TensorProto.INT32: 4,
+    TensorProto.INT64: 8, TensorProto.BOOL: 1, TensorProto.FLOAT16: 2,
+    TensorProto.DOUBLE: 8, TensorProto.UINT32: 4, TensorProto.UINT64: 8,
+    TensorProto.COMPLEX64: 8, TensorProto.COMPLEX128: 16, TensorProto.BFLOAT16: 2}
+
+# Size (in bytes) of the floating point elements of the boundary tensors encoded by the
+# quantization codecs ('boundary_codec' of the 'partitionable_model' annotation). 
+# Lossless codecs depend on the data, their size is bounded by the raw size.
+BOUNDARY_CODEC_SIZES = {'fp16': 2, 'int8': 1}
+FLOAT_TYPES = [TensorProto.FLOAT, TensorProto.DOUBLE, TensorProto.FLOAT16, TensorProto.BFLOAT16]
+
+# Throughput (FLOP/s) assumed for each computing unit (core) of a resource
+DEFAULT_FLOPS_PER_UNIT = 10e9
+# Memory (MB) corresponding to one vCPU in FaaS resources (AWS Lambda allocation)
+FAAS_MB_PER_UNIT = 1769
+
+
+class DeviceProfile():
+    ''' Computing capacity of a resource.
+
+        Parameters:
+            name (str): name of the resource.
+            computing_units (float): number of computing units (cores).
+            flops_per_unit (float): throughput (FLOP/s) of each computing unit.
+    '''
+
+    def __init__(self, name, computing_units=1, flops_per_unit=DEFAULT_FLOPS_PER_UNIT):
+        self.name = name
+        self.computing_units = computing_units
+        self.flops_per_unit = flops_per_unit
+
+    @property
+    def flops(self):
+        return self.computing_units * self.flops_per_unit
+
+    def compute_time(self, flops):
+        return flops / self.flops
+
+
+class NetworkProfile():
+    ''' Network connecting two resources.
+
+        Parameters:
+            bandwidth (float): bandwidth of the network domain in Mb/s
+                ('Bandwidth' in candidate_resources.yaml).
+            access_delay (float): access delay in seconds ('AccessDelay' in candidate_resources.yaml).
+    '''
+
+    def __init__(self, bandwidth, access_delay=0.0):
+        self.bandwidth = bandwidth
+        self.access_delay = access_delay
+
+    def transfer_time(self, num_bytes):
+        return self.access_delay + num_bytes * 8 / (self.bandwidth * 1e6)
+
+
+class PartitionProfile():
+    ''' Resources running the two halves of a partitioned model.
+
+        Parameters:
+            first_device (DeviceProfile): resource of the first half ('partitionX_1').
+            second_device (DeviceProfile): resource of the second half ('partitionX_2').
+            network (NetworkProfile): network between the two resources,
+                None if they are the same resource.
+    '''
+
+    def __init__(self, first_device, second_device, network=None):
+        self.first_device = first_device
+        self.second_device = second_device
+        self.network = network
+
+    def transfer_time(self, num_bytes):
+        if self.network is None:
+            return 0.0
+        return self.network.transfer_time(num_bytes)
+
+
+class Cut():
+    ''' Single-tensor cut of the graph.
+
+        Parameters:
+            tensor (str): name of the tensor crossing the cut.
+            flops_before (float): FLOPs of the first half.
+            flops_after (float): FLOPs of the second half.
+            params_before (int): parameter bytes of the first half.
+            params_after (int): parameter bytes of the second half.
+            transfer_bytes (int): bytes of the tensor sent from the first to the second half.
+            encoded_bytes (int): bytes of the tensor after the boundary codec 
+                (default: 'transfer_bytes').
+    '''
+
+    def __init__(self, tensor, flops_before, flops_after, params_before, params_after, transfer_bytes,
+                 encoded_bytes=None):
+        self.tensor = tensor
+        self.flops_before = flops_before
+        self.flops_after = flops_after
+        self.params_before = params_before
+        self.params_after = params_after
+        self.transfer_bytes = transfer_bytes
+        self.encoded_bytes = transfer_bytes if encoded_bytes is None else encoded_bytes
+
+    def estimate_latency(self, profile):
+        ''' End-to-end latency (in seconds) of the partitioned model on 'profile'.
+        '''
+        return (profile.first_device.compute_time(self.flops_before)
+                + profile.transfer_time(self.encoded_bytes)
+                + profile.second_device.compute_time(self.flops_after))
+
+
+class GraphCostModel():
+    ''' Static cost model of an ONNX graph: FLOPs and parameter bytes of each node
+        and transfer bytes of each valid single-tensor cut.
+
+        Parameters:
+            graph_index (ONNXGraphIndex): index of the graph (with inferred shapes).
+            boundary_codec (str): codec applied to the tensors crossing the cuts.
+            valid_cuts (list): valid single-tensor cuts of the graph, if already computed
+                (see 'get_valid_cuts').
+    '''
+
+    def __init__(self, graph_index, boundary_codec=None, valid_cuts=None):
+        self.graph_index = graph_index
+        self.boundary_codec = boundary_codec
+        self.valid_cuts = valid_cuts
+        self._cuts = None
+        graph = graph_index.onnx_model.graph
+
+        self.initializers = {initializer.name: initializer for initializer in graph.initializer}
+        self.nodes = list(graph.node)
+
+        self.node_flops = []
+        self.node_param_bytes = []
+        counted_initializers = set()
+        for node in self.nodes:
+            self.node_flops.append(self._get_node_flops(node))
+            param_bytes = 0
+            # Shared initializers are counted once (by the first consumer)
+            for input_name in node.input:
+                if input_name in self.initializers and input_name not in counted_initializers:
+                    counted_initializers.add(input_name)
+                    param_bytes += self._initializer_bytes(self.initializers[input_name])
+            self.node_param_bytes.append(param_bytes)
+
+        self.total_flops = sum(self.node_flops)
+        self.total_param_bytes = sum(self.node_param_bytes)
+
+    def _initializer_bytes(self, initializer):
+        return int(np.prod(list(initializer.dims))) * DTYPE_SIZES.get(initializer.data_type, 4)
+
+    def _dims(self, tensor_name):
+        if tensor_name in self.initializers:
+            return list(self.initializers[tensor_name].dims)
+        return self.graph_index.known_dims(tensor_name)
+
+    def _get_node_flops(self, node):
+        # Multiply-accumulate operations count as 2 FLOPs
+        output_dims = self._dims(node.output[0]) if node.output else None
+        if not output_dims:
+            return 0
+        output_size = int(np.prod(output_dims))
+
+        if node.op_type in ['Conv', 'ConvTranspose'] and len(node.input) > 1:
+            weight_dims = self._dims(node.input[1])
+            if not weight_dims:
+                return output_size
+            if node.op_type == 'Conv':
+                # Weights: [M, C/group, kH, kW]
+                return 2 * output_size * int(np.prod(weight_dims[1:]))
+            # Weights: [C, M/group, kH, kW], each input element is scattered on the kernel
+            input_dims = self._dims(node.input[0])
+            if not input_dims:
+                return output_size
+            return 2 * int(np.prod(input_dims)) * int(np.prod(weight_dims[1:]))
+        if node.op_type in ['MatMul', 'Gemm'] and len(node.input) > 1:
+            input_dims = self._dims(node.input[0])
+            if not input_dims:
+                return output_size
+            reduced_dim = input_dims[-1]
+            if node.op_type == 'Gemm':
+                for attribute in node.attribute:
+                    if attribute.name == 'transA' and attribute.i:
+                        reduced_dim = input_dims[0]
+            return 2 * output_size * reduced_dim
+        if node.op_type in ['MaxPool', 'AveragePool', 'LpPool']:
+            for attribute in node.attribute:
+                if attribute.name == 'kernel_shape':
+                    return output_size * int(np.prod(list(attribute.ints)))
+        # Element-wise approximation
+        return output_size
+
+    def tensor_bytes(self, tensor_name, boundary_codec=None):
+        ''' Size in bytes of 'tensor_name' (symbolic dimensions are considered equal to 1),
+            encoded with 'boundary_codec' if provided. Return None if the shape is not available.
+        '''
+        dims = self._dims(tensor_name)
+        if dims is None:
+            return None
+        value_info = self.graph_index.value_infos.get(tensor_name)
+        elem_type = TensorProto.FLOAT
+        if value_info is not None and value_info.type.HasField('tensor_type'):
+            elem_type = value_info.type.tensor_type.elem_type
+        elem_size = DTYPE_SIZES.get(elem_type, 4)
+        if boundary_codec in BOUNDARY_CODEC_SIZES and elem_type in FLOAT_TYPES:
+            elem_size = min(elem_size, BOUNDARY_CODEC_SIZES[boundary_codec])
+        return int(np.prod(dims)) * elem_size
+
+    def get_cuts(self):
+        ''' Return the valid single-tensor cuts of the graph (see 'get_valid_cuts').
+            Since the nodes are topologically sorted, the first half of a cut 
+            is made of the nodes up to the producer of the cut tensor.
+
+            Return: dict with the tensor names as keys and the Cut objects as values.
+        '''
+        if self._cuts is not None:
+            return self._cuts
+        if self.valid_cuts is None:
+            self.valid_cuts = get_valid_cuts(self.graph_index)
+
+        node_position = {}
+        for idx, node in enumerate(self.nodes):
+            for output_name in node.output:
+                node_position.setdefault(output_name, idx)
+
+        cumulative_flops = np.cumsum(self.node_flops) if self.nodes else []
+        cumulative_params = np.cumsum(self.node_param_bytes) if self.nodes else []
+
+        cuts = {}
+        for tensor in self.valid_cuts:
+            transfer_bytes = self.tensor_bytes(tensor)
+            if transfer_bytes is None or tensor not in node_position:
+                continue
+            position = node_position[tensor]
+            flops_before = int(cumulative_flops[position])
+            params_before = int(cumulative_params[position])
+            cuts[tensor] = Cut(tensor=tensor,
+                               flops_before=flops_before,
+                               flops_after=self.total_flops - flops_before,
+                               params_before=params_before,
+                               params_after=self.total_param_bytes - params_before,
+                               transfer_bytes=transfer_bytes,
+                               encoded_bytes=self.tensor_bytes(tensor, self.boundary_codec))
+        self._cuts = cuts
+        return cuts
+
+    def rank_cuts(self, candidates, profile):
+        ''' Rank the candidate tensors that are valid cuts by estimated end-to-end latency
+            on 'profile' (ties are broken by transfer bytes and then by the candidates order).
+
+            Return: list of (tensor name, estimated latency) tuples.
+        '''
+        cuts = self.get_cuts()
+        ranked = []
+        for order, tensor in enumerate(candidates):
+            if tensor not in cuts:
+                continue
+            cut = cuts[tensor]
+            ranked.append((cut.estimate_latency(profile), cut.encoded_bytes, order, tensor))
+        ranked.sort()
+        return [(tensor, latency) for latency, _, _, tensor in ranked]
+
+
+def _get_network_domains(network_domains, domains=None):
+    # Flatten the network domains, each with the set of its (also nested) computational layers
+    if domains is None:
+        domains = {}
+    for domain_key, domain in network_domains.items():
+        layers = set()
+        for layer_key, layer in domain.get('ComputationalLayers', {}).items():
+            layers.add(int(layer.get('number', layer_key.split('computationalLayer')[-1])))
+        domains[domain_key] = {'domain': domain, 'layers': layers,
+                               'sub_domains': domain.get('subNetworkDomains', []) or []}
+    # Sub-domains layers are included in the parent domain
+    changed = True
+    while changed:
+        changed = False
+        for domain in domains.values():
+            for sub_domain in domain['sub_domains']:
+                if sub_domain in domains and not domains[sub_domain]['layers'] <= domain['layers']:
+                    domain['layers'] |= domains[sub_domain]['layers']
+                    changed = True
+    return domains
+
+def get_resources_profiles(candidate_resources):
+    ''' Get the DeviceProfile and the computational layer of each resource in 'candidate_resources'.
+
+        Return: dict with the resource names as keys and (DeviceProfile, layer number) tuples as values.
+    '''
+    resources = {}
+    for domain in candidate_resources['System']['NetworkDomains'].values():
+        for layer_key, layer in domain.get('ComputationalLayers', {}).items():
+            layer_number = int(layer.get('number', layer_key.split('computationalLayer')[-1]))
+            for resource in layer.get('Resources', {}).values():
+                if 'processors' in resource:
+                    computing_units = sum(
+                        [processor.get('computingUnits', 1) for processor in resource['processors'].values()])
+                else:
+                    # FaaS: the computing capacity is proportional to the memory
+                    computing_units = resource.get('memorySize', FAAS_MB_PER_UNIT) / FAAS_MB_PER_UNIT
+                resources[resource['name']] = (
+                    DeviceProfile(resource['name'], computing_units=computing_units), layer_number)
+    return resources
+
+def get_network_profile(candidate_resources, first_layer, second_layer):
+    ''' Get the NetworkProfile of the smallest network domain including both the layers.
+        Return None if no network domain includes them.
+    '''
+    domains = _get_network_domains(candidate_resources['System']['NetworkDomains'])
+    selected = None
+    for domain in domains.values():
+        if first_layer in domain['layers'] and second_layer in domain['layers']:
+            if selected is None or len(domain['layers']) < len(selected['layers']):
+                selected = domain
+    if selected is None or 'Bandwidth' not in selected['domain']:
+        return None
+    return NetworkProfile(bandwidth=float(selected['domain']['Bandwidth']),
+                          access_delay=float(selected['domain'].get('AccessDelay', 0.0)))
+
+def get_partition_profile(application_dir, component_name):
+    ''' Build the PartitionProfile of a partitionable component from the first candidate
+        resources of its 'partitionX_1' and 'partitionX_2' entries in candidate_deployments.yaml.
+        Return None if the profile cannot be built (e.g., missing files or entries).
+    '''
+    application_model = get_application_model(application_dir)
+    candidate_deployments = application_model.candidate_deployments
+    candidate_resources = application_model.candidate_resources
+    if candidate_deployments is None or candidate_resources is None:
+        return None
+
+    halves = {}
+    for component_dict in candidate_deployments.get('Components', {}).values():
+        name = str(component_dict.get('name', '')).strip()
+        for half in ['1', '2']:
+            if name == component_name + '_partitionX_' + half:
+                try:
+                    halves[half] = component_dict['Containers']['container1']['candidateExecutionResources'][0]
+                except (KeyError, IndexError, TypeError):
+                    pass
+    if len(halves) != 2:
+        return None
+
+    resources = get_resources_profiles(candidate_resources)
+    if halves['1'] not in resources or halves['2'] not in resources:
+        return None
+    first_device, first_layer = resources[halves['1']]
+    second_device, second_layer = resources[halves['2']]
+
+    network = None
+    if halves['1'] != halves['2']:
+        network = get_network_profile(candidate_resources, first_layer, second_layer)
+        if network is None:
+            return None
+    return PartitionProfile(first_device, second_device, network)
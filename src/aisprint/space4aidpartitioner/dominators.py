@@ -0,0 +1,135 @@
+def compute_immediate_dominators(successors, entry):
+    ''' Compute the immediate dominators of a directed graph with the algorithm of
+        Cooper, Harvey and Kennedy ("A Simple, Fast Dominance Algorithm").
+
+        Parameters:
+            successors (list of list of int): adjacency lists of the vertices.
+            entry (int): entry vertex.
+
+        Return: list with the immediate dominator of each vertex (the entry is its own
+            immediate dominator), None for the vertices not reachable from the entry.
+    '''
+    num_vertices = len(successors)
+
+    # Iterative depth-first search to get the post-order of the reachable vertices
+    postorder = []
+    visited = [False] * num_vertices
+    visited[entry] = True
+    stack = [(entry, iter(successors[entry]))]
+    while stack:
+        vertex, children = stack[-1]
+        for child in children:
+            if not visited[child]:
+                visited[child] = True
+                stack.append((child, iter(successors[child])))
+                break
+        else:
+            stack.pop()
+            postorder.append(vertex)
+
+    postorder_number = [-1] * num_vertices
+    for number, vertex in enumerate(postorder):
+        postorder_number[vertex] = number
+
+    predecessors = [[] for _ in range(num_vertices)]
+    for vertex in postorder:
+        for child in successors[vertex]:
+            predecessors[child].append(vertex)
+
+    idom = [None] * num_vertices
+    idom[entry] = entry
+
+    def intersect(first, second):
+        while first != second:
+            while postorder_number[first] < postorder_number[second]:
+                first = idom[first]
+            while postorder_number[second] < postorder_number[first]:
+                second = idom[second]
+        return first
+
+    reverse_postorder = list(reversed(postorder))
+    changed = True
+    while changed:
+        changed = False
+        for vertex in reverse_postorder:
+            if vertex == entry:
+                continue
+            new_idom = None
+            for predecessor in predecessors[vertex]:
+                if idom[predecessor] is None:
+                    continue
+                if new_idom is None:
+                    new_idom = predecessor
+                else:
+                    new_idom = intersect(predecessor, new_idom)
+            if idom[vertex] != new_idom:
+                idom[vertex] = new_idom
+                changed = True
+    return idom
+
+
+def get_valid_cuts(graph_index):
+    ''' Get the tensors which are valid single-tensor cuts of the graph, i.e., the tensors
+        on every path from the true inputs to the outputs (dominators of the outputs).
+        Cutting the graph at one of them gives a first half computing the tensor from the
+        true inputs and a second half computing all the outputs from the tensor only.
+
+        The graph of tensors and nodes is extended with a super source (connected to the
+        true inputs) and a super sink (connected from the outputs): the valid cuts are the
+        tensors on the immediate dominators chain of the sink. Initializers and constant
+        subgraphs are not reachable from the source, thus they never prevent a cut.
+
+        Parameters:
+            graph_index (ONNXGraphIndex): index of the graph.
+
+        Return: list of tensor names, ordered from the inputs to the outputs.
+            True inputs and graph outputs are excluded.
+    '''
+    nodes = graph_index.onnx_model.graph.node
+
+    # Vertices: 0 = source, 1 = sink, then the tensors, then the nodes
+    vertex_ids = {}
+    tensor_names = []
+
+    def tensor_vertex(tensor_name):
+        if tensor_name not in vertex_ids:
+            vertex_ids[tensor_name] = 2 + len(tensor_names)
+            tensor_names.append(tensor_name)
+        return vertex_ids[tensor_name]
+
+    edges = []
+    for tensor_name in graph_index.true_inputs:
+        edges.append((0, tensor_vertex(tensor_name)))
+    node_vertices = []
+    for node in nodes:
+        node_vertices.append([tensor_vertex(name) for name in node.input
+                              if name and name not in graph_index.initializers])
+    for tensor_name in graph_index.outputs:
+        edges.append((tensor_vertex(tensor_name), 1))
+    output_vertices = [[tensor_vertex(name) for name in node.output if name] for node in nodes]
+
+    num_tensor_vertices = 2 + len(tensor_names)
+    successors = [[] for _ in range(num_tensor_vertices + len(nodes))]
+    for source, destination in edges:
+        successors[source].append(destination)
+    for node_idx, input_vertices in enumerate(node_vertices):
+        node_vertex = num_tensor_vertices + node_idx
+        for input_vertex in input_vertices:
+            successors[input_vertex].append(node_vertex)
+        successors[node_vertex].extend(output_vertices[node_idx])
+
+    idom = compute_immediate_dominators(successors, entry=0)
+    if idom[1] is None:
+        return []
+
+    excluded = set(graph_index.true_inputs) | set(graph_index.outputs)
+    cuts = []
+    vertex = idom[1]
+    while vertex != 0:
+        if 2 <= vertex < num_tensor_vertices:
+            tensor_name = tensor_names[vertex - 2]
+            if tensor_name not in excluded:
+                cuts.append(tensor_name)
+        vertex = idom[vertex]
+    cuts.reverse()
+    return cuts
@@ -8,6 +8,8 @@ from skl2onnx.helpers.onnx_helper import load_onnx_model
 
 import pandas as pd
 
+from .graph_index import ONNXGraphIndex, get_true_inputs
+
 
 class EESPACE4AIDPartitioner():
     ''' Partitioner that, given an early-exits model,
@@ -46,21 +48,8 @@ class EESPACE4AIDPartitioner():
         :param onnx_model: the already imported ONNX Model
         :returns: a list of the true inputs
         '''
-        input_names = []
-
-        initializers = [node.name for node in onnx_model.graph.initializer]
-
-        # Iterate all inputs and check if they are valid
-        for i in range(len(onnx_model.graph.input)):
-            node_name = onnx_model.graph.input[i].name
-            # Check if input is not an initializer, if so ignore it
-            if node_name in initializers:
-                continue
-            else:
-                input_names.append(node_name)
+        return get_true_inputs(onnx_model)
 
-        return input_names
-    
     def filter_nodes(self, node_names):
         filtered_node_names = []
         for node_name in node_names.split(','):
@@ -85,6 +74,9 @@ class EESPACE4AIDPartitioner():
             # Load the Onnx Model
             onnx_model = load_onnx_model(self.onnx_file)
 
+        # Shapes are not needed to split at the early exits
+        graph_index = ONNXGraphIndex(onnx_model, infer_shapes=False)
+
         found_partitions = []
 
         #Make a split for every layer in the model
@@ -110,7 +102,7 @@ class EESPACE4AIDPartitioner():
                 os.makedirs(onnx_folder)
 
             if ee_idx == 0:
-                filtered_input_names = self._get_true_input(onnx_model)
+                filtered_input_names = graph_index.true_inputs
             else:
                 input_names = self.ee_df.iloc[ee_idx-1].input_nodes.split('[')[1].split(']')[0]
                 filtered_input_names = self.filter_nodes(input_names)
@@ -160,9 +152,9 @@ class EESPACE4AIDPartitioner():
                 
                 # Get final output
                 last_output_names = []
-                for i in range(len(onnx_model.graph.output)):
-                    if onnx_model.graph.output[i].name not in ee_output_nodes:
-                        last_output_names.append(onnx_model.graph.output[i].name)
+                for output_name in graph_index.outputs:
+                    if output_name not in ee_output_nodes:
+                        last_output_names.append(output_name)
                 
                 try:
                     onnx.utils.extract_model(
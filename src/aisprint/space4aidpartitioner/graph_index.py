@@ -0,0 +1,107 @@
+import onnx
+
+
+def get_true_inputs(onnx_model):
+    ''' Get the list of TRUE inputs of the ONNX model, i.e., the graph inputs
+        that are not static initializers (weights and biases).
+
+        Parameters:
+            onnx_model (onnx.ModelProto): the already imported ONNX model.
+    '''
+    initializers = set(initializer.name for initializer in onnx_model.graph.initializer)
+    return [graph_input.name for graph_input in onnx_model.graph.input
+            if graph_input.name not in initializers]
+
+
+class ONNXGraphIndex():
+    ''' Index of an ONNX graph built with a single pass over its nodes,
+        to look up tensors without scanning the whole graph each time.
+
+        For each tensor name it stores:
+            - the producer node (the first node that outputs the tensor)
+            - the consumer nodes
+            - the (inferred) ValueInfoProto, from which shapes are read directly
+
+        Parameters:
+            onnx_model (onnx.ModelProto): the already imported ONNX model.
+            infer_shapes (bool): whether to run the ONNX shape inference to get the shapes
+                of the intermediate tensors.
+    '''
+
+    def __init__(self, onnx_model, infer_shapes=True):
+        self.onnx_model = onnx_model
+        graph = onnx_model.graph
+
+        self.initializers = set(initializer.name for initializer in graph.initializer)
+        self.true_inputs = [graph_input.name for graph_input in graph.input
+                            if graph_input.name not in self.initializers]
+        self.outputs = [graph_output.name for graph_output in graph.output]
+
+        self.producers = {}
+        self.consumers = {}
+        for node in graph.node:
+            for output_name in node.output:
+                if output_name not in self.producers:
+                    self.producers[output_name] = node
+            for input_name in node.input:
+                self.consumers.setdefault(input_name, []).append(node)
+
+        if infer_shapes:
+            inferred_graph = onnx.shape_inference.infer_shapes(onnx_model).graph
+        else:
+            inferred_graph = graph
+        # Ordered as in the (inferred) graph: intermediate tensors only
+        self.value_info = list(inferred_graph.value_info)
+        self.value_infos = {}
+        for value_info in list(inferred_graph.input) + list(inferred_graph.output) + self.value_info:
+            self.value_infos[value_info.name] = value_info
+
+    def producer(self, tensor_name):
+        ''' Return the node producing 'tensor_name', None for graph inputs and initializers.
+        '''
+        return self.producers.get(tensor_name)
+
+    def op_type(self, tensor_name):
+        ''' Return the operator type of the node producing 'tensor_name'.
+        '''
+        node = self.producers.get(tensor_name)
+        if node is None:
+            return None
+        return node.op_type
+
+    def get_consumers(self, tensor_name):
+        ''' Return the list of nodes taking 'tensor_name' as input.
+        '''
+        return self.consumers.get(tensor_name, [])
+
+    def shape(self, tensor_name):
+        ''' Return the shape of 'tensor_name' as a list of dimensions, where unknown
+            (symbolic) dimensions are None. Return None if the shape is not available.
+        '''
+        value_info = self.value_infos.get(tensor_name)
+        if value_info is None:
+            return None
+        return value_info_shape(value_info)
+
+    def known_dims(self, tensor_name):
+        ''' Return the known dimensions of 'tensor_name' (symbolic dimensions are skipped),
+            None if the shape is not available.
+        '''
+        shape = self.shape(tensor_name)
+        if shape is None:
+            return None
+        return [dim for dim in shape if dim is not None]
+
+
+def value_info_shape(value_info):
+    ''' Read the shape of a tensor ValueInfoProto, without converting the message to a dict.
+        Unknown dimensions are None. Return None if the value is not a tensor
+        or if it has no (or an empty) shape.
+    '''
+    if not value_info.type.HasField('tensor_type'):
+        return None
+    tensor_type = value_info.type.tensor_type
+    if not tensor_type.HasField('shape') or len(tensor_type.shape.dim) == 0:
+        return None
+    return [dim.dim_value if dim.HasField('dim_value') else None
+            for dim in tensor_type.shape.dim]
@@ -0,0 +1,215 @@
+import ast
+
+
+INFERENCE_FUNCTION = 'load_and_inference'
+
+
+def _is_inference_call(node):
+    if not isinstance(node, ast.Call):
+        return False
+    if isinstance(node.func, ast.Name):
+        return node.func.id == INFERENCE_FUNCTION
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr == INFERENCE_FUNCTION
+    return False
+
+def _is_name_main_test(node):
+    # __name__ == '__main__' (in any order)
+    if not isinstance(node, ast.Compare) or len(node.ops) != 1 or not isinstance(node.ops[0], ast.Eq):
+        return False
+    operands = [node.left, node.comparators[0]]
+    has_name = any([isinstance(o, ast.Name) and o.id == '__name__' for o in operands])
+    has_main = any([isinstance(o, ast.Constant) and o.value == '__main__' for o in operands])
+    return has_name and has_main
+
+def _leading_whitespace(line):
+    return line[:len(line) - len(line.lstrip(' \t'))]
+
+
+class MainScript():
+    ''' Parsed 'main.py' script of a partitionable component, split at the ONNX inference.
+
+        The script is parsed once with 'ast', then the positions of the relevant statements
+        are used to slice its source lines, thus the formatting (multi-line statements,
+        spacing, comments) of the original code is preserved. The script must define:
+            - a module-level 'main' function, with the inference as a statement of its body
+              in the form: '<dict_res>, <out_res> = load_and_inference(...)'
+            - a module-level "if __name__ == '__main__':" block
+
+        Parameters:
+            path (str): path to the 'main.py' script.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'r') as f:
+            source = f.read()
+        self.lines = source.splitlines(keepends=True)
+        if self.lines and not self.lines[-1].endswith('\n'):
+            self.lines[-1] += '\n'
+        tree = ast.parse(source, filename=path)
+
+        inference_calls = [node for node in ast.walk(tree) if _is_inference_call(node)]
+        if len(inference_calls) > 1:
+            raise Exception(
+                "Multiple ONNX load_and_inference calls found in {} script. Only one is allowed.".format(path))
+        elif len(inference_calls) == 0:
+            raise Exception(
+                "ONNX load_and_inference call required in {} script.".format(path))
+
+        main_functions = [node for node in tree.body
+                          if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == 'main']
+        if len(main_functions) != 1:
+            raise Exception("A single module-level 'main' function is required in {} script.".format(path))
+        self.main_function = main_functions[0]
+
+        name_main_blocks = [node for node in tree.body
+                            if isinstance(node, ast.If) and _is_name_main_test(node.test)]
+        if len(name_main_blocks) == 0:
+            raise Exception("\"if __name__ == '__main__':\" block required in {} script.".format(path))
+        self.name_main_block = name_main_blocks[-1]
+
+        self._find_inference(inference_calls[0])
+        self._find_onnx_file_argument()
+
+    def _find_inference(self, inference_call):
+        body = self.main_function.body
+        statements = [stmt for stmt in body
+                      if any([node is inference_call for node in ast.walk(stmt)])]
+        if not statements:
+            raise Exception(
+                "The load_and_inference call must be a statement of the 'main' function body in {} script.".format(
+                    self.path))
+        statement = statements[0]
+        if (not isinstance(statement, ast.Assign) or statement.value is not inference_call
+                or len(statement.targets) != 1 or not isinstance(statement.targets[0], ast.Tuple)
+                or len(statement.targets[0].elts) != 2
+                or not all([isinstance(elt, ast.Name) for elt in statement.targets[0].elts])):
+            raise Exception(
+                "The load_and_inference call must be in the form " +
+                "'<dict>, <output> = load_and_inference(...)' in {} script.".format(self.path))
+        # The statement must not share its lines with other statements
+        idx = body.index(statement)
+        if ((idx > 0 and body[idx-1].end_lineno >= statement.lineno) or
+                (idx < len(body) - 1 and body[idx+1].lineno <= statement.end_lineno)):
+            raise Exception(
+                "The load_and_inference call must be on its own line(s) in {} script.".format(self.path))
+        if body[0].lineno == self.main_function.lineno:
+            raise Exception("The body of the 'main' function must start on a new line in {} script.".format(
+                self.path))
+
+        self.dict_res, self.out_res = [elt.id for elt in statement.targets[0].elts]
+
+        # Line indices (0-based, end excluded)
+        self.body_start = body[0].lineno - 1
+        decorators = getattr(body[0], 'decorator_list', [])
+        if decorators:
+            self.body_start = decorators[0].lineno - 1
+        # Blank and comment lines before the first statement belong to the body
+        while self.body_start > self.main_function.lineno and self._is_blank_or_comment(self.body_start - 1):
+            self.body_start -= 1
+        self.inference_start = statement.lineno - 1
+        self.inference_end = statement.end_lineno
+        self.name_main_start = self.name_main_block.lineno - 1
+        # Indented comments after the last statement belong to the body
+        self.main_end = self.main_function.end_lineno
+        idx = self.main_end
+        while idx < self.name_main_start and self._is_blank_or_comment(idx):
+            if self.lines[idx].strip() and _leading_whitespace(self.lines[idx]):
+                self.main_end = idx + 1
+            idx += 1
+
+        # Indentation of the inference statement and indentation unit of the script
+        self.indent = _leading_whitespace(self.lines[self.inference_start])
+        body_indent = _leading_whitespace(self.lines[body[0].lineno - 1])
+        self.pad = body_indent[len(_leading_whitespace(self.lines[self.main_function.lineno - 1])):] or '    '
+
+    def _is_blank_or_comment(self, idx):
+        line = self.lines[idx].strip()
+        return not line or line.startswith('#')
+
+    def _find_onnx_file_argument(self):
+        # 'default' value of the "--onnx_file" argument and last 'add_argument' statement
+        # of the "if __name__ == '__main__':" block
+        self.onnx_file_default = None
+        self.last_argument = None
+        for stmt in self.name_main_block.body:
+            calls = [node for node in ast.walk(stmt) if isinstance(node, ast.Call)
+                     and isinstance(node.func, ast.Attribute) and node.func.attr == 'add_argument']
+            if not calls:
+                continue
+            self.last_argument = stmt
+            for call in calls:
+                flags = [arg.value for arg in call.args if isinstance(arg, ast.Constant)]
+                if '--onnx_file' not in flags:
+                    continue
+                for keyword in call.keywords:
+                    if keyword.arg == 'default' and isinstance(keyword.value, ast.Constant):
+                        self.onnx_file_default = keyword.value
+
+    def get_lines(self, start, end=None):
+        return self.lines[start:end]
+
+    def preprocessing(self):
+        ''' Lines up to the inference statement (imports, definitions and pre-processing).
+        '''
+        return self.get_lines(0, self.inference_start)
+
+    def inference(self):
+        ''' Lines of the inference statement.
+        '''
+        return self.get_lines(self.inference_start, self.inference_end)
+
+    def main_header(self):
+        ''' Lines up to the signature of the 'main' function (included).
+        '''
+        return self.get_lines(0, self.body_start)
+
+    def postprocessing(self):
+        ''' Lines of the 'main' function after the inference statement.
+        '''
+        return self.get_lines(self.inference_end, self.main_end)
+
+    def after_main(self):
+        ''' Lines between the 'main' function and the "if __name__ == '__main__':" block.
+        '''
+        return self.get_lines(self.main_end, self.name_main_start)
+
+    def name_main(self, onnx_file=None, orig_onnx_file=None):
+        ''' Lines of the "if __name__ == '__main__':" block (until the end of the script).
+            If 'onnx_file' is provided, the default value of the "--onnx_file" argument is
+            changed to use it (replacing 'orig_onnx_file' if provided) or, if missing,
+            the argument is added.
+        '''
+        lines = self.get_lines(self.name_main_start)
+        if onnx_file is None:
+            return lines
+        if self.onnx_file_default is not None:
+            default = self.onnx_file_default
+            start = default.lineno - 1 - self.name_main_start
+            end = default.end_lineno - 1 - self.name_main_start
+            # ast offsets are in bytes
+            prefix = lines[start].encode('utf-8')[:default.col_offset].decode('utf-8')
+            suffix = lines[end].encode('utf-8')[default.end_col_offset:].decode('utf-8')
+            segment = ''.join(lines[start:end+1]).encode('utf-8')[
+                len(prefix.encode('utf-8')):-len(suffix.encode('utf-8')) or None].decode('utf-8')
+            if (orig_onnx_file is not None and default.lineno == default.end_lineno 
+                    and orig_onnx_file in segment):
+                # The original quotes are kept
+                new_default = segment.replace(orig_onnx_file, onnx_file)
+            else:
+                new_default = repr('onnx/' + onnx_file)
+            new_line = prefix + new_default + suffix
+            return lines[:start] + [new_line] + lines[end+1:]
+        if self.last_argument is None:
+            raise Exception("No argument parser found in the \"if __name__ == '__main__':\" block of {} script.".format(
+                self.path))
+        idx = self.last_argument.end_lineno - self.name_main_start
+        indent = _leading_whitespace(self.lines[self.last_argument.lineno - 1])
+        new_line = indent + "parser.add_argument('-y', '--onnx_file', default='onnx/{}', help='complete path to tge ONNX model')\n".format(onnx_file)
+        return lines[:idx] + [new_line] + lines[idx:]
+
+    def indented(self, lines, indent):
+        ''' Add 'indent' at the beginning of the (not empty) 'lines'.
+        '''
+        return [indent + line if line.strip() else line for line in lines]
@@ -1,5 +1,9 @@
 import os
+import math
 import shutil
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 from tqdm import tqdm
 
@@ -12,7 +16,63 @@ from onnx.utils import Extractor
 from skl2onnx.helpers.onnx_helper import enumerate_model_node_outputs
 from skl2onnx.helpers.onnx_helper import load_onnx_model
 
-from google.protobuf.json_format import MessageToDict
+from .graph_index import ONNXGraphIndex, get_true_inputs, value_info_shape
+from .cost_model import GraphCostModel
+from .dominators import get_valid_cuts
+
+
+def extract_model(
+    model,
+    output_path: str,
+    input_names: List[str],
+    output_names: List[str],
+    check_model: bool = True,
+) -> None:
+    """Extracts sub-model from an ONNX model.
+    The sub-model is defined by the names of the input and output tensors *exactly*.
+    Note: For control-flow operators, e.g. If and Loop, the _boundary of sub-model_,
+    which is defined by the input and output tensors, should not _cut through_ the
+    subgraph that is connected to the _main graph_ as attributes of these operators.
+    Arguments:
+        input_path (string): The path to original ONNX model.
+        output_path (string): The path to save the extracted ONNX model.
+        input_names (list of string): The names of the input tensors that to be extracted.
+        output_names (list of string): The names of the output tensors that to be extracted.
+        check_model (bool): Whether to run model checker on the extracted model.
+    """
+    if not output_path:
+        raise ValueError("Output model path shall not be empty!")
+    if not output_names:
+        raise ValueError("Output tensor names shall not be empty!")
+
+    e = Extractor(model)
+    extracted = e.extract_model(input_names, output_names)
+
+    onnx.save(extracted, output_path)
+    if check_model:
+        onnx.checker.check_model(output_path)
+
+
+def extract_candidate(onnx_model, layer, candidate_dir, true_input_names, model_output_names):
+    ''' Extract the two halves of the model cut at 'layer' into 'candidate_dir'.
+        Return False if the second half cannot be extracted (i.e., 'layer' is not a valid cut).
+    '''
+    if not os.path.exists(candidate_dir):
+        os.makedirs(candidate_dir)
+
+    # Split and save the second half of the current partition
+    try:
+        extract_model(
+            onnx_model, os.path.join(candidate_dir, 'second.onnx'),
+            [layer], model_output_names)
+    except Exception as e:
+        return False
+
+    # Split and save the first half of the current partition
+    extract_model(
+        onnx_model, os.path.join(candidate_dir, 'first.onnx'),
+        true_input_names, [layer])
+    return True
 
 
 class SPACE4AIDPartitioner():
@@ -29,23 +89,89 @@ class SPACE4AIDPartitioner():
         self.partitionable_model_dir = os.path.join(
             self.application_dir, 'aisprint', 'designs', partitionable_model, 'base')
         self.onnx_file = os.path.join(self.partitionable_model_dir, 'onnx', onnx_file)
+        self.boundary_codec = None
+        self.partitioned_layers = []
+        # Tensors crossing the cuts of each found partition, with their sizes
+        self.boundaries = {}
     
-    def get_partitions(self, num_partitions=1):
+    def get_partitions(self, num_partitions=1, num_workers=None, profile=None, num_segments=2,
+                       boundary_codec=None):
+        ''' Find up to 'num_partitions' partitions of the model.
+
+            Parameters:
+                num_partitions (int): maximum number of partitions.
+                num_segments (int): number of segments of each partition
+                    (i.e., 'partitionN_1', ..., 'partitionN_<num_segments>').
+                num_workers (int): number of processes evaluating the candidate cuts.
+                profile (PartitionProfile): resources running the two halves of the model.
+                    If provided, the cuts are ranked by estimated end-to-end latency, 
+                    otherwise by output tensor size.
+                boundary_codec (str): codec applied to the tensors crossing the cuts, the
+                    encoded sizes are used by the cost model and reported in 'self.boundaries'.
+        '''
         # Load the Onnx Model
         print("\n")
         print("[AI-SPRINT]: " + "Running SPACE4AI-D-partitioner..")
         print("             " + "Maximum number of required partitions: {}".format(num_partitions))
+        if num_segments > 2:
+            print("             " + "Number of segments of each partition: {}".format(num_segments))
         print("             " + "- Finding partitions of model: {}".format(self.partitionable_model))
+        self.boundary_codec = boundary_codec
         onnx_model = load_onnx_model(self.onnx_file)
-        sorted_nodes = self._get_sorted_nodes(onnx_model=onnx_model)
+        # Index of the graph, built once and shared by the partitioning steps
+        self.graph_index = ONNXGraphIndex(onnx_model)
+        sorted_nodes = self._get_sorted_nodes(onnx_model=onnx_model, graph_index=self.graph_index)
+
+        # Only the valid single-tensor cuts are extracted
+        valid_cuts = get_valid_cuts(self.graph_index)
+        print("             " + "  Found {} valid cut points".format(len(valid_cuts)))
+        valid_cuts_set = set(valid_cuts)
+        sorted_nodes = {node: size for node, size in sorted_nodes.items() if node in valid_cuts_set}
+
+        if profile is not None:
+            sorted_nodes = self._get_ranked_nodes(sorted_nodes, profile, valid_cuts)
+
+        if num_segments > 2:
+            found_partitions = self.onnx_model_split_chains(
+                sorted_nodes, valid_cuts, onnx_model=onnx_model, number_of_partitions=num_partitions,
+                num_segments=num_segments, num_workers=num_workers)
+        else:
+            found_partitions = self.onnx_model_split_first_smallest(
+                sorted_nodes, onnx_model=onnx_model, number_of_partitions=num_partitions,
+                num_workers=num_workers)
+
+        self.boundaries = self._get_boundaries(self.partitioned_layers)
+        return found_partitions
 
-        return self.onnx_model_split_first_smallest(
-            sorted_nodes, onnx_model=onnx_model, number_of_partitions=num_partitions)
+    def _get_boundaries(self, partitioned_layers):
+        ''' Get the size in bytes of the tensors crossing the cuts of each partition, 
+            raw and encoded with the boundary codec.
 
-    def _get_node_type(self, onnx_model, node_name):
-        for node in onnx_model.graph.node:
-            if node_name in node.output:
-                return node.op_type
+            Return: dict with the partition names ('partitionN') as keys and the list of 
+                the cuts (ordered from the inputs to the outputs) as values.
+        '''
+        cost_model = GraphCostModel(self.graph_index, self.boundary_codec)
+        boundaries = {}
+        for idx, layers in enumerate(partitioned_layers):
+            which_partition = 'partition{}'.format(idx+1)
+            if not isinstance(layers, list):
+                layers = [layers]
+            boundaries[which_partition] = []
+            for layer in layers:
+                raw_bytes = cost_model.tensor_bytes(layer)
+                encoded_bytes = cost_model.tensor_bytes(layer, self.boundary_codec)
+                boundaries[which_partition].append(
+                    {'tensor': layer, 'bytes': raw_bytes, 'encoded_bytes': encoded_bytes,
+                     'codec': self.boundary_codec})
+                if raw_bytes is not None:
+                    print("             " + "  {} - cut at {}: {} bytes ({} encoded bytes, codec: {})".format(
+                        which_partition, layer, raw_bytes, encoded_bytes, self.boundary_codec))
+        return boundaries
+
+    def _get_node_type(self, onnx_model, node_name, graph_index=None):
+        if graph_index is None:
+            graph_index = ONNXGraphIndex(onnx_model, infer_shapes=False)
+        return graph_index.op_type(node_name)
     
     def _node_is_activation(self, node):
         # NOTE: add others?
@@ -65,31 +191,27 @@ class SPACE4AIDPartitioner():
             return True
         return False
 
-    def _get_sorted_nodes(self, onnx_model):
-        shape_info = onnx.shape_inference.infer_shapes(onnx_model)
+    def _get_sorted_nodes(self, onnx_model, graph_index=None):
+        if graph_index is None:
+            graph_index = ONNXGraphIndex(onnx_model)
         shape_info_dict = {}
-        output_nodes = [node.name for node in onnx_model.graph.output]
-        for info in shape_info.graph.value_info:
-            info_dict = MessageToDict(info)
-            node_name = info_dict['name']
+        output_nodes = set(graph_index.outputs)
+        for info in graph_index.value_info:
+            node_name = info.name
             # Do not consider output nodes
             if node_name in output_nodes:
                 continue
             # Do not consider activation nodes TODO: to be double checked 
-            node_type = self._get_node_type(
-                onnx_model=onnx_model, node_name=node_name)
-            if self._node_is_activation(node_type):
+            node_type = graph_index.op_type(node_name)
+            if node_type is not None and self._node_is_activation(node_type):
                 continue
             # Do not consider nodes with no shape 
             # (NOTE: this is only for this implementation)
-            if 'shape' in info_dict['type']['tensorType'].keys():
-                shape = info_dict['type']['tensorType']['shape']
-                if not shape: 
-                    continue
-            else:
+            shape = value_info_shape(info)
+            if not shape:
                 continue
             
-            dims = [int(dim['dimValue']) for dim in shape['dim'] if 'dimValue' in dim]
+            dims = [dim for dim in shape if dim is not None]
             num_pixels = np.prod(dims)
 
             shape_info_dict[node_name] = num_pixels
@@ -99,6 +221,22 @@ class SPACE4AIDPartitioner():
 
         return shape_info_dict_sorted
 
+    def _get_ranked_nodes(self, sorted_nodes, profile, valid_cuts=None):
+        ''' Rank the candidate cuts by estimated end-to-end latency on 'profile'.
+            Candidates that are not single-tensor cuts ('valid_cuts', computed if not provided) 
+            are discarded. If no candidate is left, the tensor-size ordering is kept.
+        '''
+        cost_model = GraphCostModel(self.graph_index, self.boundary_codec, valid_cuts)
+        ranked_nodes = cost_model.rank_cuts(list(sorted_nodes), profile)
+        if not ranked_nodes:
+            print("             " + "  No valid cut found by the cost model, using the tensor size ordering")
+            return sorted_nodes
+        first_device = profile.first_device.name
+        second_device = profile.second_device.name
+        print("             " + "  Ranking {} cuts by estimated latency on '{}' -> '{}'".format(
+            len(ranked_nodes), first_device, second_device))
+        return dict(ranked_nodes)
+
     def _get_true_input(self, onnx_model):
         '''
         Get the list of TRUE inputs of the ONNX model passed as argument.
@@ -108,20 +246,7 @@ class SPACE4AIDPartitioner():
         :param onnx_model: the already imported ONNX Model
         :returns: a list of the true inputs
         '''
-        input_names = []
-
-        initializers = [node.name for node in onnx_model.graph.initializer]
-
-        # Iterate all inputs and check if they are valid
-        for i in range(len(onnx_model.graph.input)):
-            node_name = onnx_model.graph.input[i].name
-            # Check if input is not an initializer, if so ignore it
-            if node_name in initializers:
-                continue
-            else:
-                input_names.append(node_name)
-
-        return input_names
+        return get_true_inputs(onnx_model)
 
     def extract_model(
         self,
@@ -131,35 +256,41 @@ class SPACE4AIDPartitioner():
         output_names: List[str],
         check_model: bool = True,
     ) -> None:
-        """Extracts sub-model from an ONNX model.
-        The sub-model is defined by the names of the input and output tensors *exactly*.
-        Note: For control-flow operators, e.g. If and Loop, the _boundary of sub-model_,
-        which is defined by the input and output tensors, should not _cut through_ the
-        subgraph that is connected to the _main graph_ as attributes of these operators.
-        Arguments:
-            input_path (string): The path to original ONNX model.
-            output_path (string): The path to save the extracted ONNX model.
-            input_names (list of string): The names of the input tensors that to be extracted.
-            output_names (list of string): The names of the output tensors that to be extracted.
-            check_model (bool): Whether to run model checker on the extracted model.
+        """Extracts sub-model from an ONNX model (see 'extract_model' of this module).
         """
-        if not output_path:
-            raise ValueError("Output model path shall not be empty!")
-        if not output_names:
-            raise ValueError("Output tensor names shall not be empty!")
+        extract_model(model, output_path, input_names, output_names, check_model)
 
-        e = Extractor(model)
-        extracted = e.extract_model(input_names, output_names)
+    def _extract_candidate(self, onnx_model, layer, candidate_dir, true_input_names, model_output_names):
+        return extract_candidate(onnx_model, layer, candidate_dir, true_input_names, model_output_names)
 
-        onnx.save(extracted, output_path)
-        if check_model:
-            onnx.checker.check_model(output_path)
-
-    def onnx_model_split_first_smallest(self, sorted_nodes, onnx_model=None, number_of_partitions=1):
+    def _create_executor(self, onnx_model, num_workers):
+        ''' Create the pool of extraction workers, None if 'num_workers' is 1.
+        '''
+        global _worker_model
+
+        if num_workers <= 1:
+            return None
+        # The parsed model is inherited by the forked workers, 
+        # otherwise it is loaded once by each worker
+        _worker_model = onnx_model
+        if 'fork' in multiprocessing.get_all_start_methods():
+            mp_context = multiprocessing.get_context('fork')
+        else:
+            mp_context = multiprocessing.get_context('spawn')
+        return ProcessPoolExecutor(
+            max_workers=num_workers, mp_context=mp_context,
+            initializer=_init_extraction_worker, initargs=(self.onnx_file,))
+
+    def onnx_model_split_first_smallest(self, sorted_nodes, onnx_model=None, number_of_partitions=1,
+                                        num_workers=None):
         ''' Find all the possible partitions of the ONNX model, 
             which are stored as designs in the designs folder of the AI-SPRINT application.
-        '''
 
+            Candidate cuts are evaluated in waves by a pool of 'num_workers' processes
+            (default: number of CPUs) sharing the parsed model. Results are accepted in the
+            order of 'sorted_nodes', thus the found partitions are the same of the sequential
+            evaluation ('num_workers=1').
+        '''
         designs_folder = os.path.join(
             self.application_dir, 'aisprint', 'designs', self.partitionable_model)
         
@@ -170,78 +301,215 @@ class SPACE4AIDPartitioner():
             onnx.checker.check_model(self.onnx_file)
             onnx_model = load_onnx_model(self.onnx_file)
 
-        found_partitions = []
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        sorted_nodes = list(sorted_nodes)
+        num_workers = max(1, min(num_workers, len(sorted_nodes)))
+
+        true_input_names = self._get_true_input(onnx_model)
+        model_output_names = [output.name for output in onnx_model.graph.output]
 
-        #Make a split for every layer in the model
-        ln = 0
-        # for layer in enumerate_model_node_outputs(onnx_model):
+        # Candidates are extracted in a staging folder and moved to the 
+        # partition folders once they are accepted
+        staging_dir = os.path.join(designs_folder, '.partitions_staging')
+
+        found_partitions = []
         partitioned_layers = []
-        for layer in tqdm(sorted_nodes):
-            # Initialize partitions designs folders
-            which_partition = 'partition{}'.format(ln+1)
-            partition1_dir = os.path.join(designs_folder, which_partition+'_1')
-            if not os.path.exists(partition1_dir):
-                os.makedirs(partition1_dir)
-            partition2_dir = os.path.join(designs_folder, which_partition+'_2')
-            if not os.path.exists(partition2_dir):
-                os.makedirs(partition2_dir)
-            
-            onnx_folder = os.path.join(partition2_dir, 'onnx')
-            if not os.path.exists(onnx_folder):
-                os.makedirs(onnx_folder)
-
-            # Split and save the second half of the current partition 
-            # -------------------------------------------------------
-            input_names = [layer]
-
-            output_names = []
-
-            for i in range(len(onnx_model.graph.output)):
-                output_names.append(onnx_model.graph.output[i].name)
-
-            try:
-                self.extract_model(
-                    onnx_model,
-                    os.path.join(onnx_folder, which_partition+'_2.onnx'), 
-                    input_names, output_names)
-                found_partitions.append(which_partition+'_2')
-            except Exception as e:
-                # print(e)
-                for x in found_partitions: 
-                    if which_partition in x:
-                        found_partitions.remove(x)
-                shutil.rmtree(partition1_dir)
-                shutil.rmtree(partition2_dir)
-                continue
-            # -------------------------------------------------------
-            
-            # Split and save the first half of the current partition 
-            # ------------------------------------------------------
-            input_names = self._get_true_input(onnx_model) 
-            
-            output_names = [layer]
+        
+        executor = self._create_executor(onnx_model, num_workers)
+
+        try:
+            progress_bar = tqdm(total=len(sorted_nodes))
+            next_candidate = 0
+            while next_candidate < len(sorted_nodes) and len(partitioned_layers) < number_of_partitions:
+                # Evaluate a wave of candidates, at least one for each worker
+                wave_size = max(num_workers, number_of_partitions - len(partitioned_layers))
+                wave = list(enumerate(sorted_nodes[next_candidate:next_candidate+wave_size], next_candidate))
+                next_candidate += len(wave)
+
+                candidate_dirs = [os.path.join(staging_dir, 'candidate{}'.format(idx)) for idx, _ in wave]
+                if executor is None:
+                    outcomes = [self._get_outcome(
+                        self._extract_candidate, onnx_model, layer, candidate_dir, 
+                        true_input_names, model_output_names) 
+                        for (_, layer), candidate_dir in zip(wave, candidate_dirs)]
+                else:
+                    futures = [executor.submit(
+                        _extract_candidate_worker, layer, candidate_dir, 
+                        true_input_names, model_output_names)
+                        for (_, layer), candidate_dir in zip(wave, candidate_dirs)]
+                    outcomes = [self._get_outcome(future.result) for future in futures]
+
+                # Accept the valid cuts in order
+                for (_, layer), candidate_dir, (is_valid, error) in zip(wave, candidate_dirs, outcomes):
+                    if len(partitioned_layers) == number_of_partitions:
+                        break
+                    progress_bar.update(1)
+                    if error is not None:
+                        raise error
+                    if not is_valid:
+                        continue
+                    
+                    which_partition = 'partition{}'.format(len(partitioned_layers)+1)
+                    for half, filename in [('_2', 'second.onnx'), ('_1', 'first.onnx')]:
+                        onnx_folder = os.path.join(designs_folder, which_partition+half, 'onnx')
+                        if not os.path.exists(onnx_folder):
+                            os.makedirs(onnx_folder)
+                        os.replace(os.path.join(candidate_dir, filename), 
+                                   os.path.join(onnx_folder, which_partition+half+'.onnx'))
+                        found_partitions.append(which_partition+half)
+
+                    partitioned_layers.append(layer)
+            progress_bar.close()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+                _clear_worker_model()
+            if os.path.exists(staging_dir):
+                shutil.rmtree(staging_dir)
+        
+        print("\n")        
+        print("             " + "  Done! Model partitioned at layers: {}\n".format(partitioned_layers))
+        self.partitioned_layers = partitioned_layers
+        return found_partitions
 
-            onnx_folder = os.path.join(partition1_dir, 'onnx')
-            if not os.path.exists(onnx_folder):
-                os.makedirs(onnx_folder)
+    def _get_chains(self, ranked_cuts, valid_cuts, number_of_partitions, num_segments):
+        ''' Get the candidate chains of 'num_segments-1' cuts, ordered by the sum (and then by
+            the list) of the positions of their cuts in 'ranked_cuts'. Only the smallest set of
+            top-ranked cuts providing 'number_of_partitions' chains is considered.
 
-            self.extract_model(onnx_model, 
-                               os.path.join(onnx_folder, which_partition+'_1.onnx'), 
-                               input_names, output_names)
+            Return: list of chains, each one is a list of cuts ordered from the inputs to the outputs.
+        '''
+        num_cuts = num_segments - 1
+        if len(ranked_cuts) < num_cuts:
+            return []
+        pool_size = num_cuts
+        while pool_size < len(ranked_cuts) and math.comb(pool_size, num_cuts) < number_of_partitions:
+            pool_size += 1
+
+        # Cuts along the dominator chain are totally ordered from the inputs to the outputs
+        graph_order = {cut: idx for idx, cut in enumerate(valid_cuts)}
+        chains = []
+        for ranks in itertools.combinations(range(pool_size), num_cuts):
+            chain = sorted([ranked_cuts[rank] for rank in ranks], key=lambda cut: graph_order[cut])
+            chains.append((sum(ranks), ranks, chain))
+        chains.sort(key=lambda item: (item[0], item[1]))
+        return [chain for _, _, chain in chains]
+
+    def onnx_model_split_chains(self, sorted_nodes, valid_cuts, onnx_model=None, number_of_partitions=1, 
+                                num_segments=3, num_workers=None):
+        ''' Find partitions made of a chain of 'num_segments' segments (i.e., 'num_segments-1' cuts), 
+            which are stored as designs in the designs folder of the AI-SPRINT application.
 
-            found_partitions.append(which_partition+'_1')
+            Each segment (from a cut, or the true inputs, to the next cut, or the outputs) is 
+            extracted only once, also if it is shared by more chains.
+        '''
+        designs_folder = os.path.join(
+            self.application_dir, 'aisprint', 'designs', self.partitionable_model)
 
-            # Found first smallest partition, then break
-            ln = ln + 1
+        if onnx_model is None:
+            onnx_model = load_onnx_model(self.onnx_file)
 
-            partitioned_layers.append(layer)
+        chains = self._get_chains(list(sorted_nodes), valid_cuts, number_of_partitions, num_segments)
+
+        true_input_names = self._get_true_input(onnx_model)
+        model_output_names = [output.name for output in onnx_model.graph.output]
+
+        # Segments are identified by their boundaries (None stands for the model inputs/outputs)
+        segments = []
+        for chain in chains:
+            boundaries = [None] + chain + [None]
+            for idx in range(num_segments):
+                segment = (boundaries[idx], boundaries[idx+1])
+                if segment not in segments:
+                    segments.append(segment)
+
+        staging_dir = os.path.join(designs_folder, '.partitions_staging')
+        if not os.path.exists(staging_dir):
+            os.makedirs(staging_dir)
+        segment_files = [os.path.join(staging_dir, 'segment{}.onnx'.format(idx)) for idx in range(len(segments))]
+        segment_args = [(true_input_names if start is None else [start],
+                         model_output_names if end is None else [end]) for start, end in segments]
+
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        num_workers = max(1, min(num_workers, len(segments)))
+
+        found_partitions = []
+        partitioned_layers = []
+
+        executor = self._create_executor(onnx_model, num_workers)
+        try:
+            if executor is None:
+                extracted = [self._get_outcome(self.extract_model, onnx_model, segment_file, 
+                                               input_names, output_names)[1] is None
+                             for segment_file, (input_names, output_names) in zip(segment_files, segment_args)]
+            else:
+                futures = [executor.submit(_extract_segment_worker, segment_file, input_names, output_names)
+                           for segment_file, (input_names, output_names) in zip(segment_files, segment_args)]
+                extracted = [self._get_outcome(future.result)[1] is None for future in futures]
+            segment_ids = {segment: idx for idx, segment in enumerate(segments)}
+
+            for chain in chains:
+                if len(partitioned_layers) == number_of_partitions:
+                    break
+                boundaries = [None] + chain + [None]
+                chain_segments = [segment_ids[(boundaries[idx], boundaries[idx+1])] for idx in range(num_segments)]
+                if not all([extracted[segment_id] for segment_id in chain_segments]):
+                    continue
+
+                which_partition = 'partition{}'.format(len(partitioned_layers)+1)
+                for idx, segment_id in enumerate(chain_segments):
+                    which_segment = which_partition + '_{}'.format(idx+1)
+                    onnx_folder = os.path.join(designs_folder, which_segment, 'onnx')
+                    if not os.path.exists(onnx_folder):
+                        os.makedirs(onnx_folder)
+                    onnx_segment_file = os.path.join(onnx_folder, which_segment+'.onnx')
+                    if os.path.exists(onnx_segment_file):
+                        os.remove(onnx_segment_file)
+                    # Shared segments are linked (copied if links are not supported)
+                    try:
+                        os.link(segment_files[segment_id], onnx_segment_file)
+                    except OSError:
+                        shutil.copyfile(segment_files[segment_id], onnx_segment_file)
+                    found_partitions.append(which_segment)
+                partitioned_layers.append(chain)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+                _clear_worker_model()
+            if os.path.exists(staging_dir):
+                shutil.rmtree(staging_dir)
 
-            if ln == number_of_partitions:
-                break
-        
         print("\n")        
         print("             " + "  Done! Model partitioned at layers: {}\n".format(partitioned_layers))
+        self.partitioned_layers = partitioned_layers
         return found_partitions
-        # ------------------------------------------------------
-        
-        # ln = ln + 1
\ No newline at end of file
+
+    def _get_outcome(self, fn, *args):
+        # Errors of the first half are raised only if the candidate is reached
+        # in order, as in the sequential evaluation
+        try:
+            return fn(*args), None
+        except Exception as e:
+            return False, e
+
+
+# Parsed model shared with the extraction workers
+_worker_model = None
+
+def _init_extraction_worker(onnx_file):
+    global _worker_model
+    if _worker_model is None:
+        _worker_model = load_onnx_model(onnx_file)
+
+def _clear_worker_model():
+    global _worker_model
+    _worker_model = None
+
+# Only tensor names and paths are sent to the workers (not the partitioner and its graph index)
+def _extract_segment_worker(segment_file, input_names, output_names):
+    extract_model(_worker_model, segment_file, input_names, output_names)
+
+def _extract_candidate_worker(layer, candidate_dir, true_input_names, model_output_names):
+    return extract_candidate(_worker_model, layer, candidate_dir, true_input_names, model_output_names)
@@ -1,7 +1,18 @@
 import os
+import time
 import shutil
 import yaml
 import numpy as np
+from contextlib import contextmanager
+
+from .application_model import get_application_model
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows: the lock files are locked with msvcrt
+    fcntl = None
+    import msvcrt
 
 AISPRINT_ANNOTATIONS = ['component_name', 'exec_time', 'expected_throughput', 'model_performance', 
                         'partitionable_model', 'device_constraints', 'early_exits_model', 'detect_metric_drift', 'security', 'annotation']
@@ -72,32 +83,69 @@ def parse_dag(dag_file):
     return dag_dict, num_components
     
 def get_component_folder(application_dir, dag, component_name):
-    with open(os.path.join(application_dir, 'common_config', 'annotations.yaml'), 'r') as f:
-        annotations_dict = yaml.safe_load(f)
-    
-    for main_path, annotations in annotations_dict.items():
-        if annotations['component_name']['name'] == component_name:
-            return main_path.split('main.py')[0] 
-        else:
-            if 'alternative_components' in dag['System']:
-                if annotations['component_name']['name'] in dag['System']['alternative_components']:
-                    if component_name in dag['System']['alternative_components'][annotations['component_name']['name']]:
-                        # remove basename 
-                        no_basename = main_path.rsplit(os.path.basename(os.path.normpath(
-                            main_path.split('main.py')[0])), 1)[0]
-                        return os.path.join(no_basename, component_name)
+    return get_application_model(application_dir).get_component_folder(component_name, dag)
+
+
+@contextmanager
+def locked_file(path):
+    ''' Hold an exclusive lock on the file 'path' (through the lock file 'path.lock'),
+        serializing its read-modify-write updates among processes (e.g., the parallel design tasks).
+        The lock is released by the OS if the process dies, thus a crashed process never
+        leaves a stale lock.
+    '''
+    lock_path = path + '.lock'
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    with open(lock_path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            return
+        # The first byte of the lock file is locked (LK_LOCK gives up after 10 seconds)
+        lock_file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def update_component_partitions(designs_dir, component_name, component_dict):
+    ''' Set the entry of 'component_name' in the component_partitions.yaml file of the designs,
+        holding the file lock (other components may be partitioned concurrently).
+    '''
+    component_partitions_file = os.path.join(designs_dir, 'component_partitions.yaml')
+    with locked_file(component_partitions_file):
+        component_partitions = {'components': {}}
+        if os.path.exists(component_partitions_file):
+            with open(component_partitions_file, 'r') as f:
+                component_partitions = yaml.safe_load(f) or component_partitions
+        component_partitions['components'][component_name] = component_dict
+        # Atomic replacement: readers never see a partially written file
+        tmp_file = '{}.{}.tmp'.format(component_partitions_file, os.getpid())
+        with open(tmp_file, 'w') as f:
+            yaml.dump(component_partitions, f)
+        os.replace(tmp_file, component_partitions_file)
 
 
-def get_annotation_managers(application_dir):
+def get_annotation_managers(application_dir, application_model=None):
     ''' Return annotation managers dictionary with items
         annotation: AnnotationManager
     '''
 
     from .annotations import annotation_managers
 
-    with open(os.path.join(application_dir, 'common_config', 'application_dag.yaml'), 'r') as f:
-        dag_dict = yaml.safe_load(f)
-    application_name = dag_dict['System']['name'] 
+    if application_model is None:
+        application_model = get_application_model(application_dir)
+    application_name = application_model.application_name
 
     annotation_managers_dict = {}
     for aisprint_annotation in AISPRINT_ANNOTATIONS:
@@ -107,26 +155,35 @@ def get_annotation_managers(application_dir):
         manager_class_name = "".join([s.capitalize() for s in manager_module_name.split('_')])
         manager_class = getattr(annotation_managers, manager_class_name)
         annotation_managers_dict[aisprint_annotation] = manager_class(
-            application_name=application_name, application_dir=application_dir)
+            application_name=application_name, application_dir=application_dir, 
+            application_model=application_model)
     return annotation_managers_dict
 
-def get_annotation_manager(application_dir, which_annotation):
+def get_annotation_manager(application_dir, which_annotation, application_model=None):
     ''' Return AnnotationManager of 'which_annotation'. 
     '''
 
     from .annotations import annotation_managers
 
-    with open(os.path.join(application_dir, 'common_config', 'application_dag.yaml'), 'r') as f:
-        dag_dict = yaml.safe_load(f)
-    application_name = dag_dict['System']['name'] 
+    if application_model is None:
+        application_model = get_application_model(application_dir)
+    application_name = application_model.application_name
 
     manager_module_name = which_annotation + '_manager'
     manager_class_name = "".join([s.capitalize() for s in manager_module_name.split('_')])
     manager_class = getattr(annotation_managers, manager_class_name)
     annotation_manager = manager_class(
-        application_name=application_name, application_dir=application_dir)
+        application_name=application_name, application_dir=application_dir, 
+        application_model=application_model)
     return annotation_manager 
 
+def run_annotation_manager(application_dir, which_annotation, args=None):
+    ''' Process the annotations with the AnnotationManager of 'which_annotation'
+        (module-level function, executed by the design tasks).
+    '''
+    annotation_manager = get_annotation_manager(application_dir, which_annotation)
+    return annotation_manager.process_annotations(args)
+
 def run_annotation_managers(annotation_managers, deployment_name):
     # Run the annotation manager corresponding to each annotation
     for aisprint_annotation in AISPRINT_ANNOTATIONS:
@@ -0,0 +1,131 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from aisprint.deployments_generators.deployment_predicates import (
+    iter_layer_assignments, split_component_name, LayerMonotonicity, DeviceConstraints, QoSFeasibility)
+from aisprint.space4aidpartitioner.cost_model import get_network_profile
+
+LAYERS = [1, 2, 3, 4]
+
+
+def get_random_instance(seed, num_components):
+    ''' Random DAG of components (some of them partitioned in 2 or 3 segments), with their candidate
+        layers, resources, containers requirements and time constraints.
+    '''
+    rng = np.random.default_rng(seed)
+    names = ['C{}'.format(idx) for idx in range(num_components)]
+    dag_dict = {name: {'next': [names[j] for j in range(idx + 1, num_components) if rng.random() < 0.4]}
+                for idx, name in enumerate(names)}
+
+    num_segments = {name: int(rng.choice([0, 0, 0, 2, 3])) for name in names}
+    components = []
+    for name in names:
+        if num_segments[name] == 0:
+            components.append(name)
+        else:
+            components += ['{}_partition1_{}'.format(name, segment) for segment in range(1, num_segments[name] + 1)]
+    # The predicates do not depend on the order of the components
+    components = [components[idx] for idx in rng.permutation(len(components))]
+    candidate_layers = [sorted(rng.choice(LAYERS, size=int(rng.integers(2, len(LAYERS) + 1)), replace=False).tolist())
+                        for _ in components]
+
+    def get_layer(number):
+        resources = {}
+        for idx in range(int(rng.integers(1, 3))):
+            resources['resource{}'.format(idx)] = {
+                'name': 'L{}R{}'.format(number, idx), 'memorySize': int(rng.choice([4, 8, 16])),
+                'processors': {'processor1': {'computingUnits': int(rng.choice([2, 4])),
+                                              'SGXFlag': bool(rng.random() < 0.7)}}}
+        return {'number': number, 'Resources': resources}
+
+    network_domains = {
+        'nd0': {'Bandwidth': float(rng.choice([10, 100])), 'AccessDelay': 0.01,
+                'subNetworkDomains': ['nd1', 'nd2']},
+        'nd1': {'Bandwidth': float(rng.choice([100, 1000])), 'AccessDelay': 0.001,
+                'ComputationalLayers': {'computationalLayer1': get_layer(1), 'computationalLayer2': get_layer(2)}},
+        'nd2': {'Bandwidth': float(rng.choice([100, 1000])), 'AccessDelay': 0.001,
+                'ComputationalLayers': {'computationalLayer3': get_layer(3), 'computationalLayer4': get_layer(4)}}}
+    candidate_resources = {'System': {'NetworkDomains': network_domains}}
+    resource_names = ['L{}R{}'.format(layer, idx) for layer in LAYERS for idx in range(2)]
+
+    candidate_deployments = {}
+    for idx, component in enumerate(components):
+        component_name, which_partition, segment = split_component_name(component)
+        if which_partition is not None:
+            component_name = component_name + '_partitionX_{}'.format(segment)
+        container = {'memorySize': int(rng.choice([1, 2, 8])), 'computingUnits': int(rng.choice([1, 1, 2])),
+                     'trustedExecution': bool(rng.random() < 0.1), 'candidateExecutionResources': []}
+        if rng.random() < 0.3:
+            container['candidateExecutionResources'] = rng.choice(resource_names, size=4, replace=False).tolist()
+        candidate_deployments['component{}'.format(idx)] = {
+            'name': component_name, 'candidateExecutionLayers': candidate_layers[idx],
+            'Containers': {'container1': container}}
+
+    annotations = {}
+    partition_dict = {'components': {}}
+    for name in names:
+        annotations[name] = {'component_name': {'name': name}}
+        if rng.random() < 0.3:
+            annotations[name]['device_constraints'] = {'ram': int(rng.choice([2, 4, 8]))}
+        if num_segments[name] > 0:
+            annotations[name]['exec_time'] = {'local_time_thr': float(rng.choice([50, 200, 1000]))}
+            cuts = [{'encoded_bytes': int(rng.integers(10**4, 10**7))} for _ in range(num_segments[name] - 1)]
+            if rng.random() < 0.2:
+                del cuts[0]['encoded_bytes']
+            partition_dict['components'][name] = {'boundaries': {'partition1': cuts}}
+    return dag_dict, components, candidate_layers, candidate_resources, candidate_deployments, annotations, partition_dict
+
+
+def is_monotonic(dag_dict, components, assignment):
+    layers = {split_component_name(component): layer for component, layer in zip(components, assignment)}
+    first = {}
+    last = {}
+    for component_name, which_partition, segment in sorted(layers, key=lambda key: (key[0], key[2] or 0)):
+        first.setdefault(component_name, (component_name, which_partition, segment))
+        last[component_name] = (component_name, which_partition, segment)
+        if segment is not None and segment > 1:
+            if layers[(component_name, which_partition, segment - 1)] > layers[last[component_name]]:
+                return False
+    for component_name, next_dict in dag_dict.items():
+        for next_component in next_dict['next']:
+            if layers[last[component_name]] > layers[first[next_component]]:
+                return False
+    return True
+
+
+def is_qos_feasible(candidate_resources, annotations, partition_dict, components, assignment):
+    layers = {split_component_name(component): layer for component, layer in zip(components, assignment)}
+    for component_name, component_dict in partition_dict['components'].items():
+        threshold = annotations[component_name]['exec_time']['local_time_thr'] / 1000
+        transfer_time = 0.0
+        for idx, cut in enumerate(component_dict['boundaries']['partition1']):
+            first_layer = layers[(component_name, 'partition1', idx + 1)]
+            second_layer = layers[(component_name, 'partition1', idx + 2)]
+            if 'encoded_bytes' not in cut or first_layer == second_layer:
+                continue
+            network_profile = get_network_profile(candidate_resources, first_layer, second_layer)
+            if network_profile is not None:
+                transfer_time += network_profile.transfer_time(cut['encoded_bytes'])
+        if transfer_time > threshold:
+            return False
+    return True
+
+
+@pytest.mark.parametrize('seed', range(30))
+@pytest.mark.parametrize('num_components', [1, 2, 3])
+def test_iter_layer_assignments(seed, num_components):
+    (dag_dict, components, candidate_layers, candidate_resources,
+     candidate_deployments, annotations, partition_dict) = get_random_instance(seed, num_components)
+    device_constraints = DeviceConstraints(candidate_deployments, candidate_resources, annotations)
+    predicates = [LayerMonotonicity(dag_dict), device_constraints,
+                  QoSFeasibility(partition_dict, candidate_resources, annotations)]
+
+    pruned = list(iter_layer_assignments(components, candidate_layers, predicates))
+    expected = [assignment for assignment in itertools.product(*candidate_layers)
+                if is_monotonic(dag_dict, components, assignment)
+                and all([device_constraints.is_feasible(component, layer)
+                         for component, layer in zip(components, assignment)])
+                and is_qos_feasible(candidate_resources, annotations, partition_dict, components, assignment)]
+    assert pruned == expected
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from onnx import helper, numpy_helper, TensorProto
+
+from aisprint.space4aidpartitioner.graph_index import ONNXGraphIndex
+from aisprint.space4aidpartitioner.dominators import get_valid_cuts
+
+
+def get_random_model(seed, num_nodes):
+    ''' Random DAG of 'Sum' nodes, with two true inputs, an initializer consumed also by
+        a constant subgraph, unused tensors and one or two graph outputs.
+    '''
+    rng = np.random.default_rng(seed)
+    tensors = ['x0', 'x1']
+    nodes = [helper.make_node('Relu', ['w'], ['w_relu'])]
+    for idx in range(num_nodes):
+        # Mostly the last tensors: long chains with some skip connections
+        num_inputs = int(rng.integers(1, 3))
+        candidates = tensors[-4:] if rng.random() < 0.8 else tensors
+        inputs = sorted(set(rng.choice(candidates, size=num_inputs)), key=tensors.index)
+        if rng.random() < 0.2:
+            inputs.append(['w', 'w_relu'][int(rng.integers(0, 2))])
+        tensors.append('t{}'.format(idx))
+        nodes.append(helper.make_node('Sum', inputs, [tensors[-1]]))
+    outputs = [tensors[-1]]
+    if num_nodes > 1 and rng.random() < 0.3:
+        outputs.append(tensors[int(rng.integers(2, len(tensors) - 1))])
+
+    value_info = lambda name: helper.make_tensor_value_info(name, TensorProto.FLOAT, [1])
+    graph = helper.make_graph(
+        nodes, 'random', [value_info('x0'), value_info('x1')], [value_info(name) for name in outputs],
+        initializer=[numpy_helper.from_array(np.ones(1, dtype=np.float32), 'w')])
+    return helper.make_model(graph)
+
+
+def reaches_outputs(graph_index, blocked=None):
+    ''' Check if an output is reachable from the true inputs without crossing the 'blocked' tensor.
+    '''
+    reached = set([name for name in graph_index.true_inputs if name != blocked])
+    changed = True
+    while changed:
+        changed = False
+        for node in graph_index.onnx_model.graph.node:
+            if any([name in reached for name in node.input]):
+                for name in node.output:
+                    if name != blocked and name not in reached:
+                        reached.add(name)
+                        changed = True
+    return any([name in reached for name in graph_index.outputs])
+
+
+def brute_force(graph_index):
+    ''' Tensors whose removal disconnects the outputs from the true inputs, in topological order.
+    '''
+    excluded = set(graph_index.true_inputs) | set(graph_index.outputs) | graph_index.initializers
+    cuts = []
+    for node in graph_index.onnx_model.graph.node:
+        for name in node.output:
+            if name not in excluded and not reaches_outputs(graph_index, blocked=name):
+                cuts.append(name)
+    return cuts
+
+
+@pytest.mark.parametrize('seed', range(50))
+@pytest.mark.parametrize('num_nodes', [1, 5, 20])
+def test_get_valid_cuts(seed, num_nodes):
+    graph_index = ONNXGraphIndex(get_random_model(seed, num_nodes), infer_shapes=False)
+    assert reaches_outputs(graph_index)
+    assert get_valid_cuts(graph_index) == brute_force(graph_index)
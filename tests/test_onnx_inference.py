@@ -0,0 +1,114 @@
+import os
+
+import numpy as np
+import onnx
+import pandas as pd
+from onnx import helper, TensorProto
+
+from aisprint.onnx_inference import load_and_inference, load_and_inference_batch, get_session_pool
+
+
+class CountingSession():
+    ''' Wrap a session counting the runs, optionally failing the batched ones.
+    '''
+
+    def __init__(self, session, max_batch=None):
+        self.session = session
+        self.max_batch = max_batch
+        self.runs = []
+
+    def run(self, output_names, session_input):
+        batch = max([tensor.shape[0] for tensor in session_input.values()])
+        self.runs.append(batch)
+        if self.max_batch is not None and batch > self.max_batch:
+            raise RuntimeError('batch too large')
+        return self.session.run(output_names, session_input)
+
+
+def save_model(path, output_dim, reduce=False):
+    nodes = [helper.make_node('Relu', ['x'], ['y'])]
+    if reduce:
+        nodes.append(helper.make_node('ReduceSum', ['y'], ['z'], keepdims=1))
+    else:
+        nodes.append(helper.make_node('Neg', ['y'], ['z']))
+    graph = helper.make_graph(
+        nodes, 'model', [helper.make_tensor_value_info('x', TensorProto.FLOAT, ['N', 3])],
+        [helper.make_tensor_value_info('y', TensorProto.FLOAT, ['N', 3]),
+         helper.make_tensor_value_info('z', TensorProto.FLOAT, [output_dim, 3])])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    onnx.save(model, path)
+    return path
+
+
+def get_requests(seed, sizes):
+    rng = np.random.default_rng(seed)
+    return [{'x': rng.standard_normal((size, 3)).astype(np.float32), 'other': idx}
+            for idx, size in enumerate(sizes)]
+
+
+def wrap_session(onnx_file, max_batch=None):
+    entry = get_session_pool().get(onnx_file)
+    if not isinstance(entry.session, CountingSession):
+        entry.session = CountingSession(entry.session, max_batch)
+    entry.session.runs.clear()
+    return entry
+
+
+def assert_same_returns(batched, expected):
+    assert len(batched) == len(expected)
+    for (return_dict, result), (expected_dict, expected_result) in zip(batched, expected):
+        assert return_dict.keys() == expected_dict.keys()
+        for k in expected_dict:
+            assert np.array_equal(return_dict[k], expected_dict[k])
+        for output, expected_output in zip(result, expected_result):
+            assert np.array_equal(output, expected_output)
+
+
+def test_batch_single_run(tmp_path):
+    onnx_file = save_model(str(tmp_path / 'model.onnx'), 'N')
+    requests = get_requests(0, [1, 3, 2])
+    expected = [load_and_inference(onnx_file, input_dict) for input_dict in requests]
+
+    entry = wrap_session(onnx_file)
+    assert entry.dynamic_batch
+    assert_same_returns(load_and_inference_batch(onnx_file, requests), expected)
+    assert entry.session.runs == [6]
+
+
+def test_batch_not_tied_outputs(tmp_path):
+    # The output batch axis is not the inputs' one: the requests are run one at a time
+    onnx_file = save_model(str(tmp_path / 'model.onnx'), 'M', reduce=True)
+    requests = get_requests(1, [1, 3, 2])
+    expected = [load_and_inference(onnx_file, input_dict) for input_dict in requests]
+
+    entry = wrap_session(onnx_file)
+    assert not entry.dynamic_batch
+    assert_same_returns(load_and_inference_batch(onnx_file, requests), expected)
+    assert entry.session.runs == [1, 3, 2]
+
+
+def test_batch_failed_run(tmp_path):
+    onnx_file = save_model(str(tmp_path / 'model.onnx'), 'N')
+    requests = get_requests(2, [1, 3, 2])
+    expected = [load_and_inference(onnx_file, input_dict) for input_dict in requests]
+
+    entry = wrap_session(onnx_file, max_batch=3)
+    assert_same_returns(load_and_inference_batch(onnx_file, requests), expected)
+    assert entry.session.runs == [6, 1, 3, 2]
+
+
+def test_exit_node_reload(tmp_path):
+    onnx_file = save_model(str(tmp_path / 'model.onnx'), 'N')
+    exit_node_file = str(tmp_path / 'exit_node.df')
+    pool = get_session_pool()
+    assert not pool.get(onnx_file).is_ee_model
+
+    # Adding, changing or removing the exit node reloads the model
+    pd.DataFrame({'exit_node': ['y']}).to_pickle(exit_node_file)
+    assert pool.get(onnx_file).exit_node == 'y'
+    pd.DataFrame({'exit_node': ['z']}).to_pickle(exit_node_file)
+    os.utime(exit_node_file, (1, 1))
+    assert pool.get(onnx_file).exit_node == 'z'
+    os.remove(exit_node_file)
+    assert not pool.get(onnx_file).is_ee_model
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from aisprint.pareto import OBJECTIVES, get_pareto_front
+
+
+def dominates(first, second):
+    better_or_equal = all([OBJECTIVES[o] * first[o] >= OBJECTIVES[o] * second[o] for o in OBJECTIVES])
+    better = any([OBJECTIVES[o] * first[o] > OBJECTIVES[o] * second[o] for o in OBJECTIVES])
+    return better_or_equal and better
+
+
+def get_points(seed, num_points):
+    rng = np.random.default_rng(seed)
+    # Few distinct values: ties and duplicated points are frequent
+    return {'deployment{}'.format(idx): {o: float(rng.integers(0, 4)) for o in OBJECTIVES}
+            for idx in range(num_points)}
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('num_points', [1, 2, 10, 50])
+def test_pareto_front(seed, num_points):
+    points = get_points(seed, num_points)
+    front, dominated = get_pareto_front(points)
+
+    expected = [name for name in points
+                if not any([dominates(points[other], points[name]) for other in points])]
+    assert front == expected
+    assert set(dominated) == set(points) - set(expected)
+    for name, (dominator, reasons) in dominated.items():
+        assert dominator in front
+        assert dominates(points[dominator], points[name])
+        assert len(reasons) == len(OBJECTIVES)
+
+
+def test_pareto_front_keep():
+    points = get_points(0, 50)
+    front, dominated = get_pareto_front(points)
+    keep = sorted(dominated)[:3]
+    kept_front, kept_dominated = get_pareto_front(points, keep=keep)
+    assert set(kept_front) == set(front) | set(keep)
+    assert set(kept_dominated) == set(dominated) - set(keep)
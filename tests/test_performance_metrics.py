@@ -0,0 +1,75 @@
+import os
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aisprint.performance_metrics import (METRICS, ConfusionMatrices, FilterClassifierMetrics,
+                                          PipelineSearch, compose_filter_rates)
+
+CLASSES = ['object', 'a', 'b', 'c', 'd']
+
+
+def write_confusion_matrix(application_dir, component, class_names, rng):
+    performance_dir = os.path.join(application_dir, 'src', component, 'classification_performance')
+    os.makedirs(performance_dir)
+    num_classes = len(class_names)
+    cm = rng.random((num_classes, num_classes)) + np.eye(num_classes) * rng.random() * 8
+    cm /= cm.sum()
+    # The class names are stored in a different order than the matrix rows
+    indices = rng.permutation(num_classes)
+    stored_cm = np.zeros_like(cm)
+    stored_cm[np.ix_(indices, indices)] = cm
+    np.save(os.path.join(performance_dir, 'confusion_matrix.npy'), stored_cm)
+    pd.DataFrame({'class': class_names, 'index': indices}).to_csv(
+        os.path.join(performance_dir, 'class_names_dictionary.csv'))
+
+
+def brute_force(metrics, metric, stages, classifiers):
+    ''' Metric of every deployment, composing the filters one by one.
+    '''
+    values = {}
+    for filters in itertools.product(*stages):
+        rates = {k: v[0] for k, v in metrics.get_filter_rates([filters[0]]).items()}
+        for next_filter in filters[1:]:
+            rates = compose_filter_rates(
+                rates, {k: v[0] for k, v in metrics.get_filter_rates([next_filter]).items()})
+        for classifier, value in zip(classifiers, metrics.evaluate_rates(metric, rates, classifiers)[0]):
+            values[(filters, classifier)] = value
+    return values
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('classifier_filtered_class', [None, 'object'])
+@pytest.mark.parametrize('metric', METRICS)
+def test_pipeline_search(tmp_path, seed, classifier_filtered_class, metric):
+    rng = np.random.default_rng(seed)
+    application_dir = str(tmp_path)
+    stages = [['filter{}_{}'.format(stage, idx) for idx in range(3)] for stage in range(3)]
+    classifiers = ['classifier{}'.format(idx) for idx in range(3)]
+    for alternatives in stages:
+        for component in alternatives:
+            write_confusion_matrix(application_dir, component, ['object', 'animal'], rng)
+    for component in classifiers:
+        write_confusion_matrix(application_dir, component, list(rng.permutation(CLASSES)), rng)
+
+    metrics = FilterClassifierMetrics(ConfusionMatrices(application_dir), 'object', classifier_filtered_class)
+    expected = brute_force(metrics, metric, stages, classifiers)
+    # Threshold between two values (a deployment equal to it could be rounded either way)
+    values = sorted(set(expected.values()))
+    idx = int(len(values) * 0.8)
+    metric_thr = (values[idx - 1] + values[idx]) / 2
+
+    search = PipelineSearch(metrics, stages, classifiers)
+    deployments = search.search(metric, metric_thr)
+    found = {(tuple(filters), classifier): value for filters, classifier, value, _ in deployments}
+    # The deployments above the threshold, and the original one
+    original = (tuple([alternatives[0] for alternatives in stages]), classifiers[0])
+    assert set(found) == {k for k, v in expected.items() if v >= metric_thr} | {original}
+    for deployment, value in found.items():
+        assert np.isclose(value, expected[deployment])
+    assert search.pruned + len(found) == len(expected)
+
+    # Without threshold all the deployments are returned
+    assert len(PipelineSearch(metrics, stages, classifiers).search(metric)) == len(expected)
@@ -0,0 +1,97 @@
+import time
+import threading
+
+from aisprint.monitoring import Reporter, Sink
+from aisprint.monitoring.reporter import DROP_OLDEST, DROP_NEWEST, BLOCK
+
+
+class ListSink(Sink):
+    ''' Keep the written records in memory.
+    '''
+
+    def __init__(self):
+        self.lines = []
+        self.closed = False
+
+    def write(self, lines):
+        self.lines.extend(lines)
+
+    def close(self):
+        self.closed = True
+
+
+class BufferedReporter(Reporter):
+    ''' Reporter without flusher thread: the records stay in the buffer until flush() or close().
+    '''
+
+    def _ensure_flusher(self):
+        pass
+
+
+def get_values(sink):
+    return [int(line.split('value=')[1].split('i')[0]) for line in sink.lines]
+
+
+def test_drop_newest():
+    sink = ListSink()
+    reporter = BufferedReporter(sink, capacity=2, policy=DROP_NEWEST)
+    assert [reporter.report('m', {}, {'value': i}) for i in range(3)] == [True, True, False]
+    assert reporter.dropped == 1
+    reporter.close()
+    assert get_values(sink) == [0, 1]
+
+
+def test_drop_oldest():
+    sink = ListSink()
+    reporter = BufferedReporter(sink, capacity=2, policy=DROP_OLDEST)
+    assert all([reporter.report('m', {}, {'value': i}) for i in range(3)])
+    assert reporter.dropped == 1
+    reporter.close()
+    assert get_values(sink) == [1, 2]
+
+
+def test_block_timeout():
+    sink = ListSink()
+    reporter = BufferedReporter(sink, capacity=2, policy=BLOCK, block_timeout=0.05)
+    assert [reporter.report('m', {}, {'value': i}) for i in range(3)] == [True, True, False]
+    assert reporter.dropped == 1
+    reporter.close()
+    assert get_values(sink) == [0, 1]
+
+
+def test_block_backpressure():
+    sink = ListSink()
+    reporter = Reporter(sink, capacity=2, batch_size=1, flush_interval=0.01, policy=BLOCK)
+    assert all([reporter.report('m', {}, {'value': i}) for i in range(100)])
+    reporter.close()
+    assert reporter.dropped == 0
+    assert get_values(sink) == list(range(100))
+
+
+def test_block_woken_by_close():
+    sink = ListSink()
+    reporter = BufferedReporter(sink, capacity=2, policy=BLOCK)
+    reporter.report('m', {}, {'value': 0})
+    reporter.report('m', {}, {'value': 1})
+    results = []
+    blocked = threading.Thread(target=lambda: results.append(reporter.report('m', {}, {'value': 2})))
+    blocked.start()
+    # Wait for the caller to block on the full buffer
+    time.sleep(0.1)
+    assert results == []
+    reporter.close()
+    blocked.join(timeout=5)
+    # The record of the caller woken by close() is written, not left in the buffer
+    assert results == [True]
+    assert sorted(get_values(sink)) == [0, 1, 2]
+    assert len(reporter._buffer) == 0
+
+
+def test_report_after_close():
+    sink = ListSink()
+    reporter = Reporter(sink)
+    reporter.report('m', {}, {'value': 0})
+    reporter.close()
+    assert sink.closed
+    assert reporter.report('m', {}, {'value': 1})
+    assert get_values(sink) == [0, 1]
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from aisprint.onnx_inference import save_tensors, load_tensors
+
+
+def test_close(tmp_path):
+    path = str(tmp_path / 'tensors')
+    save_tensors(path, {'a': np.arange(10, dtype=np.float32), 'b': 'value'})
+    with load_tensors(path) as tensors:
+        a = tensors['a']
+        assert tensors['b'] == 'value'
+    assert tensors.closed
+    # Views on the mapped file remain valid after close
+    assert a.sum() == 45
+    with pytest.raises(ValueError):
+        tensors['a']
+
+
+def test_close_decoded(tmp_path):
+    path = str(tmp_path / 'tensors')
+    save_tensors(path, {'a': np.arange(10, dtype=np.float32)}, codec='zlib')
+    tensors = load_tensors(path)
+    a = tensors['a']
+    tensors.close()
+    tensors.close()
+    assert tensors.closed
+    assert np.array_equal(a, np.arange(10, dtype=np.float32))